@@ -1,489 +1,4312 @@
-import base64
-import json
-import os
-import time
-from google.cloud import pubsub_v1
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_core.tools import tool
-from langchain_google_genai import ChatGoogleGenerativeAI
-import logging
-
-
-PROJECT_ID = "qwiklabs-gcp-00-7a679581466f"
-
-# --- Configuration ---
-MANAGER_AGENT_COMMANDS_TOPIC = os.environ.get("MANAGER_AGENT_COMMANDS_TOPIC", "manager-agent-commands")
-DATA_INGESTION_TOPIC = os.environ.get("DATA_INGESTION_TOPIC", "data-ingestion-commands")
-QUALITY_CHECKER_TOPIC = os.environ.get("QUALITY_CHECKER_TOPIC", "quality-checker-commands")
-REPORTING_TOPIC = os.environ.get("REPORTING_TOPIC", "reporting-commands")
-ALERTING_TOPIC = os.environ.get("ALERTING_TOPIC", "alerting-commands")
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# GLOBAL CLIENTS AND STORAGE
-_publisher_client = None
-_llm_client = None
-_agent_executor_instance = None
-_job_status_store = {}  # In-memory store for job statuses
-
-def _get_publisher_client():
-    """Initialize and return a Pub/Sub PublisherClient."""
-    global _publisher_client
-    if _publisher_client is None:
-        _publisher_client = pubsub_v1.PublisherClient()
-    return _publisher_client
-
-def _get_llm_client():
-    """Initialize and return a LangChain Google Generative AI client."""
-    global _llm_client
-    if _llm_client is None:
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY environment variable is not set")
-        _llm_client = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.5, google_api_key=api_key)
-    return _llm_client
-
-# Helper functions for in-memory and file-based storage
-def _get_job_status(job_id):
-    """Retrieve the status of a job from in-memory store or /tmp file.
-
-    Args:
-        job_id (str): The unique identifier of the job.
-
-    Returns:
-        dict: The job status dictionary, or None if not found.
-    """
-    # Check in-memory store first
-    if job_id in _job_status_store:
-        return _job_status_store[job_id]
-    
-    # Fallback to local file in /tmp
-    status_file = f"/tmp/job_status_{job_id}.json"
-    try:
-        if os.path.exists(status_file):
-            with open(status_file, "r") as f:
-                status_data = json.load(f)
-                _job_status_store[job_id] = status_data  # Cache in memory
-                return status_data
-    except (OSError, json.JSONDecodeError) as e:
-        logger.error(f"Error reading job status from file for {job_id}: {e}")
-    return None
-
-def _upload_quality_report(job_id: str, quality_results: dict) -> str:
-
-    REPORT_BUCKET = "gcp31dqreportnomos"
-    bucket = storage.Client().bucket(REPORT_BUCKET)
-    
-    blob_path = f"output.json"
-
-    blob = bucket.blob(blob_path)
-    blob.upload_from_string(
-        data=json.dumps(quality_results, indent=2),
-        content_type="application/json",
-    )
-    logger.info(f"Uploaded quality report → gs://{REPORT_BUCKET}/{blob_path}")
-    return f"gs://{REPORT_BUCKET}/{blob_path}"
-
-def _update_job_status(job_id, status, details=None):
-    """Update the status of a job in memory and persist to a /tmp file.
-
-    Args:
-        job_id (str): The unique identifier of the job.
-        status (str): The new status of the job.
-        details (dict, optional): Additional details to store with the status.
-    """
-    # Update in-memory store
-    status_data = {
-        "status": status,
-        "timestamp": time.time(),
-    }
-    if details:
-        status_data.update(details)
-    
-    _job_status_store[job_id] = status_data
-    logger.info(f"Job {job_id} status updated in memory to: {status}")
-
-    # Persist to local file in /tmp
-    status_file = f"/tmp/job_status_{job_id}.json"
-    try:
-        with open(status_file, "w") as f:
-            json.dump(status_data, f)
-        logger.info(f"Job {job_id} status persisted to {status_file}")
-    except OSError as e:
-        logger.error(f"Error writing job status to file for {job_id}: {e}")
-
-# Define the Agent and Tools
-def _get_agent_executor():
-    """Initialize and return the LangChain AgentExecutor."""
-    global _agent_executor_instance
-    if _agent_executor_instance is None:
-        # Helper function for publishing
-        def _publish_message(topic_name, data):
-            """Publish a message to a Pub/Sub topic.
-
-            Args:
-                topic_name (str): The name of the Pub/Sub topic.
-                data (dict): The data to publish as a JSON string.
-            """
-            try:
-                # project_id = os.environ.get("PROJECT_ID", PROJECT_ID)
-                project_id="qwiklabs-gcp-00-7a679581466f"
-                if not project_id:
-                    raise ValueError("PROJECT_ID environment variable is not set")
-                topic_path = _get_publisher_client().topic_path(project_id, topic_name)
-                future = _get_publisher_client().publish(topic_path, json.dumps(data).encode("utf-8"))
-                logger.info(f"Published to {topic_name}: {future.result()}")
-            except Exception as e:
-                logger.error(f"Error publishing to {topic_name}: {e}")
-                raise
-
-        
-        # # Define tools with docstrings
-        # @tool
-        # def trigger_data_ingestion(gcs_uri: str) -> str:
-        #     """Trigger data ingestion for a CSV file in Google Cloud Storage.
-
-        #     Args:
-        #         gcs_uri (str): The GCS URI of the CSV file to ingest.
-                
-
-        #     Returns:
-        #         str: A message indicating whether ingestion completed or is awaiting completion.
-        #     """
-        #     job_id = "test-job-123"
-        #     logger.info(f"LangChain Tool: Triggering Data Ingestion for {gcs_uri} (Job ID: {job_id})")
-        #     message_data = {
-        #         "job_id": job_id,
-        #         "gcs_uri": gcs_uri,
-        #         "next_step": "run_quality_checks"
-        #     }
-        #     _publish_message(DATA_INGESTION_TOPIC, message_data)
-        #     _update_job_status(job_id, "INGESTION_REQUESTED", {"gcs_uri": gcs_uri})
-
-        #     max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
-        #     sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
-        #     for attempt in range(max_attempts):
-        #         status = _get_job_status(job_id)
-        #         if status and status.get("status") == "INGESTION_COMPLETED":
-        #             logger.info(f"Ingestion for {job_id} completed successfully.")
-        #             return f"Data ingestion for {gcs_uri} successfully initiated and completed. Data reference: {status.get('data_ref')}."
-        #         time.sleep(sleep_interval)
-        #     return f"Data ingestion for {gcs_uri} initiated, awaiting completion (Job ID: {job_id})."
-
-        @tool
-        def analyze_dataset(gcs_uri: str) -> str:
-            """
-            Analyzes a dataset in GCS and generates a JSON string of applicable data quality checks.
-
-            Args:
-                gcs_uri (str): The GCS URI of the dataset (e.g., gs://bucket/file.csv).
-                
-
-            Returns:
-                str: A JSON string containing the selected data quality checks.
-            """
-
-            job_id = "test-job-123"
-            gcs_uri ="gs://gcp_31_raw/dummy.csv"
-            logger.info(f"LangChain Tool: Analyzing dataset at {gcs_uri} (Job ID: {job_id})")
-
-            try:
-                # Simulate dataset analysis (in a real implementation, use pandas or a similar library)
-                # Assume access to GCS via google.cloud.storage
-                from google.cloud import storage
-                import pandas as pd
-                import io
-
-                #Extract bucket and file path from gs:// URI
-                if not gcs_uri.startswith("gs://"):
-                    raise ValueError(f"Invalid GCS URI: {gcs_uri}")
-                bucket_name = gcs_uri.split("/")[2]
-                file_path = "/".join(gcs_uri.split("/")[3:])
-              
-
-                # Download and read a sample of the CSV
-                storage_client = storage.Client()
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(file_path)
-                data = blob.download_as_bytes()
-                df = pd.read_csv(io.BytesIO(data), nrows=100)  # Sample first 100 rows
-
-                # Analyze schema
-                columns = df.columns.tolist()
-                dtypes = df.dtypes.to_dict()
-
-                # Generate quality checks based on column types
-                check_definitions = {
-                    "checks": []
-                }
-
-                for col in columns:
-                    dtype = str(dtypes[col])
-                    checks = []
-
-                    # Common checks for all columns
-                    checks.append({"type": "not_null", "column": col, "threshold": 0.0})
-
-                    # Type-specific checks
-                    if "int" in dtype or "float" in dtype:
-                        # Numeric checks: range and outliers
-                        min_val = float(df[col].min())
-                        max_val = float(df[col].max())
-                        checks.append({
-                            "type": "range",
-                            "column": col,
-                            "min": min_val * 0.9,  # Allow 10% below min
-                            "max": max_val * 1.1   # Allow 10% above max
-                        })
-                    elif "object" in dtype:
-                        # String checks: length and uniqueness (if likely an ID column)
-                        if col.lower() in ["id", "identifier", "unique_id", "key"]:
-                            checks.append({"type": "unique", "column": col})
-                        checks.append({
-                            "type": "length",
-                            "column": col,
-                            "max_length": int(df[col].str.len().max()) + 10
-                        })
-
-                    check_definitions["checks"].extend(checks)
-
-                # Update job status with analysis results
-                _update_job_status(job_id, "DATASET_ANALYZED", {"check_definitions": check_definitions})
-
-                return json.dumps(check_definitions)
-
-            except Exception as e:
-                logger.error(f"Failed to analyze dataset {gcs_uri} for job {job_id}: {e}")
-                _update_job_status(job_id, "DATASET_ANALYSIS_FAILED", {"error": str(e)})
-                return f"Failed to analyze dataset: {str(e)}"
-
-        
-        
-        @tool
-        def trigger_quality_checker(data_ref: str) -> str:
-            """
-            Triggers quality checks for a dataset using dynamically generated check definitions.
-
-            Args:
-                data_ref (str): Reference to the processed dataset.
-
-            Returns:
-                str: Status message indicating whether quality checks were initiated or completed.
-            """
-            job_id = "test-job-123"
-            
-            check_definitions = "[{\"type\": \"not_null\", \"column\": \"id\", \"threshold\": 0.0}, {\"type\": \"range\", \"column\": \"id\", \"min\": 0.9, \"max\": 5.5}, {\"type\": \"not_null\", \"column\": \"name\", \"threshold\": 0.0}, {\"type\": \"length\", \"column\": \"name\", \"max_length\": 17}, {\"type\": \"not_null\", \"column\": \"age\", \"threshold\": 0.0}, {\"type\": \"range\", \"column\": \"age\", \"min\": 21.6, \"max\": 46.2}, {\"type\": \"not_null\", \"column\": \"city\", \"threshold\": 0.0}, {\"type\": \"length\", \"column\": \"city\", \"max_length\": 21}]"            
-            logger.info(f"LangChain Tool: Triggering Quality Checker for {data_ref} (Job ID: {job_id})")
-            logger.debug(f"Received check_definitions: {check_definitions}")
-            try:
-                # Validate check_definitions
-                json.loads(check_definitions)  # Ensure it's valid JSON
-                message_data = {
-                    "job_id": job_id,
-                    "data_ref": data_ref,
-                    "check_definitions": check_definitions,
-                    "next_step": "process_quality_results"
-                }
-                _publish_message(QUALITY_CHECKER_TOPIC, message_data)
-                _update_job_status(job_id, "QUALITY_CHECK_REQUESTED", {"data_ref": data_ref, "check_definitions": check_definitions})
-
-                max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
-                sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
-                for attempt in range(max_attempts):
-                    status = _get_job_status(job_id)
-                    if status and status.get("status") == "QUALITY_CHECKS_COMPLETED":
-                        logger.info(f"Quality checks for {job_id} completed successfully.")
-                        quality_results = status.get("quality_results")
-                        if not quality_results:
-                             logger.warning(f"QUALITY_CHECKS_COMPLETED but no results for {job_id}")
-                             return "Quality checks completed but results missing."
-
-                        logger.info(f"Quality checks completed for {job_id}. Returning results.")
-                        return json.dumps(quality_results)  
-                        # return f"Quality checks for {data_ref} completed. Results: {json.dumps(status.get('quality_results'), indent=2)}"
-                    time.sleep(sleep_interval)
-                return f"Quality checks for {data_ref} initiated, awaiting completion (Job ID: {job_id})."
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid check_definitions JSON for job {job_id}: {e}")
-                return f"Failed to parse check_definitions for job {job_id}: {str(e)}"
-            except Exception as e:
-                logger.error(f"Error triggering quality checker for job {job_id}: {e}")
-                return f"Error triggering quality checks for {data_ref}: {str(e)}"
-        @tool
-        def trigger_reporting_agent(job_id: str, quality_results: str) -> str:
-            """Trigger reporting based on quality check results.
-
-            Args:
-                job_id (str): The unique identifier for the job.
-                quality_results (str): JSON string containing quality check results.
-
-            Returns:
-                str: A message indicating whether reporting completed or is awaiting completion.
-            """
-            logger.info(f"LangChain Tool: Triggering Reporting Agent for Job ID: {job_id}")
-            
-            try:
-                message_data = {
-                    "job_id": job_id,
-                    "quality_results": json.loads(quality_results),
-                    "next_step": "job_complete"
-                }
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid quality_results JSON for job {job_id}: {e}")
-                return f"Failed to parse quality_results for job {job_id}: {str(e)}"
-            _publish_message(REPORTING_TOPIC, message_data)
-            _update_job_status(job_id, "REPORTING_REQUESTED")
-
-            max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
-            sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
-            for attempt in range(max_attempts):
-                status = _get_job_status(job_id)
-                if status and status.get("status") == "REPORTING_COMPLETED":
-                    logging.info(f"Uploading quality results to bucket")
-                    _upload_quality_report(job_id,quality_results)
-                    logging.info(f"Uploading quality results to bucket completed")
-                    logger.info(f"Reporting for {job_id} completed successfully.")
-                    return f"Reporting for job {job_id} completed. Report URL: {status.get('report_url')}."
-                    
-                time.sleep(sleep_interval)
-            return f"Reporting for job {job_id} initiated, awaiting completion."
-
-        # @tool
-        # def trigger_alerting_agent(job_id: str, alert_type: str, details: str, target_users: list) -> str:
-        #     """Trigger an alert based on job status or quality results.
-
-        #     Args:
-        #         job_id (str): The unique identifier for the job.
-        #         alert_type (str): Type of alert (e.g., 'critical_data_quality_failure', 'data_quality_summary').
-        #         details (str): JSON string containing alert details.
-        #         target_users (list): List of user emails to receive the alert.
-
-        #     Returns:
-        #         str: A message indicating whether alerting completed or is awaiting completion.
-        #     """
-        #     logger.info(f"LangChain Tool: Triggering Alerting Agent for Job ID: {job_id}, Type: {alert_type}")
-        #     try:
-        #         message_data = {
-        #             "job_id": job_id,
-        #             "alert_type": alert_type,
-        #             "details": json.loads(details),
-        #             "target_users": target_users
-        #         }
-        #     except json.JSONDecodeError as e:
-        #         logger.error(f"Invalid details JSON for job {job_id}: {e}")
-        #         return f"Failed to parse details for job {job_id} ({alert_type}): {str(e)}"
-        #     _publish_message(ALERTING_TOPIC, message_data)
-        #     _update_job_status(job_id, f"ALERTING_REQUESTED_{alert_type}")
-
-        #     max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
-        #     sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
-        #     for attempt in range(max_attempts):
-        #         status = _get_job_status(job_id)
-        #         if status and status.get("status") == "ALERTING_COMPLETED" and status.get('details', {}).get('alert_type') == alert_type:
-        #             logger.info(f"Alerting for {job_id} ({alert_type}) completed successfully.")
-        #             return f"Alerting for job {job_id} ({alert_type}) completed."
-        #         time.sleep(sleep_interval)
-        #     return f"Alerting for job {job_id} ({alert_type}) initiated, awaiting completion."
-
-        tools = [
-            analyze_dataset,
-            trigger_quality_checker,
-            trigger_reporting_agent
-        ]
-
-        # Updated prompt template with {tool_names} and standard ReAct format
-        agent_prompt_template = """
-You are a highly intelligent Data Quality Manager AI Agent. Your goal is to ensure the highest data quality
-for incoming datasets and notify stakeholders appropriately.
-
-You have access to the following tools:
-{tools}
-
-Use the following format:
-
-Question: the input question you must answer
-Thought: you should always think about what to do
-Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action
-Observation: the result of the action
-... (this Thought/Action/Action Input/Observation can repeat N times)
-Thought: I now know the final answer
-Final Answer: the final answer to the original input question
-
-To achieve your goal, follow these steps:
-1. **Analyze Dataset**: Use `analyze_dataset` to inspect the dataset and generate data quality check definitions. You must wait for the analysis to complete and obtain the `check_definitions` JSON.
-2. **Perform Quality Checks**: Use `trigger_quality_checker` with the `data_ref` from step 1 and the `check_definitions` from step 1. You must wait for its completion and obtain the full quality results and return those results as 'quality_results'.
-3. **Report Results**: Use 'trigger_reporting_agent' to upload the results to goole cloud storage recieved from step 2. Pass 'quality_results' string from step 2 to reporting function.
-
-Begin!
-
-Question: {input}
-Thought:{agent_scratchpad}
-"""
-
-        agent_prompt = PromptTemplate.from_template(agent_prompt_template)
-        logger.info("Agent prompt template formatted successfully.")
-
-        LLM = _get_llm_client()
-        agent = create_react_agent(LLM, tools, agent_prompt)
-        _agent_executor_instance = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
-    return _agent_executor_instance
-
-# --- Cloud Function Entry Point ---
-def manager_agent_langchain(request):
-    """
-    Cloud Function for the LangChain-powered Manager Agent.
-    Triggered by HTTP or Pub/Sub (via push subscription).
-    """
-    if request.method == 'POST':
-        try:
-            request_json = request.get_json(silent=True)
-            if not request_json:
-                envelope = json.loads(request.data.decode('utf-8'))
-                message_data = base64.b64decode(envelope['message']['data']).decode('utf-8')
-                message = json.loads(message_data)
-            else:
-                message = request_json
-
-            event_type = message.get("event_type")
-            gcs_uri = message.get("gcs_uri")
-            job_id = message.get("job_id")
-
-            if not event_type or not gcs_uri:
-                raise ValueError("Missing required fields: event_type and gcs_uri")
-            if not gcs_uri.startswith("gs://"):
-                raise ValueError("Invalid GCS URI format")
-
-            if event_type == "file_landing":
-                logger.info(f"Manager Agent (LangChain) received file_landing event for Job ID: {job_id}, GCS URI: {gcs_uri}")
-                _update_job_status(job_id, "MANAGER_AGENT_STARTED", {"gcs_uri": gcs_uri})
-
-                goal = f"Ensure data quality for the file {gcs_uri} for job {job_id} and report any issues."
-
-                try:
-                    agent_executor = _get_agent_executor()
-                    result = agent_executor.invoke({"input": goal})
-                    logger.info(f"LangChain Agent finished job {job_id}. Final result: {result}")
-                    _update_job_status(job_id, "MANAGER_AGENT_COMPLETED", {"final_agent_output": result})
-                    return json.dumps({"status": "success", "job_id": job_id, "agent_output": result}), 200
-                except Exception as e:
-                    logger.error(f"Error running LangChain Agent for job {job_id}: {e}")
-                    _update_job_status(job_id, "MANAGER_AGENT_FAILED", {"error": str(e)})
-                    return json.dumps({"status": "error", "job_id": job_id, "message": str(e)}), 500
-
-            else:
-                logger.warning(f"Manager Agent received unhandled event type: {event_type} for job {job_id}")
-                return json.dumps({"status": "ignored", "message": f"Unhandled event type: {event_type}"}), 200
-
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Invalid request format: {e}")
-            return json.dumps({"status": "error", "message": f"Invalid request format: {str(e)}"}), 400
-        except Exception as e:
-            logger.error(f"Error in manager_agent_langchain function: {e}", exc_info=True)
-            return json.dumps({"status": "error", "message": str(e)}), 500
-    else:
-        return 'Only POST requests are accepted', 405
\ No newline at end of file
+import atexit
+import base64
+import contextvars
+import csv
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import logging
+
+
+PROJECT_ID = os.environ.get("PROJECT_ID", "qwiklabs-gcp-00-7a679581466f")
+
+# --- Configuration ---
+MANAGER_AGENT_COMMANDS_TOPIC = os.environ.get("MANAGER_AGENT_COMMANDS_TOPIC", "manager-agent-commands")
+DATA_INGESTION_TOPIC = os.environ.get("DATA_INGESTION_TOPIC", "data-ingestion-commands")
+QUALITY_CHECKER_TOPIC = os.environ.get("QUALITY_CHECKER_TOPIC", "quality-checker-commands")
+REPORTING_TOPIC = os.environ.get("REPORTING_TOPIC", "reporting-commands")
+ALERTING_TOPIC = os.environ.get("ALERTING_TOPIC", "alerting-commands")
+# "local" runs the checks in-process with the vectorized engine; "pubsub" hands them to the quality checker agent.
+QUALITY_CHECK_MODE = os.environ.get("QUALITY_CHECK_MODE", "local")
+# Quality reports are written per job under REPORT_BASE_URI (gs:// or local) as dt=<date>/dataset=<name>/<job_id>
+# in REPORT_FORMAT ("ndjson.gz" or "parquet"), with a per-day manifest of summaries under <base>/_manifest/dt=<date>/,
+# one small object per report (underscore-prefixed so partition discovery in pyarrow/Spark skips it).
+# REPORT_LEGACY_OUTPUT_URI additionally writes the whole report as JSON to one fixed location, e.g. .../output.json.
+REPORT_BASE_URI = os.environ.get("REPORT_BASE_URI", "gs://gcp31dqreportnomos/reports")
+REPORT_FORMAT = os.environ.get("REPORT_FORMAT", "ndjson.gz")
+REPORT_UPLOAD_CHUNK_BYTES = int(os.environ.get("REPORT_UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024))
+REPORT_LEGACY_OUTPUT_URI = os.environ.get("REPORT_LEGACY_OUTPUT_URI")
+# Per-check statistics of every uploaded report are appended to a SQLite time series at QUALITY_METRICS_DB_PATH
+# ("" disables it) with hourly and daily rollups maintained on insert. Raw points and hourly rollups are pruned
+# after their retention; daily rollups are kept. Instances sharing history need the file on shared storage.
+QUALITY_METRICS_DB_PATH = os.environ.get("QUALITY_METRICS_DB_PATH", "/tmp/quality_metrics.db")
+QUALITY_METRICS_RAW_RETENTION_DAYS = int(os.environ.get("QUALITY_METRICS_RAW_RETENTION_DAYS", 30))
+QUALITY_METRICS_HOURLY_RETENTION_DAYS = int(os.environ.get("QUALITY_METRICS_HOURLY_RETENTION_DAYS", 90))
+# In pubsub mode, fan the checks out as one message per this many columns (0 sends a single message per job).
+QUALITY_CHECK_SHARD_COLUMNS = int(os.environ.get("QUALITY_CHECK_SHARD_COLUMNS", 0))
+# Publisher batching, bounded in-flight flow control (publish blocks once a limit is hit) and retry backoff.
+PUBSUB_BATCH_MAX_MESSAGES = int(os.environ.get("PUBSUB_BATCH_MAX_MESSAGES", 100))
+PUBSUB_BATCH_MAX_BYTES = int(os.environ.get("PUBSUB_BATCH_MAX_BYTES", 1024 * 1024))
+PUBSUB_BATCH_MAX_LATENCY_SECONDS = float(os.environ.get("PUBSUB_BATCH_MAX_LATENCY_SECONDS", 0.01))
+PUBSUB_MAX_IN_FLIGHT_MESSAGES = int(os.environ.get("PUBSUB_MAX_IN_FLIGHT_MESSAGES", 1000))
+PUBSUB_MAX_IN_FLIGHT_BYTES = int(os.environ.get("PUBSUB_MAX_IN_FLIGHT_BYTES", 10 * 1024 * 1024))
+PUBSUB_RETRY_INITIAL_SECONDS = float(os.environ.get("PUBSUB_RETRY_INITIAL_SECONDS", 0.1))
+PUBSUB_RETRY_MAX_SECONDS = float(os.environ.get("PUBSUB_RETRY_MAX_SECONDS", 10))
+PUBSUB_PUBLISH_TIMEOUT_SECONDS = float(os.environ.get("PUBSUB_PUBLISH_TIMEOUT_SECONDS", 60))
+# Streaming profiler: rows per parsed chunk, bytes per GCS range read, and reservoir size (0 profiles the full file).
+PROFILE_CHUNK_ROWS = int(os.environ.get("PROFILE_CHUNK_ROWS", 100_000))
+PROFILE_READ_CHUNK_BYTES = int(os.environ.get("PROFILE_READ_CHUNK_BYTES", 8 * 1024 * 1024))
+PROFILE_SAMPLE_ROWS = int(os.environ.get("PROFILE_SAMPLE_ROWS", 0))
+# Analysis cache keyed by content hash: in-memory LRU size, plus an optional persistent tier
+# (gs://bucket/prefix or a local directory, bounded to ANALYSIS_CACHE_MAX_BYTES when local).
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", 256))
+ANALYSIS_CACHE_URI = os.environ.get("ANALYSIS_CACHE_URI")
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get("ANALYSIS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Per-dataset schema registry (gs://bucket/prefix or a local directory; empty disables it). A landing whose column
+# names and kinds, read from the file's metadata or its first SCHEMA_SAMPLE_ROWS rows, match the registered schema
+# reuses the registered check definitions; on drift only the added or retyped columns are re-profiled.
+SCHEMA_REGISTRY_URI = os.environ.get("SCHEMA_REGISTRY_URI", "/tmp/qualis_schema_registry")
+SCHEMA_SAMPLE_ROWS = int(os.environ.get("SCHEMA_SAMPLE_ROWS", 1_000))
+# Manager agent LLM response cache, keyed by the prompt with the job's ID and dataset URI normalized away plus the
+# dataset's schema fingerprint: an in-memory LRU and an optional persistent tier like the analysis cache. Responses
+# are only cached once their job succeeds.
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1024))
+LLM_CACHE_URI = os.environ.get("LLM_CACHE_URI")
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Agent prompt budget (estimated at 4 characters per token): each tool observation is cut to
+# AGENT_OBSERVATION_MAX_TOKENS, and the oldest ReAct steps are collapsed once the scratchpad exceeds
+# AGENT_SCRATCHPAD_MAX_TOKENS.
+AGENT_OBSERVATION_MAX_TOKENS = int(os.environ.get("AGENT_OBSERVATION_MAX_TOKENS", 400))
+AGENT_SCRATCHPAD_MAX_TOKENS = int(os.environ.get("AGENT_SCRATCHPAD_MAX_TOKENS", 2_000))
+# Incremental mode for append-only feeds: only rows past the stored watermark are checked.
+# Overridable per request via "incremental"; state lives under INCREMENTAL_STATE_URI (gs:// or local).
+INCREMENTAL_CHECKS = os.environ.get("INCREMENTAL_CHECKS", "false").lower() == "true"
+INCREMENTAL_STATE_URI = os.environ.get("INCREMENTAL_STATE_URI", "/tmp/qualis_incremental")
+# unique/cardinality checks run in "exact" (hash set) or "approximate" (Bloom filter / HyperLogLog) mode,
+# chosen per check with "mode". analyze_dataset emits approximate unique checks from APPROX_UNIQUE_MIN_ROWS rows.
+APPROX_UNIQUE_MIN_ROWS = int(os.environ.get("APPROX_UNIQUE_MIN_ROWS", 10_000_000))
+APPROX_ERROR_RATE = float(os.environ.get("APPROX_ERROR_RATE", 0.01))
+APPROX_DEFAULT_CAPACITY = int(os.environ.get("APPROX_DEFAULT_CAPACITY", 10_000_000))
+# Row-level checks (not_null, range, length) keep a uniform sample of this many violating rows per check,
+# written to a side file next to the report; values are truncated to FAILURE_SAMPLE_MAX_VALUE_CHARS.
+FAILURE_SAMPLE_ROWS = int(os.environ.get("FAILURE_SAMPLE_ROWS", 20))
+FAILURE_SAMPLE_MAX_VALUE_CHARS = int(os.environ.get("FAILURE_SAMPLE_MAX_VALUE_CHARS", 200))
+# Worker processes for check execution (1 runs in-process); chunks smaller than CHECK_PARALLEL_MIN_ROWS
+# are not worth shipping to the pool. Raise PROFILE_CHUNK_ROWS alongside CHECK_WORKERS.
+CHECK_WORKERS = int(os.environ.get("CHECK_WORKERS", 1))
+CHECK_PARALLEL_MIN_ROWS = int(os.environ.get("CHECK_PARALLEL_MIN_ROWS", 50_000))
+CHECK_WORKER_START_METHOD = os.environ.get("CHECK_WORKER_START_METHOD", "spawn")
+# Compiled check plans kept in memory, keyed by the check definitions and the profile statistics they were pruned with.
+CHECK_PLAN_CACHE_SIZE = int(os.environ.get("CHECK_PLAN_CACHE_SIZE", 256))
+# How long a tool waits for a remote agent to report completion (defaults to the old polling budget).
+JOB_WAIT_TIMEOUT_SECONDS = float(os.environ.get(
+    "JOB_WAIT_TIMEOUT_SECONDS",
+    int(os.environ.get("POLLING_MAX_ATTEMPTS", 30)) * float(os.environ.get("POLLING_INTERVAL_SECONDS", 2)),
+))
+# Longest gap between re-reads of the status store while waiting on a job, so transitions written by other
+# instances are seen even when no JOB_STATUS_SUBSCRIPTION delivers them. Re-reads back off from 0.5s up to this.
+JOB_WAIT_RECHECK_SECONDS = float(os.environ.get("JOB_WAIT_RECHECK_SECONDS", 5))
+# Subscription on which remote agents publish job status transitions ({"job_id", "status", ...}).
+JOB_STATUS_SUBSCRIPTION = os.environ.get("JOB_STATUS_SUBSCRIPTION")
+# Topic every status transition and check progress event seen by this instance is forwarded to, and the subscription
+# a dashboard follows it on. Events are notifications only: receivers never write them to the job status store.
+JOB_EVENTS_TOPIC = os.environ.get("JOB_EVENTS_TOPIC")
+JOB_EVENTS_SUBSCRIPTION = os.environ.get("JOB_EVENTS_SUBSCRIPTION")
+# Minimum seconds between QUALITY_CHECK_PROGRESS events (partial check results) of a running job; 0 disables them.
+CHECK_PROGRESS_INTERVAL_SECONDS = float(os.environ.get("CHECK_PROGRESS_INTERVAL_SECONDS", 1))
+# "agent" runs file_landing events through the ReAct agent; "direct" runs the fixed stage pipeline
+# and only calls the LLM when a stage fails or returns an ambiguous result. Overridable per request via "mode".
+MANAGER_AGENT_MODE = os.environ.get("MANAGER_AGENT_MODE", "agent")
+DIRECT_PIPELINE_LLM_FALLBACK = os.environ.get("DIRECT_PIPELINE_LLM_FALLBACK", "true").lower() == "true"
+# Jobs processed in parallel per instance, and how many more may wait before requests are rejected with 429.
+MANAGER_MAX_CONCURRENT_JOBS = int(os.environ.get("MANAGER_MAX_CONCURRENT_JOBS", 4))
+MANAGER_MAX_QUEUED_JOBS = int(os.environ.get("MANAGER_MAX_QUEUED_JOBS", 32))
+# Micro-batching of bursty landings (0 disables it): file_landing events under the same dataset prefix are collected
+# for MANAGER_BATCH_WINDOW_SECONDS, or until MANAGER_BATCH_MAX_FILES files or MANAGER_BATCH_MAX_BYTES (from the
+# event's "size") arrive, and run as one direct pipeline job with per-file breakdowns; per-request options do not
+# apply. Batched files are fetched by a shared pool of MANAGER_BATCH_DOWNLOAD_WORKERS concurrent downloads.
+MANAGER_BATCH_WINDOW_SECONDS = float(os.environ.get("MANAGER_BATCH_WINDOW_SECONDS", 0))
+MANAGER_BATCH_MAX_FILES = int(os.environ.get("MANAGER_BATCH_MAX_FILES", 1_000))
+MANAGER_BATCH_MAX_BYTES = int(os.environ.get("MANAGER_BATCH_MAX_BYTES", 256 * 1024 * 1024))
+MANAGER_BATCH_DOWNLOAD_WORKERS = int(os.environ.get("MANAGER_BATCH_DOWNLOAD_WORKERS", 16))
+# Job ID used when a tool is invoked outside of a manager job (e.g. manual testing).
+DEFAULT_JOB_ID = "test-job-123"
+# Job status backend: "memory" (per instance, LRU + TTL), "sqlite" (WAL file) or "redis" (shared across instances).
+JOB_STATUS_BACKEND = os.environ.get("JOB_STATUS_BACKEND", "memory")
+JOB_STATUS_SQLITE_PATH = os.environ.get("JOB_STATUS_SQLITE_PATH", "/tmp/job_status.db")
+JOB_STATUS_REDIS_URL = os.environ.get("JOB_STATUS_REDIS_URL")
+JOB_STATUS_POOL_SIZE = int(os.environ.get("JOB_STATUS_POOL_SIZE", 8))
+JOB_STATUS_MAX_ENTRIES = int(os.environ.get("JOB_STATUS_MAX_ENTRIES", 10_000))
+JOB_STATUS_TTL_SECONDS = int(os.environ.get("JOB_STATUS_TTL_SECONDS", 86_400))
+# Span export: "none", "file" (one OpenTelemetry JSON span per line in TRACING_FILE_PATH) or "otlp"
+# (OTLP/HTTP to TRACING_OTLP_ENDPOINT, e.g. a local collector). Metrics are always served on GET /metrics.
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none")
+TRACING_FILE_PATH = os.environ.get("TRACING_FILE_PATH", "/tmp/qualis_spans.jsonl")
+TRACING_OTLP_ENDPOINT = os.environ.get("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "manager-agent")
+# Heavy dependencies (langchain, google-genai, Pub/Sub, pandas, pyarrow) are imported on first use. MANAGER_WARMUP
+# builds the clients and agent at instance start instead: "off", "background" (daemon thread) or "blocking".
+MANAGER_WARMUP = os.environ.get("MANAGER_WARMUP", "off")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# GLOBAL CLIENTS AND STORAGE
+_publisher_client = None
+_topic_paths = {}  # topic name -> projects/<PROJECT_ID>/topics/<name>
+_storage_client = None
+_llm_client = None
+_tracer = None  # OpenTelemetry tracer, or False once tracing is disabled
+_agent_executor_instance = None
+_agent_executor_lock = threading.Lock()  # A background warm-up and the first request must not both build the agent
+_analysis_cache = None
+_llm_response_cache = None
+_check_process_pool = None
+_job_status_store = None  # JobStatusStore selected by JOB_STATUS_BACKEND
+_job_status_store_lock = threading.Lock()
+_quality_metrics_store = None  # QualityMetricsStore at QUALITY_METRICS_DB_PATH
+_quality_metrics_store_lock = threading.Lock()
+_job_waiters = {}  # job_id -> list of (awaited statuses, Future) registered by _register_job_waiter
+_job_waiters_lock = threading.Lock()
+_status_observers = []  # callbacks(job_id, status_data) run on every status transition seen by this process
+_status_listener_future = None
+_event_listener_future = None
+_job_executor = None
+_job_slots = None  # Bounds running + queued jobs so bursts get backpressure instead of unbounded queueing
+_job_executor_lock = threading.Lock()
+_download_executor = None
+_check_plans = OrderedDict()
+_check_plans_lock = threading.Lock()
+_landing_batcher = None
+_current_job = contextvars.ContextVar("current_job", default=None)  # job_id, gcs_uri and request options of the running job
+
+def _get_publisher_client():
+    """Initialize and return a batching Pub/Sub PublisherClient.
+
+    The client honors PUBSUB_EMULATOR_HOST, so it can be pointed at the Pub/Sub emulator.
+    """
+    global _publisher_client
+    if _publisher_client is None:
+        from google.api_core.retry import Retry
+        from google.cloud import pubsub_v1
+
+        types = pubsub_v1.types
+        _publisher_client = pubsub_v1.PublisherClient(
+            batch_settings=types.BatchSettings(
+                max_messages=PUBSUB_BATCH_MAX_MESSAGES,
+                max_bytes=PUBSUB_BATCH_MAX_BYTES,
+                max_latency=PUBSUB_BATCH_MAX_LATENCY_SECONDS,
+            ),
+            publisher_options=types.PublisherOptions(
+                flow_control=types.PublishFlowControl(
+                    message_limit=PUBSUB_MAX_IN_FLIGHT_MESSAGES,
+                    byte_limit=PUBSUB_MAX_IN_FLIGHT_BYTES,
+                    limit_exceeded_behavior=types.LimitExceededBehavior.BLOCK,
+                ),
+                retry=Retry(
+                    initial=PUBSUB_RETRY_INITIAL_SECONDS,
+                    maximum=PUBSUB_RETRY_MAX_SECONDS,
+                    multiplier=2.0,
+                    timeout=PUBSUB_PUBLISH_TIMEOUT_SECONDS,
+                ),
+            ),
+        )
+        # Flush batches still waiting for max_latency when the instance shuts down
+        atexit.register(_publisher_client.stop)
+    return _publisher_client
+
+def _get_storage_client():
+    """Initialize and return a Cloud Storage client."""
+    global _storage_client
+    if _storage_client is None:
+        from google.cloud import storage
+
+        _storage_client = storage.Client()
+    return _storage_client
+
+def _get_llm_client():
+    """Initialize and return a LangChain Google Generative AI client."""
+    global _llm_client
+    if _llm_client is None:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable is not set")
+        from langchain_core.callbacks import BaseCallbackHandler
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        callback = type("LLMTelemetryCallback", (_LLMTelemetryCallback, BaseCallbackHandler), {})()
+        _llm_client = ChatGoogleGenerativeAI(
+            model="gemini-2.5-pro", temperature=0.5, google_api_key=api_key, callbacks=[callback],
+        )
+    return _llm_client
+
+# --- Telemetry ---
+# Upper bounds of the histogram buckets, in seconds.
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRIC_DESCRIPTIONS = {
+    "qualis_rows_processed_total": ("counter", "Rows profiled or checked, by stage."),
+    "qualis_bytes_read_total": ("counter", "Dataset and state bytes read, by source."),
+    "qualis_llm_tokens_total": ("counter", "LLM tokens used, by kind."),
+    "qualis_llm_cache_total": ("counter", "Manager agent LLM calls, by response cache outcome."),
+    "qualis_pubsub_messages_total": ("counter", "Pub/Sub messages published, by topic and outcome."),
+    "qualis_pubsub_ack_seconds": ("histogram", "Time from publish to server ack, by topic."),
+    "qualis_report_bytes_total": ("counter", "Compressed quality report bytes written, by format."),
+    "qualis_jobs_total": ("counter", "Manager jobs finished, by mode and outcome."),
+    "qualis_span_seconds": ("histogram", "Duration of traced operations, by span name."),
+    "qualis_job_wait_seconds": ("histogram", "Time spent waiting for remote agents, by outcome."),
+}
+_metrics_lock = threading.Lock()
+_metric_counters = {}  # (name, sorted label items) -> value
+_metric_histograms = {}  # (name, sorted label items) -> [count per bucket..., +Inf count, sum]
+
+def _increment(name, value=1, **labels):
+    """Add `value` to a counter."""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metric_counters[key] = _metric_counters.get(key, 0) + value
+
+def _observe(name, value, **labels):
+    """Record one observation in a histogram."""
+    key = (name, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        histogram = _metric_histograms.get(key)
+        if histogram is None:
+            histogram = _metric_histograms[key] = [0] * (len(METRIC_BUCKETS) + 2)
+        for position, bound in enumerate(METRIC_BUCKETS):
+            if value <= bound:
+                histogram[position] += 1
+                break
+        else:
+            histogram[len(METRIC_BUCKETS)] += 1
+        histogram[-1] += value
+
+def _format_labels(labels, **extra):
+    """Format label pairs in the Prometheus text format, e.g. `{stage="check"}`."""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (f'{key}="{json.dumps(str(value))[1:-1]}"' for key, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+def _render_metrics():
+    """Render every counter and histogram in the Prometheus text exposition format."""
+    with _metrics_lock:
+        counters = sorted(_metric_counters.items())
+        histograms = sorted((key, list(values)) for key, values in _metric_histograms.items())
+
+    lines = []
+    described = set()
+    def describe(name):
+        if name not in described and name in METRIC_DESCRIPTIONS:
+            kind, description = METRIC_DESCRIPTIONS[name]
+            lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {kind}"])
+            described.add(name)
+
+    for (name, labels), value in counters:
+        describe(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), values in histograms:
+        describe(name)
+        cumulative = 0
+        for bound, count in zip(METRIC_BUCKETS + ("+Inf",), values[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def _get_tracer():
+    """Initialize and return the OpenTelemetry tracer, or None when tracing is disabled."""
+    global _tracer
+    if _tracer is None:
+        if TRACING_EXPORTER == "none":
+            _tracer = False
+            return None
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+            if TRACING_EXPORTER == "otlp":
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+                exporter = OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+            else:
+                exporter = ConsoleSpanExporter(
+                    out=open(TRACING_FILE_PATH, "a"),
+                    formatter=lambda span: span.to_json(indent=None) + "\n",
+                )
+            provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+            atexit.register(provider.shutdown)
+            _tracer = provider.get_tracer(__name__)
+        except Exception as e:
+            logger.error(f"Tracing disabled, could not set up the {TRACING_EXPORTER} exporter: {e}")
+            _tracer = False
+    return _tracer or None
+
+class _NoopSpan:
+    """Stands in for a span when tracing is disabled."""
+
+    def set_attribute(self, key, value):
+        pass
+
+@contextmanager
+def _span(name, **attributes):
+    """Trace a block as a span and record its duration in the qualis_span_seconds histogram.
+
+    Spans nest through the OpenTelemetry context, so a tool span started on a job thread
+    becomes the parent of the status, publish and LLM spans below it.
+
+    Args:
+        name (str): The span name, e.g. "pubsub.publish".
+        **attributes: Span attributes; None values are dropped.
+    """
+    tracer = _get_tracer()
+    started = time.perf_counter()
+    try:
+        if tracer is None:
+            yield _NoopSpan()
+        else:
+            attributes = {key: value for key, value in attributes.items() if value is not None}
+            with tracer.start_as_current_span(name, attributes=attributes) as span:
+                yield span
+    finally:
+        _observe("qualis_span_seconds", time.perf_counter() - started, span=name)
+
+class _CountingReader(io.BufferedIOBase):
+    """Binary file wrapper that adds the bytes read through it to qualis_bytes_read_total on close."""
+
+    def __init__(self, raw, source):
+        self._raw = raw
+        self._source = source
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._raw.seekable()
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def read1(self, size=-1):
+        return self.read(size)
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+    def readline(self, size=-1):
+        line = self._raw.readline(size)
+        self.bytes_read += len(line)
+        return line
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._raw.seek(offset, whence)
+
+    def tell(self):
+        return self._raw.tell()
+
+    def close(self):
+        if not self.closed:
+            _increment("qualis_bytes_read_total", self.bytes_read, source=self._source)
+            self._raw.close()
+        super().close()
+
+class _LLMTelemetryCallback:
+    """Trace every LLM call as an "llm.invoke" span and count the tokens it used.
+
+    Mixed into langchain_core's BaseCallbackHandler by `_get_llm_client`, so langchain is not
+    imported with this module.
+    """
+
+    def __init__(self):
+        self._calls = {}  # run_id -> (span or None, start time)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        tracer = _get_tracer()
+        span = tracer.start_span("llm.invoke", attributes={"llm.prompts": len(prompts)}) if tracer else None
+        self._calls[run_id] = (span, time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.on_llm_start(serialized, messages, run_id=run_id, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        _increment("qualis_llm_tokens_total", input_tokens, kind="input")
+        _increment("qualis_llm_tokens_total", output_tokens, kind="output")
+        self._finish(run_id, {"llm.input_tokens": input_tokens, "llm.output_tokens": output_tokens})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, {"error.type": type(error).__name__}, error)
+
+    def _finish(self, run_id, attributes, error=None):
+        span, started = self._calls.pop(run_id, (None, time.perf_counter()))
+        _observe("qualis_span_seconds", time.perf_counter() - started, span="llm.invoke")
+        if span is not None:
+            span.set_attributes(attributes)
+            if error is not None:
+                span.record_exception(error)
+            span.end()
+
+# --- Job Status Stores ---
+class JobStatusStore:
+    """Interface for job status backends.
+
+    Status dictionaries always carry a `status` key and a `timestamp`. `compare_and_set`
+    must be atomic across every process sharing the backend.
+    """
+
+    def get(self, job_id):
+        """Return the status dictionary of a job, or None if unknown or expired."""
+        raise NotImplementedError
+
+    def set(self, job_id, status_data):
+        """Unconditionally store the status dictionary of a job."""
+        raise NotImplementedError
+
+    def compare_and_set(self, job_id, expected_status, status_data):
+        """Store `status_data` only if the job's current status equals `expected_status`.
+
+        Args:
+            job_id (str): The unique identifier of the job.
+            expected_status (str | None): The required current status; None requires the job to be unknown.
+            status_data (dict): The new status dictionary.
+
+        Returns:
+            bool: True if the transition was applied.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist any buffered writes."""
+
+    def list_jobs(self, before=None, limit=100):
+        """List jobs by last update, newest first, ties broken by descending job ID.
+
+        Args:
+            before (tuple, optional): Only return jobs ordered after this (timestamp, job_id);
+                pass the last job of the previous page to page through. Jobs sharing a
+                timestamp across a page boundary are neither skipped nor repeated.
+            limit (int): The maximum number of jobs to return.
+
+        Returns:
+            list: (job_id, status dictionary) tuples.
+        """
+        raise NotImplementedError
+
+class InMemoryJobStatusStore(JobStatusStore):
+    """Per-instance store with LRU eviction beyond `max_entries` and TTL expiry."""
+
+    def __init__(self, max_entries=10_000, ttl_seconds=86_400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_locked(self, job_id):
+        status_data = self._entries.get(job_id)
+        if status_data is None:
+            return None
+        if self.ttl_seconds and time.time() - status_data["timestamp"] > self.ttl_seconds:
+            del self._entries[job_id]
+            return None
+        self._entries.move_to_end(job_id)
+        return status_data
+
+    def _set_locked(self, job_id, status_data):
+        self._entries[job_id] = status_data
+        self._entries.move_to_end(job_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get_locked(job_id)
+
+    def set(self, job_id, status_data):
+        with self._lock:
+            self._set_locked(job_id, status_data)
+
+    def compare_and_set(self, job_id, expected_status, status_data):
+        with self._lock:
+            current = self._get_locked(job_id)
+            if (current or {}).get("status") != expected_status:
+                return False
+            self._set_locked(job_id, status_data)
+            return True
+
+    def list_jobs(self, before=None, limit=100):
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            jobs = [
+                (job_id, status_data) for job_id, status_data in self._entries.items()
+                if status_data["timestamp"] >= oldest and (before is None or (status_data["timestamp"], job_id) < tuple(before))
+            ]
+        jobs.sort(key=lambda job: (job[1]["timestamp"], job[0]), reverse=True)
+        return jobs[:limit]
+
+class SQLiteJobStatusStore(JobStatusStore):
+    """SQLite store in WAL mode with a connection pool and batched writes.
+
+    Unconditional writes are buffered (later writes to the same job coalesce) and flushed in a
+    single transaction once `batch_size` are pending or every `flush_interval` seconds. Reads see
+    buffered writes. Compare-and-set is a conditional UPDATE, so it is atomic across processes
+    sharing the database file.
+    """
+
+    def __init__(self, path, pool_size=4, batch_size=64, flush_interval=0.5, ttl_seconds=86_400):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ttl_seconds = ttl_seconds
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._pending = {}
+        self._lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_status ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_status_updated_at ON job_status (updated_at)")
+        self._flusher = threading.Thread(target=self._flush_periodically, name="job-status-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Error flushing job statuses to {self.path}: {e}")
+
+    @contextmanager
+    def _transaction(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _write_locked(self, conn, rows):
+        """Write `rows` and drop expired jobs, inside a transaction opened by the caller."""
+        if rows:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_status (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                [(job_id, data["status"], json.dumps(data), data["timestamp"]) for job_id, data in rows],
+            )
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM job_status WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            with self._connection() as conn, self._transaction(conn):
+                self._write_locked(conn, list(self._pending.items()))
+            self._pending.clear()
+
+    def get(self, job_id):
+        with self._lock:
+            if job_id in self._pending:
+                return self._pending[job_id]
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM job_status WHERE job_id = ? AND updated_at >= ?",
+                (job_id, time.time() - self.ttl_seconds if self.ttl_seconds else 0),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, job_id, status_data):
+        with self._lock:
+            self._pending[job_id] = status_data
+            batch_full = len(self._pending) >= self.batch_size
+        if batch_full:
+            self.flush()
+
+    def compare_and_set(self, job_id, expected_status, status_data):
+        params = (status_data["status"], json.dumps(status_data), status_data["timestamp"], job_id)
+        # Buffered transitions are written and expired jobs dropped in the same transaction as the
+        # conditional write, so neither a pending set() nor an expired row can change its outcome
+        with self._lock:
+            with self._connection() as conn, self._transaction(conn):
+                self._write_locked(conn, list(self._pending.items()))
+                if expected_status is None:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO job_status (status, data, updated_at, job_id) VALUES (?, ?, ?, ?)", params
+                    )
+                else:
+                    cursor = conn.execute(
+                        "UPDATE job_status SET status = ?, data = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                        params + (expected_status,),
+                    )
+            self._pending.clear()
+        return cursor.rowcount == 1
+
+    def list_jobs(self, before=None, limit=100):
+        self.flush()
+        updated_at, job_id = (float("inf"), "") if before is None else before
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT job_id, data FROM job_status WHERE updated_at >= ? AND (updated_at < ? OR (updated_at = ? AND job_id < ?)) "
+                "ORDER BY updated_at DESC, job_id DESC LIMIT ?",
+                (time.time() - self.ttl_seconds if self.ttl_seconds else 0, updated_at, updated_at, job_id, limit),
+            ).fetchall()
+        return [(job_id, json.loads(data)) for job_id, data in rows]
+
+class RedisJobStatusStore(JobStatusStore):
+    """Store for Redis or any Redis-compatible server (Valkey, KeyDB, Memorystore).
+
+    Connections come from a shared pool; compare-and-set uses an optimistic WATCH/MULTI
+    transaction. Every write also scores the job by timestamp in a sorted set at `index_key`,
+    so jobs can be listed by recency without scanning keys. Pass `client` to use an existing
+    client, such as fakeredis in local tests.
+    """
+
+    def __init__(self, url=None, client=None, pool_size=8, ttl_seconds=86_400, key_prefix="job_status:", index_key="job_status_index"):
+        if client is None:
+            import redis
+
+            client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(url, max_connections=pool_size))
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.index_key = index_key
+
+    def _key(self, job_id):
+        return f"{self.key_prefix}{job_id}"
+
+    def get(self, job_id):
+        raw = self.client.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def set(self, job_id, status_data):
+        with self.client.pipeline() as pipe:
+            pipe.set(self._key(job_id), json.dumps(status_data), ex=self.ttl_seconds or None)
+            pipe.zadd(self.index_key, {job_id: status_data["timestamp"]})
+            pipe.execute()
+
+    def compare_and_set(self, job_id, expected_status, status_data):
+        from redis.exceptions import WatchError
+
+        key = self._key(job_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                raw = pipe.get(key)
+                current_status = json.loads(raw)["status"] if raw else None
+                if current_status != expected_status:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(key, json.dumps(status_data), ex=self.ttl_seconds or None)
+                pipe.zadd(self.index_key, {job_id: status_data["timestamp"]})
+                pipe.execute()
+                return True
+            except WatchError:
+                # Another writer changed the job between WATCH and EXEC
+                return False
+
+    def list_jobs(self, before=None, limit=100):
+        if self.ttl_seconds:
+            self.client.zremrangebyscore(self.index_key, "-inf", f"({time.time() - self.ttl_seconds}")
+        # Members with equal scores come back in descending job ID order, so only those sharing the
+        # cursor's timestamp need filtering; the score bound is inclusive to keep them
+        job_ids = []
+        offset = 0
+        while len(job_ids) < limit:
+            members = self.client.zrevrangebyscore(
+                self.index_key, "+inf" if before is None else before[0], "-inf", start=offset, num=limit, withscores=True
+            )
+            offset += len(members)
+            for member, score in members:
+                job_id = member.decode("utf-8") if isinstance(member, bytes) else member
+                if before is None or (score, job_id) < tuple(before):
+                    job_ids.append(job_id)
+            if len(members) < limit:
+                break
+        job_ids = job_ids[:limit]
+        if not job_ids:
+            return []
+        values = self.client.mget([self._key(job_id) for job_id in job_ids])
+        return [(job_id, json.loads(raw)) for job_id, raw in zip(job_ids, values) if raw]
+
+def _create_job_status_store():
+    """Build the job status store selected by JOB_STATUS_BACKEND."""
+    if JOB_STATUS_BACKEND == "memory":
+        return InMemoryJobStatusStore(max_entries=JOB_STATUS_MAX_ENTRIES, ttl_seconds=JOB_STATUS_TTL_SECONDS)
+    if JOB_STATUS_BACKEND == "sqlite":
+        return SQLiteJobStatusStore(JOB_STATUS_SQLITE_PATH, pool_size=JOB_STATUS_POOL_SIZE, ttl_seconds=JOB_STATUS_TTL_SECONDS)
+    if JOB_STATUS_BACKEND == "redis":
+        if not JOB_STATUS_REDIS_URL:
+            raise ValueError("JOB_STATUS_REDIS_URL environment variable is not set")
+        return RedisJobStatusStore(JOB_STATUS_REDIS_URL, pool_size=JOB_STATUS_POOL_SIZE, ttl_seconds=JOB_STATUS_TTL_SECONDS)
+    raise ValueError(f"Unknown JOB_STATUS_BACKEND: {JOB_STATUS_BACKEND}")
+
+def _get_job_status_store():
+    """Initialize and return the job status store."""
+    global _job_status_store
+    if _job_status_store is None:
+        with _job_status_store_lock:
+            if _job_status_store is None:
+                _job_status_store = _create_job_status_store()
+    return _job_status_store
+
+# Helper functions for job status storage
+def _get_job_status(job_id):
+    """Retrieve the status of a job from the configured job status store.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+
+    Returns:
+        dict: The job status dictionary, or None if not found.
+    """
+    try:
+        with _span("status.get", job_id=job_id):
+            return _get_job_status_store().get(job_id)
+    except Exception as e:
+        logger.error(f"Error reading job status for {job_id}: {e}")
+    return None
+
+def _build_status_data(status, details=None):
+    """Build a job status dictionary stamped with the current time."""
+    status_data = {
+        "status": status,
+        "timestamp": time.time(),
+    }
+    if details:
+        status_data.update(details)
+    return status_data
+
+def _update_job_status(job_id, status, details=None):
+    """Update the status of a job in the configured job status store.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        status (str): The new status of the job.
+        details (dict, optional): Additional details to store with the status.
+    """
+    status_data = _build_status_data(status, details)
+    try:
+        with _span("status.set", job_id=job_id, status=status):
+            _get_job_status_store().set(job_id, status_data)
+        logger.info(f"Job {job_id} status updated to: {status}")
+    except Exception as e:
+        logger.error(f"Error writing job status for {job_id}: {e}")
+    _notify_job_waiters(job_id, status_data)
+    _notify_status_observers(job_id, status_data)
+
+def _transition_job_status(job_id, expected_status, status, details=None):
+    """Atomically move a job from `expected_status` to `status`.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        expected_status (str | None): The status the job must currently have; None if it must be unknown.
+        status (str): The new status of the job.
+        details (dict, optional): Additional details to store with the status.
+
+    Returns:
+        bool: True if the transition was applied, False if the job had a different status.
+    """
+    status_data = _build_status_data(status, details)
+    with _span("status.compare_and_set", job_id=job_id, status=status):
+        applied = _get_job_status_store().compare_and_set(job_id, expected_status, status_data)
+    if not applied:
+        return False
+    logger.info(f"Job {job_id} status transitioned from {expected_status} to: {status}")
+    _notify_job_waiters(job_id, status_data)
+    _notify_status_observers(job_id, status_data)
+    return True
+
+# --- Job Completion Notifications ---
+def _is_failed_status(status):
+    """Return True for terminal failure statuses such as QUALITY_CHECKS_FAILED."""
+    return bool(status) and status.endswith("_FAILED")
+
+def _register_job_waiter(job_id, statuses):
+    """Register a future that resolves when the job reaches one of `statuses` or fails.
+
+    The waiter is registered before the store is read, so a transition that lands between
+    the two still wakes it. The store is read outside the registry lock.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        statuses (iterable): The statuses to wait for.
+
+    Returns:
+        concurrent.futures.Future: Resolves with the job status dictionary.
+    """
+    statuses = frozenset(statuses)
+    future = Future()
+    with _job_waiters_lock:
+        _job_waiters.setdefault(job_id, []).append((statuses, future))
+    _recheck_job_waiter(job_id, statuses, future)
+    return future
+
+def _recheck_job_waiter(job_id, statuses, future):
+    """Resolve `future` from the status store if the job already reached one of `statuses` or failed.
+
+    Returns:
+        bool: True if the future is resolved.
+    """
+    current = _get_job_status(job_id)
+    if current and (current.get("status") in statuses or _is_failed_status(current.get("status"))):
+        _unregister_job_waiter(job_id, future)
+        if not future.done():
+            try:
+                future.set_result(current)
+            except InvalidStateError:  # Resolved by a notification in the meantime
+                pass
+    return future.done()
+
+def _job_wait_intervals(timeout):
+    """Yield the seconds to wait before each re-read of the status store, backing off up to JOB_WAIT_RECHECK_SECONDS."""
+    deadline = time.monotonic() + timeout
+    interval = min(0.5, JOB_WAIT_RECHECK_SECONDS)
+    remaining = timeout
+    while remaining > 0:
+        yield min(interval, remaining)
+        remaining = deadline - time.monotonic()
+        interval = min(interval * 2, JOB_WAIT_RECHECK_SECONDS)
+
+def _unregister_job_waiter(job_id, future):
+    """Drop a waiter that timed out or was cancelled."""
+    with _job_waiters_lock:
+        waiters = _job_waiters.get(job_id, [])
+        waiters[:] = [waiter for waiter in waiters if waiter[1] is not future]
+        if not waiters:
+            _job_waiters.pop(job_id, None)
+
+def _notify_job_waiters(job_id, status_data):
+    """Wake every waiter on `job_id` whose awaited status was just reached."""
+    status = status_data.get("status")
+    with _job_waiters_lock:
+        waiters = _job_waiters.get(job_id)
+        if not waiters:
+            return
+        ready = [future for statuses, future in waiters if status in statuses or _is_failed_status(status)]
+        waiters[:] = [waiter for waiter in waiters if waiter[1] not in ready]
+        if not waiters:
+            _job_waiters.pop(job_id, None)
+    for future in ready:
+        if not future.done():
+            try:
+                future.set_result(status_data)
+            except InvalidStateError:  # Resolved by a store re-read in the meantime
+                pass
+
+def _add_status_observer(callback):
+    """Call `callback(job_id, status_data)` on every status transition seen by this process.
+
+    With JOB_STATUS_SUBSCRIPTION configured this includes transitions made on other instances,
+    so a dashboard can invalidate caches or push updates without polling the store.
+    """
+    with _job_waiters_lock:
+        _status_observers.append(callback)
+
+def _remove_status_observer(callback):
+    """Stop calling a callback registered with `_add_status_observer`."""
+    with _job_waiters_lock:
+        if callback in _status_observers:
+            _status_observers.remove(callback)
+
+def _notify_status_observers(job_id, status_data, forward=True):
+    """Pass a status transition to every registered observer; a failing observer is logged and skipped.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        status_data (dict): The status dictionary.
+        forward (bool): Also publish the transition to JOB_EVENTS_TOPIC, if configured.
+    """
+    for callback in list(_status_observers):
+        try:
+            callback(job_id, status_data)
+        except Exception as e:
+            logger.error(f"Error in job status observer {callback!r} for {job_id}: {e}")
+    if forward and JOB_EVENTS_TOPIC:
+        try:
+            _publish_message_async(JOB_EVENTS_TOPIC, {**status_data, "job_id": job_id})
+        except Exception as e:
+            logger.error(f"Error forwarding job event for {job_id} to {JOB_EVENTS_TOPIC}: {e}")
+
+def _wait_for_job_status(job_id, statuses, timeout=None):
+    """Block until the job reaches one of `statuses` (or fails).
+
+    Waiters are woken by transitions seen in this process; the status store is also re-read
+    with backoff, so transitions made by other instances are picked up without a subscription.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        statuses (iterable): The statuses to wait for.
+        timeout (float, optional): Seconds to wait. Defaults to JOB_WAIT_TIMEOUT_SECONDS.
+
+    Returns:
+        dict: The job status dictionary, or None if the timeout expired first.
+    """
+    timeout = JOB_WAIT_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.perf_counter()
+    statuses = frozenset(statuses)
+    with _span("job.wait", job_id=job_id, statuses=",".join(sorted(statuses))) as span:
+        future = _register_job_waiter(job_id, statuses)
+        for interval in _job_wait_intervals(timeout):
+            try:
+                future.result(timeout=interval)
+                break
+            except FutureTimeoutError:
+                if _recheck_job_waiter(job_id, statuses, future):
+                    break
+        if future.done():
+            status = future.result()
+        else:
+            _unregister_job_waiter(job_id, future)
+            logger.warning(f"Timed out after {timeout}s waiting for job {job_id} to reach {sorted(statuses)}")
+            status = None
+        span.set_attribute("outcome", "timeout" if status is None else status["status"])
+    _observe("qualis_job_wait_seconds", time.perf_counter() - started, outcome="timeout" if status is None else "reached")
+    return status
+
+async def _async_wait_for_job_status(job_id, statuses, timeout=None):
+    """Asyncio variant of `_wait_for_job_status`, so one event loop can wait on many jobs at once.
+
+    Example:
+        await asyncio.gather(*(_async_wait_for_job_status(j, {"REPORTING_COMPLETED"}) for j in job_ids))
+    """
+    import asyncio
+
+    timeout = JOB_WAIT_TIMEOUT_SECONDS if timeout is None else timeout
+    statuses = frozenset(statuses)
+    started = time.perf_counter()
+    future = _register_job_waiter(job_id, statuses)
+    waiting = asyncio.wrap_future(future)
+    for interval in _job_wait_intervals(timeout):
+        done, _ = await asyncio.wait({waiting}, timeout=interval)
+        if done or await asyncio.to_thread(_recheck_job_waiter, job_id, statuses, future):
+            break
+    if future.done():
+        status = future.result()
+    else:
+        _unregister_job_waiter(job_id, future)
+        logger.warning(f"Timed out after {timeout}s waiting for job {job_id} to reach {sorted(statuses)}")
+        status = None
+    _observe("qualis_job_wait_seconds", time.perf_counter() - started, outcome="timeout" if status is None else "reached")
+    return status
+
+def _handle_job_status_message(message):
+    """Apply a job status transition received from the status subscription and ack it.
+
+    Args:
+        message: A Pub/Sub message whose data is JSON with `job_id`, `status` and optional details.
+    """
+    try:
+        payload = json.loads(message.data.decode("utf-8"))
+        job_id = payload.pop("job_id")
+        status = payload.pop("status")
+    except (ValueError, KeyError) as e:
+        logger.error(f"Discarding malformed job status message: {e}")
+        message.ack()
+        return
+    payload.pop("timestamp", None)
+    _update_job_status(job_id, status, payload)
+    message.ack()
+
+def _handle_job_event_message(message):
+    """Pass a job event received from the events subscription to the status observers and ack it."""
+    try:
+        payload = json.loads(message.data.decode("utf-8"))
+        job_id = payload.pop("job_id")
+        if "status" not in payload:
+            raise KeyError("status")
+    except (ValueError, KeyError) as e:
+        logger.error(f"Discarding malformed job event: {e}")
+        message.ack()
+        return
+    _notify_status_observers(job_id, payload, forward=False)
+    message.ack()
+
+def _start_job_status_listener():
+    """Start streaming job status transitions from JOB_STATUS_SUBSCRIPTION, once per instance.
+
+    Honors PUBSUB_EMULATOR_HOST, so a local Pub/Sub emulator can stand in for the real service.
+
+    Returns:
+        The streaming pull future, or None when no subscription is configured.
+    """
+    global _status_listener_future
+    if _status_listener_future is None and JOB_STATUS_SUBSCRIPTION:
+        from google.cloud import pubsub_v1
+
+        subscriber = pubsub_v1.SubscriberClient()
+        subscription_path = JOB_STATUS_SUBSCRIPTION
+        if "/" not in subscription_path:
+            subscription_path = subscriber.subscription_path(PROJECT_ID, subscription_path)
+        _status_listener_future = subscriber.subscribe(subscription_path, callback=_handle_job_status_message)
+        logger.info(f"Listening for job status transitions on {subscription_path}")
+    return _status_listener_future
+
+def _start_job_event_listener():
+    """Start streaming job events from JOB_EVENTS_SUBSCRIPTION to the status observers, once per process.
+
+    Returns:
+        The streaming pull future, or None when no subscription is configured.
+    """
+    global _event_listener_future
+    if _event_listener_future is None and JOB_EVENTS_SUBSCRIPTION:
+        from google.cloud import pubsub_v1
+
+        subscriber = pubsub_v1.SubscriberClient()
+        subscription_path = JOB_EVENTS_SUBSCRIPTION
+        if "/" not in subscription_path:
+            subscription_path = subscriber.subscription_path(PROJECT_ID, subscription_path)
+        _event_listener_future = subscriber.subscribe(subscription_path, callback=_handle_job_event_message)
+        logger.info(f"Listening for job events on {subscription_path}")
+    return _event_listener_future
+
+# --- Approximate Distinct Sketches ---
+def _bloom_state(capacity, error_rate):
+    """Return an empty Bloom filter sized for `capacity` distinct values at `error_rate` false positives."""
+    import numpy as np
+
+    num_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    num_bits += -num_bits % 8
+    num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+    return {"bloom": np.zeros(num_bits // 8, dtype=np.uint8), "bloom_hashes": num_hashes, "inserted": 0}
+
+def _bloom_add(state, hashes):
+    """Insert 64-bit value hashes into a Bloom filter state.
+
+    Positions come from double hashing on the two 32-bit halves of each hash.
+
+    Returns:
+        int: How many of the values were (probably) already present, including repeats within `hashes`.
+    """
+    import numpy as np
+
+    unique_hashes, counts = np.unique(hashes, return_counts=True)
+    bits = state["bloom"]
+    num_bits = np.uint64(len(bits) * 8)
+    h1 = unique_hashes & np.uint64(0xFFFFFFFF)
+    h2 = (unique_hashes >> np.uint64(32)) | np.uint64(1)
+    rounds = np.arange(state["bloom_hashes"], dtype=np.uint64)
+    positions = (h1[:, None] + rounds[None, :] * h2[:, None]) % num_bits
+    byte_index = (positions >> np.uint64(3)).astype(np.intp)
+    bit_mask = (np.uint64(1) << (positions & np.uint64(7))).astype(np.uint8)
+    present = np.all(bits[byte_index] & bit_mask, axis=1)
+    np.bitwise_or.at(bits, byte_index.ravel(), bit_mask.ravel())
+    state["inserted"] += int(len(unique_hashes) - np.count_nonzero(present))
+    return int((counts - 1).sum()) + int(np.count_nonzero(present))
+
+def _hll_registers(error_rate):
+    """Return empty HyperLogLog registers for a relative standard error of `error_rate`."""
+    import numpy as np
+
+    precision = min(18, max(7, math.ceil(math.log2((1.04 / error_rate) ** 2))))
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+def _bit_length64(values):
+    """Vectorized int.bit_length() for an array of uint64."""
+    import numpy as np
+
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        large = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[large] += shift
+        values[large] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+def _hll_add(registers, hashes):
+    """Fold 64-bit value hashes into HyperLogLog registers in place."""
+    import numpy as np
+
+    precision = int(len(registers)).bit_length() - 1
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    remainder = hashes << np.uint64(precision)
+    rank = np.minimum(65 - _bit_length64(remainder), 64 - precision + 1).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+def _hll_estimate(registers):
+    """Estimate the number of distinct values folded into HyperLogLog registers."""
+    import numpy as np
+
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+    return int(round(estimate))
+
+# --- Quality Check Engine ---
+CHECK_OUTCOME_PASS = "pass"
+CHECK_OUTCOME_FAIL = "fail"
+
+# Checks whose violations are tied to individual rows, and so can be sampled.
+SAMPLED_CHECK_TYPES = ("not_null", "range", "length")
+
+# Fallback used when no analysis results are available for the job.
+DEFAULT_CHECK_DEFINITIONS = [
+    {"type": "not_null", "column": "id", "threshold": 0.0},
+    {"type": "range", "column": "id", "min": 0.9, "max": 5.5},
+    {"type": "not_null", "column": "name", "threshold": 0.0},
+    {"type": "length", "column": "name", "max_length": 17},
+    {"type": "not_null", "column": "age", "threshold": 0.0},
+    {"type": "range", "column": "age", "min": 21.6, "max": 46.2},
+    {"type": "not_null", "column": "city", "threshold": 0.0},
+    {"type": "length", "column": "city", "max_length": 21},
+]
+
+def _parse_check_definitions(check_definitions):
+    """Normalise check definitions into a list of check dictionaries.
+
+    Args:
+        check_definitions (str | dict | list): The `{"checks": [...]}` document produced by
+            analyze_dataset, a bare list of checks, or either of those as a JSON string.
+
+    Returns:
+        list: The list of check dictionaries.
+    """
+    if isinstance(check_definitions, (str, bytes)):
+        check_definitions = json.loads(check_definitions)
+    if isinstance(check_definitions, dict):
+        check_definitions = check_definitions.get("checks", [])
+    if not isinstance(check_definitions, list):
+        raise ValueError("check_definitions must be a list of checks or an object with a 'checks' list")
+    return check_definitions
+
+def _pluralize(count, noun):
+    """Return '<count> <noun>' with the noun pluralized when needed."""
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+def _check_result(check, details=None, metrics=None):
+    """Build a single entry of the report `results` list."""
+    result = {"check": check, "outcome": CHECK_OUTCOME_FAIL if details else CHECK_OUTCOME_PASS}
+    if details:
+        result["details"] = details
+    if metrics is not None:
+        result["metrics"] = metrics
+    return result
+
+def _new_check_state(check):
+    """Return the empty aggregate state for a check.
+
+    States only hold counters plus, for `unique` and `cardinality` checks, either the distinct
+    value hashes (exact mode) or a fixed-size Bloom filter / HyperLogLog sketch (approximate
+    mode), so the states of consecutive chunks or runs fold into the result of a single full pass.
+    """
+    check_type = check.get("type")
+    approximate = check.get("mode") == "approximate"
+    error_rate = float(check.get("error_rate", APPROX_ERROR_RATE))
+    state = {"rows": 0, "missing": False}
+    if check_type == "not_null":
+        state["nulls"] = 0
+    elif check_type == "range":
+        state.update(out_of_range=0, non_numeric=0)
+    elif check_type == "length":
+        state["too_long"] = 0
+    elif check_type == "unique" and approximate:
+        state.update(non_null=0, duplicates=0, **_bloom_state(int(check.get("capacity", APPROX_DEFAULT_CAPACITY)), error_rate))
+    elif check_type == "cardinality" and approximate:
+        state.update(non_null=0, hll=_hll_registers(error_rate))
+    elif check_type in ("unique", "cardinality"):
+        state.update(non_null=0, distinct=None, pending=[])
+    if check_type in SAMPLED_CHECK_TYPES and FAILURE_SAMPLE_ROWS > 0:
+        import numpy as np
+
+        state.update(
+            sample_priority=np.empty(0, dtype="float64"),
+            sample_row=np.empty(0, dtype="int64"),
+            sample_value=np.empty(0, dtype=str),
+        )
+    return state
+
+def _merge_failure_sample(state, priorities, rows, values):
+    """Merge sampled violations into a check's failure sample, keeping the FAILURE_SAMPLE_ROWS lowest priorities."""
+    import numpy as np
+
+    priorities = np.concatenate([state["sample_priority"], priorities])
+    rows = np.concatenate([state["sample_row"], rows])
+    values = np.concatenate([state["sample_value"], values])
+    if len(priorities) > FAILURE_SAMPLE_ROWS:
+        keep = np.argpartition(priorities, FAILURE_SAMPLE_ROWS)[:FAILURE_SAMPLE_ROWS]
+        priorities, rows, values = priorities[keep], rows[keep], values[keep]
+    state.update(sample_priority=priorities, sample_row=rows, sample_value=values)
+
+def _sample_failures(state, positions, row_offset, series=None):
+    """Fold the violating rows of a chunk into a check's fixed-size failure sample.
+
+    Every violation draws a uniform random priority and the lowest FAILURE_SAMPLE_ROWS are kept
+    (bottom-k sampling), which yields a uniform sample of all violations and merges across chunks,
+    partitions and incremental runs. Only candidates that beat the current sample are converted
+    to strings, so memory stays bounded however many rows fail.
+
+    Args:
+        state (dict): The check state, updated in place.
+        positions (numpy.ndarray): Positions of the violating rows within the chunk.
+        row_offset (int): Row number of the first row of the chunk in the dataset.
+        series (pandas.Series, optional): The column values; omitted for null violations.
+    """
+    import numpy as np
+
+    priorities = np.random.default_rng().random(len(positions))
+    if len(state["sample_priority"]) >= FAILURE_SAMPLE_ROWS:
+        candidates = priorities < state["sample_priority"].max()
+        positions, priorities = positions[candidates], priorities[candidates]
+    if len(priorities) > FAILURE_SAMPLE_ROWS:
+        best = np.argpartition(priorities, FAILURE_SAMPLE_ROWS)[:FAILURE_SAMPLE_ROWS]
+        positions, priorities = positions[best], priorities[best]
+    if not len(positions):
+        return
+    if series is None:
+        values = np.full(len(positions), "", dtype=str)
+    else:
+        values = series.iloc[positions].astype(str).str.slice(0, FAILURE_SAMPLE_MAX_VALUE_CHARS).to_numpy(dtype=str)
+    _merge_failure_sample(state, priorities, row_offset + positions.astype("int64"), values)
+
+def _range_bounds(check):
+    """Return the (min, max) bounds of a range check as floats; a missing or null bound is unbounded."""
+    low, high = check.get("min"), check.get("max")
+    return float("-inf") if low is None else float(low), float("inf") if high is None else float(high)
+
+def _update_column_check_states(series, checks, states, row_offset=0, shared=None):
+    """Fold one chunk of a column into the states of every check on that column.
+
+    The null mask, numeric cast, text of the non-null values, string lengths and value hashes
+    are computed at most once per column and shared by all checks that need them.
+
+    Args:
+        series (pandas.Series): The column values of the chunk.
+        checks (list): The checks that reference this column.
+        states (list): The aggregate state of each check, updated in place.
+        row_offset (int): Row number of the first row of the chunk, used for failure samples.
+        shared (iterable, optional): The shared values to compute, as listed in a check plan.
+            Defaults to those the checks need.
+    """
+    import numpy as np
+    import pandas as pd
+
+    shared = set(_column_shared_values(checks) if shared is None else shared)
+    null_mask = series.isna().to_numpy()
+    null_count = int(np.count_nonzero(null_mask))
+    numeric = None
+    if "numeric" in shared:
+        numeric = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    text = series[~null_mask].astype(str) if "text" in shared else None
+    lengths = text.str.len().to_numpy() if "lengths" in shared else None
+    hashes = pd.util.hash_pandas_object(text, index=False).to_numpy() if "hashes" in shared else None
+
+    for check, state in zip(checks, states):
+        check_type = check.get("type")
+        state["rows"] += len(series)
+
+        sampled = "sample_row" in state
+
+        if check_type == "not_null":
+            state["nulls"] += null_count
+            if sampled and null_count:
+                _sample_failures(state, np.flatnonzero(null_mask), row_offset)
+
+        elif check_type == "range":
+            valid = ~np.isnan(numeric)
+            min_val, max_val = _range_bounds(check)
+            out_of_range = valid & ((numeric < min_val) | (numeric > max_val))
+            non_numeric = ~valid & ~null_mask
+            out_of_range_count = int(np.count_nonzero(out_of_range))
+            non_numeric_count = int(np.count_nonzero(non_numeric))
+            state["out_of_range"] += out_of_range_count
+            state["non_numeric"] += non_numeric_count
+            if sampled and (out_of_range_count or non_numeric_count):
+                _sample_failures(state, np.flatnonzero(out_of_range | non_numeric), row_offset, series)
+
+        elif check_type == "length":
+            too_long = lengths > int(check.get("max_length", 0))
+            too_long_count = int(np.count_nonzero(too_long))
+            state["too_long"] += too_long_count
+            if sampled and too_long_count:
+                _sample_failures(state, np.flatnonzero(~null_mask)[too_long], row_offset, series)
+
+        elif check_type in ("unique", "cardinality"):
+            state["non_null"] += len(hashes)
+            if "bloom" in state:
+                state["duplicates"] += _bloom_add(state, hashes)
+            elif "hll" in state:
+                _hll_add(state["hll"], hashes)
+            else:
+                state["pending"].append(hashes)
+
+def _compact_unique_state(state):
+    """Fold the pending value hashes of an exact `unique`/`cardinality` check into its sorted distinct set."""
+    import numpy as np
+
+    if state["pending"]:
+        parts = state["pending"] if state["distinct"] is None else [state["distinct"], *state["pending"]]
+        state["distinct"] = np.unique(np.concatenate(parts))
+        state["pending"] = []
+
+def _check_state_details(check, state):
+    """Turn an aggregate check state into the failure details, or None if the check passed."""
+    if state["missing"]:
+        return f"Column '{check.get('column')}' not found in dataset."
+    check_type = check.get("type")
+
+    if check_type == "not_null":
+        threshold = float(check.get("threshold", 0.0))
+        null_ratio = state["nulls"] / state["rows"] if state["rows"] else 0.0
+        if null_ratio > threshold:
+            return f"Found {_pluralize(state['nulls'], 'null value')}."
+        return None
+
+    if check_type == "range":
+        problems = []
+        if state["out_of_range"]:
+            problems.append(f"Found {_pluralize(state['out_of_range'], 'value')} outside the range.")
+        if state["non_numeric"]:
+            problems.append(f"Found {_pluralize(state['non_numeric'], 'non-numeric value')}.")
+        return " ".join(problems) or None
+
+    if check_type == "length":
+        if state["too_long"]:
+            return f"Found {_pluralize(state['too_long'], 'value')} with length greater than {int(check.get('max_length', 0))}."
+        return None
+
+    if check_type == "unique":
+        if "bloom" in state:
+            if not state["duplicates"]:
+                return None
+            error_rate = float(check.get("error_rate", APPROX_ERROR_RATE))
+            details = f"Found approximately {_pluralize(state['duplicates'], 'duplicate value')} (false positive rate {error_rate:.2%})."
+            if state["inserted"] > int(check.get("capacity", APPROX_DEFAULT_CAPACITY)):
+                details += " Filter capacity exceeded, so the false positive rate is higher than configured."
+            return details
+        _compact_unique_state(state)
+        distinct = 0 if state["distinct"] is None else len(state["distinct"])
+        duplicates = state["non_null"] - distinct
+        if duplicates:
+            return f"Found {_pluralize(duplicates, 'duplicate value')}."
+        return None
+
+    if check_type == "cardinality":
+        if "hll" in state:
+            distinct, qualifier = _hll_estimate(state["hll"]), "approximately "
+        else:
+            _compact_unique_state(state)
+            distinct, qualifier = (0 if state["distinct"] is None else len(state["distinct"])), ""
+        low, high = check.get("min"), check.get("max")
+        if (low is not None and distinct < low) or (high is not None and distinct > high):
+            expected = f"between {low} and {high}" if low is not None and high is not None else (
+                f"at least {low}" if low is not None else f"at most {high}")
+            return f"Found {qualifier}{_pluralize(distinct, 'distinct value')}, expected {expected}."
+        return None
+
+    return f"Unsupported check type: {check_type}"
+
+def _check_state_metrics(check, state):
+    """Return the counts behind a check's outcome: rows examined, violating values and, for cardinality, distinct values."""
+    if state["missing"]:
+        return {"rows": 0, "failed": 0}
+    check_type = check.get("type")
+    metrics = {"rows": int(state["rows"]), "failed": 0}
+    if check_type == "not_null":
+        metrics["failed"] = int(state["nulls"])
+    elif check_type == "range":
+        metrics["failed"] = int(state["out_of_range"] + state["non_numeric"])
+    elif check_type == "length":
+        metrics["failed"] = int(state["too_long"])
+    elif check_type == "unique" and "bloom" in state:
+        metrics["failed"] = int(state["duplicates"])
+    elif check_type == "unique":
+        _compact_unique_state(state)
+        metrics["failed"] = int(state["non_null"] - (0 if state["distinct"] is None else len(state["distinct"])))
+    elif check_type == "cardinality":
+        if "hll" in state:
+            metrics["distinct"] = int(_hll_estimate(state["hll"]))
+        else:
+            _compact_unique_state(state)
+            metrics["distinct"] = 0 if state["distinct"] is None else len(state["distinct"])
+    return metrics
+
+def _check_run_results(checks, run_state):
+    """Build the report `results` of a check run from its aggregate state."""
+    return [
+        _check_result(check, _check_state_details(check, state), _check_state_metrics(check, state))
+        for check, state in zip(checks, run_state["checks"])
+    ]
+
+def _new_check_run(checks, plan=None):
+    """Return the empty aggregate state of a check run over `checks`, executed with `plan` (compiled if omitted)."""
+    return {"rows": 0, "checks": [_new_check_state(check) for check in checks], "plan": plan or _get_check_plan(checks)}
+
+def _fold_chunk(df, checks, run_state, indexes=None, parallel=True):
+    """Fold one chunk of rows into the aggregate state of a check run.
+
+    Checks are evaluated per column as laid out by the run's check plan, so each column is
+    scanned once for all of its checks. Large chunks are spread over the process pool when
+    CHECK_WORKERS > 1.
+
+    Args:
+        df (pandas.DataFrame): The chunk of rows.
+        checks (list): The checks of the run.
+        run_state (dict): The run state, updated in place.
+        indexes (iterable, optional): Only fold the checks at these positions.
+        parallel (bool): Allow parallel execution for this chunk.
+    """
+    plan = run_state.get("plan") or _get_check_plan(checks)
+    selected = None if indexes is None else set(indexes)
+    columns = []
+    for entry in plan["columns"]:
+        column_indexes = [index for index in entry["checks"] if selected is None or index in selected]
+        if not column_indexes:
+            continue
+        if entry["column"] not in df.columns:
+            for index in column_indexes:
+                run_state["checks"][index]["missing"] = True
+        else:
+            columns.append((entry, column_indexes))
+    # Checks the profile proved cannot fail only count rows
+    for proven in plan["proven"]:
+        if selected is None or proven["index"] in selected:
+            run_state["checks"][proven["index"]]["rows"] += len(df)
+
+    present = [index for _, column_indexes in columns for index in column_indexes]
+    folded = (
+        parallel and CHECK_WORKERS > 1 and len(df) >= CHECK_PARALLEL_MIN_ROWS
+        and _fold_chunk_parallel(df, checks, run_state, present)
+    )
+    if not folded:
+        for entry, column_indexes in columns:
+            states = [run_state["checks"][index] for index in column_indexes]
+            shared = entry["shared"] if len(column_indexes) == len(entry["checks"]) else None
+            _update_column_check_states(
+                df[entry["column"]], [checks[index] for index in column_indexes], states, run_state["rows"], shared,
+            )
+    if indexes is None:
+        run_state["rows"] += len(df)
+        _report_check_progress(checks, run_state)
+
+def _report_check_progress(checks, run_state):
+    """Notify observers of the partial results of the running job's checks.
+
+    Emits a QUALITY_CHECK_PROGRESS event (never written to the status store) at most every
+    CHECK_PROGRESS_INTERVAL_SECONDS per job, and only when something is listening.
+    """
+    job = _current_job.get()
+    if not job or not CHECK_PROGRESS_INTERVAL_SECONDS or not (_status_observers or JOB_EVENTS_TOPIC):
+        return
+    now = time.monotonic()
+    if now - job.setdefault("progress_reported", now) < CHECK_PROGRESS_INTERVAL_SECONDS:
+        return
+    job["progress_reported"] = now
+    results = _check_run_results(checks, run_state)
+    _notify_status_observers(job["job_id"], _build_status_data("QUALITY_CHECK_PROGRESS", {
+        "data_ref": job.get("gcs_uri"),
+        "rows": run_state["rows"],
+        "results": results,
+    }))
+
+def _build_quality_report(checks, run_state, job_id=None, data_ref=None):
+    """Build the quality report from the aggregate state of a check run.
+
+    Returns:
+        dict: The report with `jobId`, `dataRef`, `summary` and `results`, as in output.json.
+    """
+    results = _check_run_results(checks, run_state)
+    passed = sum(1 for result in results if result["outcome"] == CHECK_OUTCOME_PASS)
+    report = {
+        "jobId": job_id,
+        "dataRef": data_ref,
+        "summary": {
+            "totalChecks": len(results),
+            "passedChecks": passed,
+            "failedChecks": len(results) - passed,
+        },
+        "results": results,
+    }
+    samples = _collect_failure_samples(run_state)
+    if samples:
+        report["failureSamples"] = samples
+    return report
+
+def _collect_failure_samples(run_state):
+    """Return the failure sample of every check that has one, ordered by row number.
+
+    Returns:
+        list: `{"resultIndex", "rows", "values"}` entries; rows are 0-based data row numbers (header excluded).
+    """
+    import numpy as np
+
+    samples = []
+    for index, state in enumerate(run_state["checks"]):
+        if len(state.get("sample_row", ())):
+            order = np.argsort(state["sample_row"], kind="stable")
+            samples.append({
+                "resultIndex": index,
+                "rows": state["sample_row"][order].tolist(),
+                "values": state["sample_value"][order].tolist(),
+            })
+    return samples
+
+def _merge_quality_reports(reports, job_id=None, data_ref=None):
+    """Combine the reports of column shards checked separately into one report."""
+    results = []
+    samples = []
+    for report in reports:
+        samples.extend({**sample, "resultIndex": sample["resultIndex"] + len(results)} for sample in report.get("failureSamples", []))
+        results.extend(report.get("results", []))
+    passed = sum(1 for result in results if result.get("outcome") == CHECK_OUTCOME_PASS)
+    merged = {
+        "jobId": job_id,
+        "dataRef": data_ref,
+        "summary": {
+            "totalChecks": len(results),
+            "passedChecks": passed,
+            "failedChecks": len(results) - passed,
+        },
+        "results": results,
+    }
+    if samples:
+        merged["failureSamples"] = samples
+    return merged
+
+def _shard_checks_by_column(checks, columns_per_shard):
+    """Split checks into lists covering at most `columns_per_shard` columns each, keeping a column's checks together."""
+    columns = list(dict.fromkeys(check.get("column") for check in checks))
+    shards = []
+    for start in range(0, len(columns), columns_per_shard):
+        shard_columns = set(columns[start:start + columns_per_shard])
+        shards.append([check for check in checks if check.get("column") in shard_columns])
+    return shards
+
+def _run_quality_checks(df, check_definitions, job_id=None, data_ref=None):
+    """Run quality checks over a DataFrame and build the quality report.
+
+    Args:
+        df (pandas.DataFrame): The dataset to check.
+        check_definitions (str | dict | list): The check definitions to run.
+        job_id (str, optional): The unique identifier of the job.
+        data_ref (str, optional): Reference to the checked dataset.
+
+    Returns:
+        dict: The report with `jobId`, `dataRef`, `summary` and `results`, as in output.json.
+    """
+    checks = _parse_check_definitions(check_definitions)
+    run_state = _new_check_run(checks)
+    _fold_chunk(df, checks, run_state)
+    return _build_quality_report(checks, run_state, job_id=job_id, data_ref=data_ref)
+
+def _split_gcs_uri(gcs_uri):
+    """Split a gs://bucket/path URI into its bucket name and object path."""
+    return gcs_uri.split("/")[2], "/".join(gcs_uri.split("/")[3:])
+
+def _open_dataset(data_ref, chunk_size=None):
+    """Open a dataset from GCS or a local path as a binary file object.
+
+    GCS objects are streamed with ranged reads of `chunk_size` bytes instead of being downloaded whole.
+
+    Args:
+        data_ref (str): A gs:// URI or a local file path.
+        chunk_size (int, optional): Bytes fetched per GCS read.
+
+    Returns:
+        file: A readable binary file object that counts the bytes read through it.
+    """
+    if data_ref.startswith("gs://"):
+        bucket_name, file_path = _split_gcs_uri(data_ref)
+        blob = _get_storage_client().bucket(bucket_name).blob(file_path)
+        return _CountingReader(blob.open("rb", chunk_size=chunk_size), "gcs")
+    return _CountingReader(open(data_ref, "rb"), "local")
+
+def _read_uri_bytes(uri):
+    """Read a whole gs:// object or local file, returning None if it does not exist."""
+    if uri.startswith("gs://"):
+        bucket_name, path = _split_gcs_uri(uri)
+        blob = _get_storage_client().bucket(bucket_name).get_blob(path)
+        data = blob.download_as_bytes() if blob else None
+        source = "gcs"
+    elif os.path.exists(uri):
+        with open(uri, "rb") as f:
+            data = f.read()
+        source = "local"
+    else:
+        return None
+    _increment("qualis_bytes_read_total", len(data or b""), source=source)
+    return data
+
+def _write_uri_bytes(uri, data, content_type="application/octet-stream"):
+    """Write a whole gs:// object, or a local file atomically via a temporary file."""
+    if uri.startswith("gs://"):
+        bucket_name, path = _split_gcs_uri(uri)
+        _get_storage_client().bucket(bucket_name).blob(path).upload_from_string(data, content_type=content_type)
+        return
+    os.makedirs(os.path.dirname(uri) or ".", exist_ok=True)
+    tmp_path = f"{uri}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, uri)
+
+def _read_csv_header(f):
+    """Read the header line of a CSV file object, leaving it positioned at the first data row."""
+    return next(csv.reader([f.readline().decode("utf-8-sig")]))
+
+def _check_read_options(checks, plan=None):
+    """Return the read_csv `usecols`/`dtype` options for the columns referenced by `checks`.
+
+    Columns with length or uniqueness checks are read as text, so lengths are measured on the
+    values as written and hashes stay stable whichever chunk a value falls in. With a check
+    plan, columns whose checks were all proven by the profile are not read.
+    """
+    wanted = {check.get("column") for check in checks} if plan is None else {entry["column"] for entry in plan["columns"]}
+    as_text = {check.get("column") for check in checks if check.get("type") in ("length", "unique", "cardinality")}
+    return {"usecols": lambda name: name in wanted, "dtype": {column: str for column in as_text}}
+
+def _fold_csv_stream(f, header, checks, run_state):
+    """Fold every remaining row of a CSV file object into the run state, one chunk at a time."""
+    import pandas as pd
+
+    read_options = _check_read_options(checks, run_state.get("plan"))
+    for chunk in pd.read_csv(f, header=None, names=header, chunksize=PROFILE_CHUNK_ROWS, **read_options):
+        _fold_chunk(chunk, checks, run_state)
+
+def _run_quality_checks_for_ref(data_ref, check_definitions, job_id=None, profile=None):
+    """Stream only the referenced columns of a dataset through the checks in fixed-size chunks.
+
+    Parquet and Arrow IPC files are read column-selectively through pyarrow, with Parquet
+    row-group statistics answering range and not_null checks where they can. An exact profile
+    of the same content lets the check plan skip checks that cannot fail.
+    """
+    plan = _get_check_plan(check_definitions, _exact_profile(data_ref, profile))
+    checks = plan["checks"]
+    run_state = _new_check_run(checks, plan)
+    _fold_dataset(data_ref, checks, run_state)
+    _increment("qualis_rows_processed_total", run_state["rows"], stage="check")
+    logger.info(f"Ran {len(checks)} quality checks over {run_state['rows']} rows of {data_ref} (Job ID: {job_id})")
+    return _build_quality_report(checks, run_state, job_id=job_id, data_ref=data_ref)
+
+def _fold_dataset(data_ref, checks, run_state, data=None):
+    """Fold a whole CSV, Parquet or Arrow dataset into a check run.
+
+    Args:
+        data_ref (str): A gs:// URI or a local file path; its extension selects the format.
+        checks (list): The checks of the run.
+        run_state (dict): The run state, updated in place.
+        data (bytes, optional): The dataset's content, if it was already downloaded.
+    """
+    import pyarrow as pa
+
+    fmt = _dataset_format(data_ref)
+    if fmt == "csv":
+        with (io.BytesIO(data) if data is not None else _open_dataset(data_ref, chunk_size=PROFILE_READ_CHUNK_BYTES)) as f:
+            header = _read_csv_header(f)
+            for check, state in zip(checks, run_state["checks"]):
+                state["missing"] = check.get("column") not in header
+            _fold_csv_stream(f, header, checks, run_state)
+    else:
+        with (pa.BufferReader(data) if data is not None else _open_columnar(data_ref)) as source:
+            (_fold_parquet if fmt == "parquet" else _fold_arrow)(source, checks, run_state)
+
+# --- Check Planning ---
+# Values computed once per column chunk and shared by the checks that need them, in computation order.
+CHECK_SHARED_VALUES = {
+    "not_null": ("null_mask",),
+    "range": ("null_mask", "numeric"),
+    "length": ("null_mask", "text", "lengths"),
+    "unique": ("null_mask", "text", "hashes"),
+    "cardinality": ("null_mask", "text", "hashes"),
+}
+SHARED_VALUE_ORDER = ("null_mask", "numeric", "text", "lengths", "hashes")
+
+def _column_shared_values(checks):
+    """Return the shared values the checks of one column need, in computation order."""
+    needed = {value for check in checks for value in CHECK_SHARED_VALUES.get(check.get("type"), ("null_mask",))}
+    return [value for value in SHARED_VALUE_ORDER if value in needed]
+
+def _proven_check_reason(check, column_profile):
+    """Explain why an exact column profile shows `check` cannot find any violation, or return None."""
+    check_type = check.get("type")
+    if check_type == "not_null" and column_profile.get("null_count") == 0:
+        return "no nulls"
+    if check_type == "range" and column_profile.get("dtype") in ("int64", "float64"):
+        low, high = column_profile.get("min"), column_profile.get("max")
+        if low is None:
+            return "no values"
+        min_val, max_val = _range_bounds(check)
+        if min_val <= low and high <= max_val:
+            return f"values within [{low}, {high}]"
+    if check_type == "length" and column_profile.get("max_length_exact") and column_profile.get("max_length") is not None:
+        if column_profile["max_length"] <= int(check.get("max_length", 0)):
+            return f"longest value has {column_profile['max_length']} characters"
+    return None
+
+def _compile_check_plan(checks, profile=None):
+    """Compile checks into a per-column execution plan.
+
+    Each column lists the checks evaluated on it and the shared values (null mask, numeric cast,
+    text, lengths, hashes) they need, so every column chunk is converted once for all of them.
+    With an exact profile of the checked content, checks the profile shows cannot fail (e.g. a
+    not_null check on a column without nulls) are proven instead: they only count rows, and
+    columns left without evaluated checks are not read at all.
+
+    Args:
+        checks (list): The parsed checks.
+        profile (dict, optional): An exact profile of the dataset; see `_exact_profile`.
+
+    Returns:
+        dict: The JSON-serializable plan: `checks`, `columns` as `{"column", "checks", "shared"}`
+            entries in first-reference order, and `proven` as `{"index", "reason"}` entries.
+    """
+    column_profiles = (profile or {}).get("columns", {})
+    columns = {}
+    proven = []
+    for index, check in enumerate(checks):
+        column = check.get("column")
+        reason = _proven_check_reason(check, column_profiles[column]) if column in column_profiles else None
+        if reason:
+            proven.append({"index": index, "reason": reason})
+        else:
+            columns.setdefault(column, []).append(index)
+    return {
+        "checks": checks,
+        "columns": [
+            {"column": column, "checks": indexes, "shared": _column_shared_values([checks[index] for index in indexes])}
+            for column, indexes in columns.items()
+        ],
+        "proven": proven,
+    }
+
+def _exact_profile(data_ref, profile):
+    """Return `profile` if it holds exact statistics of the current content of `data_ref`, or None.
+
+    Only full (unsampled) profiles tagged by `_analyze_dataset` with the content fingerprint of
+    the dataset they were computed from qualify.
+    """
+    if not profile or profile.get("sampled_rows") is not None or not profile.get("content_fingerprint"):
+        return None
+    try:
+        fingerprint = _dataset_fingerprint(data_ref)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {data_ref}; not pruning its checks: {e}")
+        return None
+    return profile if profile["content_fingerprint"] == fingerprint else None
+
+def _get_check_plan(check_definitions, profile=None):
+    """Return the compiled plan of check definitions, reusing the plan of identical definitions.
+
+    Plans are cached in an LRU of CHECK_PLAN_CACHE_SIZE entries keyed by the definitions and the
+    profile statistics of their columns, so repeated runs skip parsing and planning. The cached
+    plan is shared and must not be modified.
+
+    Args:
+        check_definitions (str | dict | list): The checks, in any form `_parse_check_definitions` accepts.
+        profile (dict, optional): An exact profile of the dataset, used to prune checks that cannot fail.
+
+    Returns:
+        dict: The plan, as returned by `_compile_check_plan`, plus its cache `key`.
+    """
+    if isinstance(check_definitions, bytes):
+        check_definitions = check_definitions.decode("utf-8")
+    definitions = check_definitions if isinstance(check_definitions, str) else json.dumps(check_definitions, sort_keys=True)
+    stats = None
+    if profile:
+        stats = {
+            column: [column_profile.get(key) for key in ("dtype", "null_count", "min", "max", "max_length", "max_length_exact")]
+            for column, column_profile in profile["columns"].items()
+        }
+    key = hashlib.sha256(f"{definitions}\n{json.dumps(stats, sort_keys=True)}".encode("utf-8")).hexdigest()
+    with _check_plans_lock:
+        plan = _check_plans.get(key)
+        if plan is not None:
+            _check_plans.move_to_end(key)
+            return plan
+    plan = {"key": key, **_compile_check_plan(_parse_check_definitions(check_definitions), profile)}
+    if plan["proven"]:
+        logger.info(f"Check plan {key[:12]} skips {_pluralize(len(plan['proven']), 'check')} the profile shows cannot fail")
+    with _check_plans_lock:
+        _check_plans[key] = plan
+        while len(_check_plans) > CHECK_PLAN_CACHE_SIZE:
+            _check_plans.popitem(last=False)
+    return plan
+
+# --- Parallel Check Execution ---
+# Counters that partial states of the same check add up.
+_ADDITIVE_STATE_KEYS = ("rows", "nulls", "out_of_range", "non_numeric", "too_long", "non_null")
+
+def _check_state_delta(state, before):
+    """Return a view of a shared check state holding only what was folded in since `before`.
+
+    Args:
+        state (dict): The check state, folded in place across partitions.
+        before (dict): The counters of `state` before the latest partition was folded in.
+    """
+    delta = dict(state)
+    for key in (*_ADDITIVE_STATE_KEYS, "duplicates"):
+        if key in before:
+            delta[key] = state[key] - before[key]
+    return delta
+
+def _merge_check_state(state, partial):
+    """Merge the partial state of a check computed over another partition into `state`.
+
+    Counters add up, exact hash sets are concatenated (and deduplicated when the check is
+    reported), HyperLogLog registers take the element-wise maximum and failure samples keep the
+    lowest priorities of both.
+    """
+    import numpy as np
+
+    for key in _ADDITIVE_STATE_KEYS:
+        if key in partial:
+            state[key] += partial[key]
+    state["missing"] = state["missing"] or partial["missing"]
+    if "pending" in partial:
+        state["pending"].extend(partial["pending"])
+        if partial.get("distinct") is not None:
+            state["pending"].append(partial["distinct"])
+    if "hll" in partial:
+        np.maximum(state["hll"], partial["hll"], out=state["hll"])
+    if "sample_row" in partial:
+        _merge_failure_sample(state, partial["sample_priority"], partial["sample_row"], partial["sample_value"])
+
+def _attach_shared_memory(name):
+    """Attach to a shared memory block created by the parent process, which owns its unlinking."""
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers the block again, which is harmless because pool workers
+        # share the parent's resource tracker
+        return shared_memory.SharedMemory(name=name)
+
+def _check_partition_worker(shm_name, size, columns, start, stop, checks, row_offset=0):
+    """Process pool task: fold rows [start, stop) of some columns of a shared chunk into fresh states.
+
+    The chunk is an Arrow IPC stream in shared memory, so only its name and the partition
+    bounds are pickled; the Arrow buffers are read in place. `row_offset` is the dataset row
+    number of the chunk's first row.
+
+    Returns:
+        list: The partial state of each check in `checks`.
+    """
+    import pyarrow as pa
+
+    block = _attach_shared_memory(shm_name)
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(block.buf[:size])).read_all()
+        df = table.select(columns).slice(start, stop - start).to_pandas()
+        states = [_new_check_state(check) for check in checks]
+        for column in columns:
+            indexes = [index for index, check in enumerate(checks) if check.get("column") == column]
+            _update_column_check_states(
+                df[column], [checks[index] for index in indexes], [states[index] for index in indexes], row_offset + start,
+            )
+        for state in states:
+            if state.get("pending"):
+                _compact_unique_state(state)
+        del table, df  # Release views into the shared buffer before detaching
+        return states
+    finally:
+        block.close()
+
+def _get_check_process_pool():
+    """Initialize and return the process pool used for parallel check execution."""
+    global _check_process_pool
+    if _check_process_pool is None:
+        import multiprocessing
+
+        _check_process_pool = ProcessPoolExecutor(
+            max_workers=CHECK_WORKERS,
+            mp_context=multiprocessing.get_context(CHECK_WORKER_START_METHOD),
+        )
+    return _check_process_pool
+
+def _plan_check_partitions(df, checks, indexes):
+    """Split the checks of a chunk into (columns, start, stop) tasks for the process pool.
+
+    Columns are spread over about two tasks per worker, balanced by check count; narrow
+    tables are additionally split into row ranges so every worker has work.
+    """
+    checks_by_column = {}
+    for index in indexes:
+        checks_by_column.setdefault(checks[index].get("column"), []).append(index)
+    target_tasks = CHECK_WORKERS * 2
+    groups = [[] for _ in range(min(target_tasks, len(checks_by_column)))]
+    loads = [0] * len(groups)
+    for column, column_indexes in sorted(checks_by_column.items(), key=lambda item: -len(item[1])):
+        lightest = loads.index(min(loads))
+        groups[lightest].append(column)
+        loads[lightest] += len(column_indexes)
+    row_splits = max(1, math.ceil(target_tasks / max(1, len(groups))))
+    step = math.ceil(len(df) / row_splits)
+    return [(columns, start, min(start + step, len(df))) for columns in groups for start in range(0, len(df), step)]
+
+def _fold_chunk_parallel(df, checks, run_state, indexes):
+    """Fold a chunk across the process pool by column group and row range, then merge the partials.
+
+    Approximate `unique` checks carry a Bloom filter that depends on every earlier row, so they
+    are folded in this process while the workers run.
+    """
+    import pyarrow as pa
+    from multiprocessing import shared_memory
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logger.debug(f"Chunk cannot be shared as Arrow, folding sequentially: {e}")
+        return False
+
+    sequential = [index for index in indexes if "bloom" in run_state["checks"][index]]
+    shared = [index for index in indexes if index not in set(sequential)]
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    buffer = sink.getvalue()
+    block = shared_memory.SharedMemory(create=True, size=max(1, buffer.size))
+    try:
+        block.buf[:buffer.size] = memoryview(buffer).cast("B")
+        pool = _get_check_process_pool()
+        futures = []
+        for columns, start, stop in _plan_check_partitions(df, checks, shared):
+            task_indexes = [index for index in shared if checks[index].get("column") in columns]
+            future = pool.submit(_check_partition_worker, block.name, buffer.size, columns, start, stop,
+                                 [checks[index] for index in task_indexes], run_state["rows"])
+            futures.append((task_indexes, future))
+        if sequential:
+            _fold_chunk(df, checks, run_state, indexes=sequential, parallel=False)
+        for task_indexes, future in futures:
+            for index, partial in zip(task_indexes, future.result()):
+                _merge_check_state(run_state["checks"][index], partial)
+    finally:
+        block.close()
+        block.unlink()
+    return True
+
+# --- Columnar Formats ---
+# File extensions read with pyarrow instead of pandas' CSV parser.
+COLUMNAR_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+def _dataset_format(data_ref):
+    """Return "parquet", "arrow" or "csv" based on the dataset's file extension."""
+    return COLUMNAR_FORMATS.get(os.path.splitext(data_ref)[1].lower(), "csv")
+
+@contextmanager
+def _open_columnar(data_ref):
+    """Open a Parquet or Arrow file as a random-access pyarrow source.
+
+    Local files are memory-mapped. GCS objects are wrapped so pyarrow issues ranged reads for
+    the footer and the column chunks it needs instead of downloading the whole object.
+    """
+    import pyarrow as pa
+
+    if data_ref.startswith("gs://"):
+        with _open_dataset(data_ref, chunk_size=PROFILE_READ_CHUNK_BYTES) as f:
+            yield pa.PythonFile(f, mode="r")
+    else:
+        with pa.memory_map(data_ref, "r") as source:
+            yield source
+
+def _open_arrow_batches(source):
+    """Return the schema and a batch iterator of an Arrow IPC file, or of an IPC stream as a fallback."""
+    import pyarrow as pa
+
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+def _iter_dataset_chunks(data_ref, chunk_rows=None, columns=None):
+    """Yield a dataset as DataFrames of at most `chunk_rows` rows, whatever its format.
+
+    Args:
+        data_ref (str): A gs:// URI or a local file path.
+        chunk_rows (int, optional): Rows per chunk. Defaults to PROFILE_CHUNK_ROWS.
+        columns (iterable, optional): Only read these columns; unknown names are ignored.
+    """
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    chunk_rows = chunk_rows or PROFILE_CHUNK_ROWS
+    fmt = _dataset_format(data_ref)
+    if fmt == "csv":
+        usecols = None
+        if columns is not None:
+            wanted = set(columns)
+            usecols = lambda name: name in wanted
+        with _open_dataset(data_ref, chunk_size=PROFILE_READ_CHUNK_BYTES) as f:
+            yield from pd.read_csv(f, chunksize=chunk_rows, usecols=usecols)
+        return
+
+    with _open_columnar(data_ref) as source:
+        if fmt == "parquet":
+            parquet_file = pq.ParquetFile(source)
+            names = parquet_file.schema_arrow.names
+            selected = None if columns is None else [name for name in names if name in set(columns)]
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=selected):
+                yield batch.to_pandas()
+        else:
+            schema, batches = _open_arrow_batches(source)
+            selected = schema.names if columns is None else [name for name in schema.names if name in set(columns)]
+            for batch in batches:
+                for offset in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(offset, chunk_rows).select(selected).to_pandas()
+
+def _fold_check_from_statistics(check, state, statistics, num_rows):
+    """Try to answer a check for one Parquet row group from its column statistics alone.
+
+    not_null only needs the null count; range only needs min/max, and a numeric row group
+    whose whole [min, max] lies inside the range cannot contain violations.
+
+    Returns:
+        bool: True if the check was folded without reading the column data.
+    """
+    if statistics is None:
+        return False
+    check_type = check.get("type")
+    # Row groups with nulls are read when failures are sampled, so the null rows can be located
+    if check_type == "not_null" and statistics.has_null_count and (statistics.null_count == 0 or FAILURE_SAMPLE_ROWS <= 0):
+        state["rows"] += num_rows
+        state["nulls"] += statistics.null_count
+        return True
+    if check_type == "range" and statistics.has_min_max:
+        low, high = statistics.min, statistics.max
+        numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in (low, high))
+        min_val, max_val = _range_bounds(check)
+        if numeric and min_val <= low and high <= max_val:
+            state["rows"] += num_rows
+            return True
+    return False
+
+def _fold_parquet(source, checks, run_state):
+    """Fold a Parquet file into a check run, reading as little column data as possible.
+
+    Each row group first answers what it can from its statistics; only the columns of the
+    remaining checks are then read, and only for that row group.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    names = parquet_file.schema_arrow.names
+    column_index = {name: index for index, name in enumerate(names)}
+    for check, state in zip(checks, run_state["checks"]):
+        state["missing"] = check.get("column") not in column_index
+    proven = {entry["index"] for entry in run_state["plan"]["proven"]}
+    pending = [index for index, check in enumerate(checks) if check.get("column") in column_index and index not in proven]
+    stats_hits = 0
+
+    for row_group in range(parquet_file.num_row_groups):
+        metadata = parquet_file.metadata.row_group(row_group)
+        for index in proven:
+            run_state["checks"][index]["rows"] += metadata.num_rows
+        unresolved = []
+        for index in pending:
+            column = checks[index].get("column")
+            statistics = metadata.column(column_index[column]).statistics
+            if _fold_check_from_statistics(checks[index], run_state["checks"][index], statistics, metadata.num_rows):
+                stats_hits += 1
+            else:
+                unresolved.append(index)
+        if unresolved:
+            columns = sorted({checks[index].get("column") for index in unresolved}, key=column_index.get)
+            chunk = parquet_file.read_row_group(row_group, columns=columns).to_pandas()
+            _fold_chunk(chunk, checks, run_state, indexes=unresolved)
+        run_state["rows"] += metadata.num_rows
+        _report_check_progress(checks, run_state)
+    logger.info(f"Answered {stats_hits} check/row-group pairs from Parquet statistics")
+
+def _fold_arrow(source, checks, run_state):
+    """Fold an Arrow IPC file into a check run, converting only the referenced columns."""
+    schema, batches = _open_arrow_batches(source)
+    for check, state in zip(checks, run_state["checks"]):
+        state["missing"] = check.get("column") not in schema.names
+    wanted = {entry["column"] for entry in run_state["plan"]["columns"]}
+    columns = [name for name in schema.names if name in wanted]
+    for batch in batches:
+        _fold_chunk(batch.select(columns).to_pandas(), checks, run_state)
+
+# --- Incremental Quality Checks ---
+INCREMENTAL_TAIL_CHECK_BYTES = 4096
+
+def _incremental_state_uri(data_ref, checks):
+    """Return where the incremental state of `data_ref` checked with `checks` is stored.
+
+    The key covers the check definitions, so changing them starts over with a full check.
+    """
+    key = hashlib.sha256(f"{data_ref}\n{json.dumps(checks, sort_keys=True)}".encode("utf-8")).hexdigest()
+    return f"{INCREMENTAL_STATE_URI.rstrip('/')}/{key}.npz"
+
+def _save_incremental_state(uri, state):
+    """Persist a watermark and run state; hash sets and sketches are stored as compressed arrays."""
+    import numpy as np
+
+    arrays = {}
+    meta = json.loads(json.dumps(state, default=lambda _: None))  # Deep copy without arrays
+    for index, check_state in enumerate(state["run"]["checks"]):
+        if check_state.get("pending"):
+            _compact_unique_state(check_state)
+            meta["run"]["checks"][index]["pending"] = []
+        for key, value in check_state.items():
+            if isinstance(value, np.ndarray):
+                arrays[f"{index}__{key}"] = value
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8), **arrays)
+    _write_uri_bytes(uri, buffer.getvalue())
+
+def _load_incremental_state(uri):
+    """Load a state saved by `_save_incremental_state`, or None if there is none."""
+    import numpy as np
+
+    data = _read_uri_bytes(uri)
+    if data is None:
+        return None
+    with np.load(io.BytesIO(data)) as archive:
+        state = json.loads(archive["meta"].tobytes().decode("utf-8"))
+        for name in archive.files:
+            if name != "meta":
+                index, key = name.split("__", 1)
+                state["run"]["checks"][int(index)][key] = archive[name]
+    return state
+
+def _tail_digest(f, offset):
+    """Digest the bytes just before `offset`, used to detect that the checked prefix was rewritten."""
+    start = max(0, offset - INCREMENTAL_TAIL_CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+def _run_incremental_quality_checks(data_ref, check_definitions, job_id=None, profile=None):
+    """Run quality checks over only the rows appended since the previous run.
+
+    The aggregate state of every check is stored with a byte-offset/row watermark. The next run
+    seeks past the watermark, folds the new tail into the saved state and reports the running
+    totals, which match a full recheck. A full recheck happens instead when there is no state,
+    the file shrank, its already-checked tail changed, or the last checked row had no newline.
+
+    Args:
+        data_ref (str): A gs:// URI or a local file path of an append-only CSV.
+        check_definitions (str | dict | list): The checks to run.
+        job_id (str, optional): The unique identifier of the job.
+        profile (dict, optional): The profile from analyze_dataset, used to prune the check plan if it is exact.
+
+    Returns:
+        dict: The quality report covering the whole file.
+    """
+    if _dataset_format(data_ref) != "csv":
+        logger.warning(f"Incremental checks only support append-only CSV; fully checking {data_ref} (Job ID: {job_id})")
+        return _run_quality_checks_for_ref(data_ref, check_definitions, job_id=job_id, profile=profile)
+
+    plan = _get_check_plan(check_definitions, _exact_profile(data_ref, profile))
+    checks = plan["checks"]
+    state_uri = _incremental_state_uri(data_ref, checks)
+    saved = _load_incremental_state(state_uri)
+
+    with _open_dataset(data_ref, chunk_size=PROFILE_READ_CHUNK_BYTES) as f:
+        size = f.seek(0, io.SEEK_END)
+        resumable = (
+            saved is not None
+            and saved["ends_with_newline"]
+            and saved["byte_offset"] <= size
+            and _tail_digest(f, saved["byte_offset"]) == saved["tail_digest"]
+        )
+        if resumable:
+            header, run_state = saved["header"], saved["run"]
+            run_state["plan"] = plan
+            previous_rows = run_state["rows"]
+            f.seek(saved["byte_offset"])
+            if saved["byte_offset"] < size:
+                _fold_csv_stream(f, header, checks, run_state)
+        else:
+            if saved is not None:
+                logger.warning(f"Checked prefix of {data_ref} changed; running a full recheck (Job ID: {job_id})")
+            previous_rows = 0
+            run_state = _new_check_run(checks, plan)
+            f.seek(0)
+            header = _read_csv_header(f)
+            for check, state in zip(checks, run_state["checks"]):
+                state["missing"] = check.get("column") not in header
+            _fold_csv_stream(f, header, checks, run_state)
+
+        ends_with_newline = True
+        if size:
+            f.seek(size - 1)
+            ends_with_newline = f.read(1) == b"\n"
+        tail_digest = _tail_digest(f, size)
+
+    _increment("qualis_rows_processed_total", run_state["rows"] - previous_rows, stage="check")
+    logger.info(
+        f"Incrementally checked {run_state['rows'] - previous_rows} new rows "
+        f"({run_state['rows']} total) of {data_ref} (Job ID: {job_id})"
+    )
+    report = _build_quality_report(checks, run_state, job_id=job_id, data_ref=data_ref)
+    _save_incremental_state(state_uri, {
+        "data_ref": data_ref,
+        "header": header,
+        "byte_offset": size,
+        "ends_with_newline": ends_with_newline,
+        "tail_digest": tail_digest,
+        "run": run_state,
+    })
+    return report
+
+# --- Dataset Profiling ---
+ID_COLUMN_NAMES = ["id", "identifier", "unique_id", "key"]
+DISTINCT_SKETCH_SIZE = 1024
+
+class _ColumnProfiler:
+    """Running per-column statistics folded in one chunk at a time.
+
+    Memory stays bounded regardless of file size: besides a handful of scalars, only the
+    `DISTINCT_SKETCH_SIZE` smallest value hashes are kept (a KMV sketch) to estimate distinct counts.
+    """
+
+    def __init__(self):
+        self.kind = None  # "int", "float" or "object"
+        self.row_count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.max_length = None
+        self.numeric_chunks = False  # Numeric chunks of a text column do not contribute to max_length
+        self._hashes = None
+
+    def update(self, series):
+        """Fold one chunk of column values into the running statistics."""
+        import numpy as np
+        import pandas as pd
+        from pandas.api import types as ptypes
+
+        self.row_count += len(series)
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if values.empty:
+            return
+
+        if ptypes.is_bool_dtype(values) or not ptypes.is_numeric_dtype(values):
+            chunk_kind = "object"
+        elif ptypes.is_integer_dtype(values):
+            chunk_kind = "int"
+        else:
+            chunk_kind = "float"
+        self.numeric_chunks = self.numeric_chunks or chunk_kind != "object"
+        if self.kind is None or self.kind == chunk_kind:
+            self.kind = chunk_kind
+        elif {self.kind, chunk_kind} == {"int", "float"}:
+            self.kind = "float"
+        elif self.kind != "object":
+            # A numeric column turned out to hold text; approximate the earlier chunks' lengths
+            # from the numeric extremes seen so far.
+            self.kind = "object"
+            self.max_length = max(len(str(self.min)), len(str(self.max)))
+
+        if chunk_kind == "object":
+            chunk_max_length = int(values.astype(str).str.len().max())
+            self.max_length = chunk_max_length if self.max_length is None else max(self.max_length, chunk_max_length)
+        else:
+            chunk_min, chunk_max = values.min(), values.max()
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        if self._hashes is not None:
+            hashes = np.concatenate([self._hashes, hashes])
+        self._hashes = np.unique(hashes)[:DISTINCT_SKETCH_SIZE]
+
+    def distinct_estimate(self):
+        """Estimate the number of distinct non-null values from the KMV sketch."""
+        if self._hashes is None:
+            return 0
+        if len(self._hashes) < DISTINCT_SKETCH_SIZE:
+            return len(self._hashes)
+        kth_fraction = (float(self._hashes[-1]) + 1.0) / 2.0**64
+        return int((DISTINCT_SKETCH_SIZE - 1) / kth_fraction)
+
+    def to_dict(self):
+        """Return the profile as a JSON-serializable dictionary."""
+        dtype = {"int": "int64", "float": "float64"}.get(self.kind, "object")
+        return {
+            "dtype": dtype,
+            "row_count": self.row_count,
+            "null_count": self.null_count,
+            "min": None if self.min is None or self.kind == "object" else float(self.min),
+            "max": None if self.max is None or self.kind == "object" else float(self.max),
+            "max_length": self.max_length,
+            "max_length_exact": self.kind == "object" and not self.numeric_chunks,
+            "distinct_estimate": self.distinct_estimate(),
+        }
+
+def _reservoir_sample(reservoir, chunk, sample_rows, rng):
+    """Keep a uniform random sample of `sample_rows` rows across all chunks seen so far.
+
+    Each row gets a random priority and the rows with the smallest priorities are kept,
+    which is a chunk-at-a-time form of reservoir sampling.
+    """
+    import pandas as pd
+
+    chunk = chunk.assign(_priority=rng.random(len(chunk)))
+    if reservoir is not None:
+        chunk = pd.concat([reservoir, chunk], ignore_index=True)
+    return chunk.nsmallest(sample_rows, "_priority")
+
+def _profile_dataset(data_ref, sample_rows=None, chunk_rows=None, columns=None):
+    """Profile a CSV, Parquet or Arrow dataset by streaming it in fixed-size chunks.
+
+    Args:
+        data_ref (str | list): A gs:// URI or a local file path, or a list of them profiled as one dataset.
+        sample_rows (int, optional): Profile a reservoir sample of this many rows instead of every row.
+            Defaults to PROFILE_SAMPLE_ROWS; 0 profiles the full dataset.
+        chunk_rows (int, optional): Rows parsed per chunk. Defaults to PROFILE_CHUNK_ROWS.
+        columns (iterable, optional): Only profile these columns.
+
+    Returns:
+        dict: `row_count`, `sampled_rows` and a per-column `columns` profile, in file column order.
+    """
+    import numpy as np
+
+    sample_rows = PROFILE_SAMPLE_ROWS if sample_rows is None else sample_rows
+    chunk_rows = chunk_rows or PROFILE_CHUNK_ROWS
+    profilers = {}
+    reservoir = None
+    rng = np.random.default_rng()
+    row_count = 0
+
+    for ref in [data_ref] if isinstance(data_ref, str) else data_ref:
+        for chunk in _iter_dataset_chunks(ref, chunk_rows=chunk_rows, columns=columns):
+            row_count += len(chunk)
+            if sample_rows:
+                reservoir = _reservoir_sample(reservoir, chunk, sample_rows, rng)
+                continue
+            for col in chunk.columns:
+                profilers.setdefault(col, _ColumnProfiler()).update(chunk[col])
+
+    if sample_rows and reservoir is not None:
+        sample = reservoir.drop(columns="_priority")
+        for col in sample.columns:
+            profilers.setdefault(col, _ColumnProfiler()).update(sample[col])
+
+    _increment("qualis_rows_processed_total", row_count, stage="profile")
+    return {
+        "row_count": row_count,
+        "sampled_rows": len(reservoir) if reservoir is not None else None,
+        "columns": {col: profiler.to_dict() for col, profiler in profilers.items()},
+    }
+
+def _build_check_definitions(profile):
+    """Generate quality check definitions from a dataset profile.
+
+    Args:
+        profile (dict): The output of `_profile_dataset`.
+
+    Returns:
+        dict: The check definitions, as `{"checks": [...]}`.
+    """
+    check_definitions = {
+        "checks": []
+    }
+
+    for col, column_profile in profile["columns"].items():
+        dtype = column_profile["dtype"]
+        checks = []
+
+        # Common checks for all columns
+        checks.append({"type": "not_null", "column": col, "threshold": 0.0})
+
+        # Type-specific checks
+        if "int" in dtype or "float" in dtype:
+            # Numeric checks: range and outliers
+            if column_profile["min"] is not None:
+                # Allow 10% of the observed spread (or of the value, for constant columns) on either side
+                low, high = column_profile["min"], column_profile["max"]
+                margin = 0.1 * ((high - low) or abs(low))
+                checks.append({
+                    "type": "range",
+                    "column": col,
+                    "min": low - margin,
+                    "max": high + margin
+                })
+        elif "object" in dtype:
+            # String checks: length and uniqueness (if likely an ID column)
+            if str(col).lower() in ID_COLUMN_NAMES:
+                if profile["row_count"] >= APPROX_UNIQUE_MIN_ROWS:
+                    # Bounded-memory duplicate detection, with headroom for the feed to grow
+                    checks.append({
+                        "type": "unique",
+                        "column": col,
+                        "mode": "approximate",
+                        "error_rate": APPROX_ERROR_RATE,
+                        "capacity": profile["row_count"] * 2,
+                    })
+                else:
+                    checks.append({"type": "unique", "column": col})
+            if column_profile["max_length"] is not None:
+                checks.append({
+                    "type": "length",
+                    "column": col,
+                    "max_length": column_profile["max_length"] + 10
+                })
+
+        check_definitions["checks"].extend(checks)
+    return check_definitions
+
+# --- Analysis Cache ---
+def _dataset_fingerprint(data_ref):
+    """Return a content-based cache key for a dataset without downloading it.
+
+    GCS objects are keyed by their CRC32C/MD5 hashes and size, read from object metadata, so a
+    re-landed file with identical content hits the cache even under a new generation. Local files
+    are keyed by path, size and modification time. The profiler settings are part of the key
+    because they change the analysis output. A list of files (a batch) is keyed by the
+    fingerprints of all of them.
+
+    Returns:
+        str: The cache key, or None if the dataset has no usable fingerprint.
+    """
+    if not isinstance(data_ref, str):
+        fingerprints = [_dataset_fingerprint(ref) for ref in data_ref]
+        if None in fingerprints:
+            return None
+        return hashlib.sha256(",".join(fingerprints).encode("utf-8")).hexdigest()
+    if data_ref.startswith("gs://"):
+        bucket_name, file_path = _split_gcs_uri(data_ref)
+        blob = _get_storage_client().bucket(bucket_name).get_blob(file_path)
+        if blob is None:
+            return None
+        if blob.crc32c or blob.md5_hash:
+            content_key = f"crc32c={blob.crc32c},md5={blob.md5_hash},size={blob.size}"
+        else:
+            content_key = f"{data_ref}#generation={blob.generation}"
+    else:
+        stat = os.stat(data_ref)
+        content_key = f"{os.path.abspath(data_ref)}#mtime={stat.st_mtime_ns},size={stat.st_size}"
+    return hashlib.sha256(f"{content_key};sample_rows={PROFILE_SAMPLE_ROWS}".encode("utf-8")).hexdigest()
+
+class AnalysisCache:
+    """Two-tier cache of JSON entries, such as analyze_dataset results (profile and check definitions).
+
+    The in-memory tier is an LRU bounded to `max_entries`. The optional persistent tier is a
+    gs://bucket/prefix or a local directory; local directories are trimmed oldest-first to
+    `max_bytes`, while GCS prefixes are expected to be bounded by a bucket lifecycle rule.
+    """
+
+    def __init__(self, max_entries=256, persistent_uri=None, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.persistent_uri = persistent_uri.rstrip("/") if persistent_uri else None
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached entry for `key`, or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        entry = self._read_persistent(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        """Cache `entry` in memory and in the persistent tier."""
+        self._remember(key, entry)
+        try:
+            self._write_persistent(key, entry)
+        except Exception as e:
+            logger.error(f"Error writing analysis cache entry {key}: {e}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_persistent(self, key):
+        if not self.persistent_uri:
+            return None
+        uri = f"{self.persistent_uri}/{key}.json"
+        try:
+            data = _read_uri_bytes(uri)
+            if data is None:
+                return None
+            if not uri.startswith("gs://"):
+                os.utime(uri)  # Mark as recently used for eviction
+            return json.loads(data)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading analysis cache entry {key}: {e}")
+            return None
+
+    def _write_persistent(self, key, entry):
+        if not self.persistent_uri:
+            return
+        _write_uri_bytes(f"{self.persistent_uri}/{key}.json", json.dumps(entry).encode("utf-8"), "application/json")
+        if not self.persistent_uri.startswith("gs://"):
+            self._evict_persistent()
+
+    def _evict_persistent(self):
+        entries = []
+        for name in os.listdir(self.persistent_uri):
+            if name.endswith(".json"):  # Skips in-flight .tmp writes
+                stat = os.stat(os.path.join(self.persistent_uri, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.persistent_uri, name))
+            total -= size
+
+def _get_analysis_cache():
+    """Initialize and return the analysis cache."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache(ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_URI, ANALYSIS_CACHE_MAX_BYTES)
+    return _analysis_cache
+
+# --- Schema Registry ---
+def _schema_fingerprint(schema):
+    """Return a short hash of a {column: type} schema, in column order."""
+    return hashlib.sha256(json.dumps(list(schema.items())).encode("utf-8")).hexdigest()[:32]
+
+def _arrow_column_kind(arrow_type):
+    """Return "numeric" or "text", matching how `_ColumnProfiler` treats a column of this Arrow type."""
+    import pyarrow as pa
+
+    return "numeric" if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) else "text"
+
+def _landing_schema(data_ref):
+    """Read a dataset's column names and kinds without profiling it.
+
+    Parquet and Arrow schemas come from the file metadata; CSV kinds are inferred from the first
+    SCHEMA_SAMPLE_ROWS rows. Kinds are only "numeric" or "text", the distinction the generated
+    checks depend on, so an integer column that gains nulls does not count as drift.
+
+    Returns:
+        dict: {column: "numeric" | "text"}, in file column order.
+    """
+    from pandas.api import types as ptypes
+
+    fmt = _dataset_format(data_ref)
+    if fmt != "csv":
+        import pyarrow.parquet as pq
+
+        with _open_columnar(data_ref) as source:
+            schema = pq.ParquetFile(source).schema_arrow if fmt == "parquet" else _open_arrow_batches(source)[0]
+        return {name: _arrow_column_kind(schema.field(name).type) for name in schema.names}
+
+    chunks = _iter_dataset_chunks(data_ref, chunk_rows=SCHEMA_SAMPLE_ROWS)
+    try:
+        sample = next(chunks)
+    finally:
+        chunks.close()
+    return {
+        col: "numeric" if ptypes.is_numeric_dtype(sample[col]) and not ptypes.is_bool_dtype(sample[col]) else "text"
+        for col in sample.columns
+    }
+
+def _schema_registry_dataset(data_ref):
+    """Return the name a landed file's schema is registered under: its dataset prefix (see `_batch_prefix`).
+
+    Dated or partitioned landings such as orders/orders_20260101.csv or orders/dt=2026-01-01/part-0001.parquet
+    therefore share the entry of their dataset, as do the files of a landing batch.
+    """
+    return _batch_prefix(data_ref).split("://", 1)[-1].strip("/") or "unknown"
+
+def _schema_registry_uri(dataset):
+    """Return where the registered schema of a dataset is stored."""
+    path = "/".join(
+        "".join(c if c.isalnum() or c in "-_.=" else "_" for c in part).lstrip(".") or "_"
+        for part in dataset.strip("/").split("/")
+    )
+    return f"{SCHEMA_REGISTRY_URI.rstrip('/')}/{path}.json"
+
+def _schema_drift(registered, schema):
+    """Compare a landing schema with the registered one, in O(columns).
+
+    Returns:
+        dict: The `added` and `removed` columns and the `retyped` ones as {column: [old kind, new kind]}.
+    """
+    return {
+        "added": [col for col in schema if col not in registered],
+        "removed": [col for col in registered if col not in schema],
+        "retyped": {col: [registered[col], kind] for col, kind in schema.items() if col in registered and registered[col] != kind},
+    }
+
+def _analyze_with_schema_registry(data_ref, job_id, dataset=None):
+    """Analyze a dataset against the schema registered for it.
+
+    The registry holds one JSON entry per dataset (by default its prefix, see
+    `_schema_registry_dataset`) with its schema, fingerprint, last profile and check definitions.
+    Edits to the entry's check definitions are kept: they are reused as long as the schema
+    matches, and on drift only the checks of the added or retyped columns are regenerated, from
+    a profile of just those columns. Drift is sent to the job event stream as a
+    SCHEMA_DRIFT_DETECTED event; the job's status is left alone.
+
+    `data_ref` may be a list of files (a batch): the schema is read from the first one and the
+    profiles cover all of them.
+
+    Returns:
+        tuple: (profile, check definitions, "new" | "match" | "drift", the drift or None).
+    """
+    first_ref = data_ref if isinstance(data_ref, str) else data_ref[0]
+    dataset = dataset or _schema_registry_dataset(first_ref)
+    schema = _landing_schema(first_ref)
+    schema_fingerprint = _schema_fingerprint(schema)
+    uri = _schema_registry_uri(dataset)
+    data = _read_uri_bytes(uri)
+    entry = json.loads(data) if data else None
+    if entry and entry.get("fingerprint") == schema_fingerprint:
+        logger.info(f"Schema of {first_ref} matches the registered schema of {dataset}; reusing its checks (Job ID: {job_id})")
+        return entry["profile"], entry["check_definitions"], "match", None
+
+    if entry is None:
+        with _span("dataset.profile", job_id=job_id, data_ref=first_ref):
+            profile = _profile_dataset(data_ref)
+        check_definitions = _build_check_definitions(profile)
+        outcome = "new"
+        drift = None
+    else:
+        drift = _schema_drift(entry["schema"], schema)
+        reprofiled = drift["added"] + list(drift["retyped"])
+        logger.warning(f"Schema drift in {dataset} for {first_ref} (Job ID: {job_id}): {drift}")
+        registered_columns = entry["profile"]["columns"]
+        profile = {"row_count": entry["profile"]["row_count"], "sampled_rows": entry["profile"].get("sampled_rows"), "columns": {}}
+        if reprofiled:
+            with _span("dataset.profile", job_id=job_id, data_ref=first_ref, columns=len(reprofiled)):
+                profile = _profile_dataset(data_ref, columns=reprofiled)
+        new_checks = _build_check_definitions(profile)["checks"]
+        profile["columns"] = {
+            col: profile["columns"].get(col) or registered_columns.get(col) or {"dtype": "object"}
+            for col in schema
+        }
+        position = {col: index for index, col in enumerate(schema)}
+        kept_checks = [
+            check for check in _parse_check_definitions(entry["check_definitions"])
+            if check.get("column") in position and check.get("column") not in reprofiled
+        ]
+        check_definitions = {"checks": sorted(kept_checks + new_checks, key=lambda check: position[check.get("column")])}
+        outcome = "drift"
+        drift = {
+            "dataset": dataset,
+            "previous_fingerprint": entry.get("fingerprint"),
+            "schema_fingerprint": schema_fingerprint,
+            **drift,
+            "profiles": {col: profile["columns"][col] for col in reprofiled},
+        }
+        _notify_status_observers(job_id, _build_status_data("SCHEMA_DRIFT_DETECTED", {"data_ref": first_ref, **drift}))
+
+    entry = {
+        "dataset": dataset,
+        "fingerprint": schema_fingerprint,
+        "schema": schema,
+        "profile": profile,
+        "check_definitions": check_definitions,
+        "data_ref": first_ref,
+        "job_id": job_id,
+        "updated_at": time.time(),
+    }
+    try:
+        _write_uri_bytes(uri, json.dumps(entry).encode("utf-8"), "application/json")
+    except Exception as e:
+        logger.error(f"Error registering schema of {dataset}: {e}")
+    return profile, check_definitions, outcome, drift
+
+# --- Report Storage ---
+@contextmanager
+def _open_uri_writer(uri, content_type="application/octet-stream", content_encoding=None):
+    """Open a gs:// object or local file for streamed binary writing.
+
+    GCS objects go through a resumable upload in REPORT_UPLOAD_CHUNK_BYTES chunks, so memory
+    stays flat whatever the size. Nothing becomes visible unless the block completes: a failed
+    GCS upload is abandoned without being finalized, and local files are moved into place last.
+    """
+    if uri.startswith("gs://"):
+        bucket_name, path = _split_gcs_uri(uri)
+        blob = _get_storage_client().bucket(bucket_name).blob(path)
+        blob.content_encoding = content_encoding
+        f = blob.open("wb", chunk_size=REPORT_UPLOAD_CHUNK_BYTES, ignore_flush=True, content_type=content_type)
+        yield f
+        f.close()
+        return
+    os.makedirs(os.path.dirname(uri) or ".", exist_ok=True)
+    tmp_path = f"{uri}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, uri)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _report_dataset_name(data_ref):
+    """Return the partition name of a dataset: its file name without extension, limited to safe characters."""
+    name = os.path.splitext(os.path.basename((data_ref or "unknown").rstrip("/")))[0]
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "unknown"
+
+def _write_report_ndjson(f, quality_results, created_at):
+    """Stream a report as gzipped NDJSON: a summary record, one record per check result, then one per file of a batch."""
+    with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        header = {
+            "record": "summary",
+            "jobId": quality_results.get("jobId"),
+            "dataRef": quality_results.get("dataRef"),
+            "summary": quality_results.get("summary"),
+            "createdAt": created_at,
+            "failureSamplesUri": quality_results.get("failureSamplesUri"),
+        }
+        gz.write((json.dumps(header, separators=(",", ":")) + "\n").encode("utf-8"))
+        for result in quality_results.get("results", []):
+            gz.write((json.dumps({"record": "result", **result}, separators=(",", ":")) + "\n").encode("utf-8"))
+        for breakdown in quality_results.get("files", []):
+            gz.write((json.dumps({"record": "file", **breakdown}, separators=(",", ":")) + "\n").encode("utf-8"))
+
+def _write_report_parquet(f, quality_results, created_at):
+    """Write a report as Parquet, one row per check result; the summary and any batch file breakdowns are kept in the schema metadata."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    results = quality_results.get("results", [])
+    table = pa.table({
+        "check_type": [result["check"].get("type") for result in results],
+        "column": [result["check"].get("column") for result in results],
+        "check": [json.dumps(result["check"]) for result in results],
+        "outcome": [result.get("outcome") for result in results],
+        "details": [result.get("details") for result in results],
+        "metrics": [json.dumps(result["metrics"]) if "metrics" in result else None for result in results],
+    }, schema=pa.schema([
+        ("check_type", pa.string()), ("column", pa.string()), ("check", pa.string()),
+        ("outcome", pa.string()), ("details", pa.string()), ("metrics", pa.string()),
+    ]))
+    metadata = {
+        "jobId": str(quality_results.get("jobId")),
+        "dataRef": str(quality_results.get("dataRef")),
+        "summary": json.dumps(quality_results.get("summary")),
+        "createdAt": str(created_at),
+        "failureSamplesUri": str(quality_results.get("failureSamplesUri") or ""),
+    }
+    if "files" in quality_results:
+        metadata["files"] = json.dumps(quality_results["files"])
+    table = table.replace_schema_metadata(metadata)
+    pq.write_table(table, pa.PythonFile(f, mode="w"), compression="zstd")
+
+def _write_failure_samples(f, quality_results, samples):
+    """Stream failure samples as gzipped NDJSON, one record per sampled check with its row numbers and values."""
+    results = quality_results.get("results", [])
+    with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        for sample in samples:
+            record = {
+                "jobId": quality_results.get("jobId"),
+                "check": results[sample["resultIndex"]]["check"],
+                **sample,
+            }
+            gz.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+
+def _report_manifest_uri(day):
+    """Return the prefix under which the manifest entries of `day` ('YYYY-MM-DD') are written."""
+    return f"{REPORT_BASE_URI.rstrip('/')}/_manifest/dt={day}/"
+
+def _list_uri(prefix):
+    """List the gs:// objects or local files directly under `prefix`, as URIs."""
+    if prefix.startswith("gs://"):
+        bucket_name, path = _split_gcs_uri(prefix)
+        return [f"gs://{bucket_name}/{blob.name}" for blob in _get_storage_client().list_blobs(bucket_name, prefix=path)]
+    if not os.path.isdir(prefix):
+        return []
+    return [os.path.join(prefix, name) for name in os.listdir(prefix) if not name.endswith(".tmp")]
+
+def _write_report_manifest_entry(day, entry):
+    """Index a report's summary in the manifest of `day`.
+
+    Every report gets its own manifest object, so writes stay O(1) however many reports the
+    day already has, and concurrent jobs on different instances never contend for one object.
+    """
+    _write_uri_bytes(
+        f"{_report_manifest_uri(day)}{entry['jobId']}.json",
+        json.dumps(entry, separators=(",", ":")).encode("utf-8"),
+        "application/json",
+    )
+
+def _read_report_manifest(day, known=None):
+    """Read the manifest entries of `day`, downloading them concurrently on the shared download pool.
+
+    Args:
+        day (str): The UTC day, as 'YYYY-MM-DD'.
+        known (dict, optional): Entries read earlier, by URI; they are not downloaded again.
+
+    Returns:
+        dict: The manifest entries, by URI.
+    """
+    known = known or {}
+    uris = _list_uri(_report_manifest_uri(day))
+    entries = {uri: known[uri] for uri in uris if uri in known}
+    missing = [uri for uri in uris if uri not in entries]
+    for uri, data in zip(missing, _get_download_executor().map(_read_uri_bytes, missing)):
+        if data is None:
+            continue
+        try:
+            entries[uri] = json.loads(data)
+        except ValueError:
+            logger.warning(f"Skipping malformed manifest entry {uri}")
+    return entries
+
+def _upload_quality_report(job_id: str, quality_results: dict) -> str:
+    """Write a quality report to its date/dataset partition and index its summary in the day's manifest.
+
+    Failure samples are moved out of the report into a `<job_id>.failures.ndjson.gz` side file
+    next to it, so the report and its summary stay small however many rows fail.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        quality_results (dict): The report, as built by the quality check engine.
+
+    Returns:
+        str: The URI of the written report.
+    """
+    created_at = time.time()
+    day = time.strftime("%Y-%m-%d", time.gmtime(created_at))
+    dataset = _report_dataset_name(quality_results.get("dataRef"))
+    base_uri = REPORT_BASE_URI.rstrip("/")
+    report_uri = f"{base_uri}/dt={day}/dataset={dataset}/{job_id}.{REPORT_FORMAT}"
+    samples = quality_results.get("failureSamples")
+    quality_results = {key: value for key, value in quality_results.items() if key != "failureSamples"}
+    if samples:
+        quality_results["failureSamplesUri"] = f"{base_uri}/dt={day}/dataset={dataset}/{job_id}.failures.ndjson.gz"
+
+    started = time.perf_counter()
+    with _span("report.upload", job_id=job_id, report_uri=report_uri, format=REPORT_FORMAT):
+        if samples:
+            with _open_uri_writer(quality_results["failureSamplesUri"], content_type="application/x-ndjson", content_encoding="gzip") as f:
+                _write_failure_samples(f, quality_results, samples)
+        if REPORT_FORMAT == "parquet":
+            with _open_uri_writer(report_uri, content_type="application/vnd.apache.parquet") as f:
+                _write_report_parquet(f, quality_results, created_at)
+                size = f.tell()
+        else:
+            with _open_uri_writer(report_uri, content_type="application/x-ndjson", content_encoding="gzip") as f:
+                _write_report_ndjson(f, quality_results, created_at)
+                size = f.tell()
+        upload_seconds = time.perf_counter() - started
+        _increment("qualis_report_bytes_total", size, format=REPORT_FORMAT)
+
+        try:
+            _write_report_manifest_entry(day, {
+                "jobId": job_id,
+                "dataRef": quality_results.get("dataRef"),
+                "dataset": dataset,
+                "createdAt": created_at,
+                "summary": quality_results.get("summary"),
+                "reportUri": report_uri,
+                "failureSamplesUri": quality_results.get("failureSamplesUri"),
+                "format": REPORT_FORMAT,
+                "bytes": size,
+                "uploadSeconds": round(upload_seconds, 3),
+            })
+        except Exception as e:
+            # The report itself is written; a missing index entry must not fail the job
+            logger.error(f"Error indexing report {report_uri} in the manifest for {day}: {e}")
+        _record_quality_metrics(job_id, dataset, created_at, quality_results)
+        if REPORT_LEGACY_OUTPUT_URI:
+            _write_uri_bytes(REPORT_LEGACY_OUTPUT_URI, json.dumps(quality_results, indent=2).encode("utf-8"), "application/json")
+    logger.info(f"Uploaded quality report ({size} bytes) → {report_uri}")
+    return report_uri
+
+# --- Quality Metrics Store ---
+class QualityMetricsStore:
+    """SQLite time series of per-check statistics with hourly and daily rollups.
+
+    Each report appends one point per check and, in the same transaction, adds its counts to the
+    hour and day buckets of (column, check type), of the dataset per check type (column "") and of
+    the dataset overall (column and check type ""). Buckets hold sums, so pass rates and violation
+    rates over any bucket are exact, and trend and freshness queries read a handful of rows
+    however long the history is.
+    """
+
+    BUCKET_SECONDS = {"hour": 3_600, "day": 86_400}
+
+    def __init__(self, path, raw_retention_days=30, hourly_retention_days=90):
+        self.path = path
+        self.raw_retention_days = raw_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self._lock = threading.Lock()
+        self._last_pruned = 0.0
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS quality_points ("
+            "recorded_at REAL NOT NULL, dataset TEXT NOT NULL, column_name TEXT NOT NULL, check_type TEXT NOT NULL,"
+            " job_id TEXT NOT NULL, passed INTEGER NOT NULL, rows INTEGER NOT NULL, failed INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS quality_points_dataset ON quality_points (dataset, recorded_at);"
+            "CREATE TABLE IF NOT EXISTS quality_rollups ("
+            "granularity TEXT NOT NULL, dataset TEXT NOT NULL, column_name TEXT NOT NULL, check_type TEXT NOT NULL,"
+            " bucket REAL NOT NULL, jobs INTEGER NOT NULL, checks INTEGER NOT NULL, passed INTEGER NOT NULL,"
+            " rows INTEGER NOT NULL, failed INTEGER NOT NULL, last_recorded_at REAL NOT NULL,"
+            " PRIMARY KEY (granularity, dataset, column_name, check_type, bucket)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS quality_datasets ("
+            "dataset TEXT PRIMARY KEY, last_recorded_at REAL NOT NULL, last_job_id TEXT NOT NULL, jobs INTEGER NOT NULL);"
+        )
+
+    def record(self, job_id, dataset, recorded_at, results):
+        """Append the statistics of one report and fold them into its hour and day buckets.
+
+        Args:
+            job_id (str): The unique identifier of the job.
+            dataset (str): The dataset name, as used in the report partition.
+            recorded_at (float): The report timestamp.
+            results (list): The report `results`; entries without `metrics` count towards pass rates only.
+        """
+        points = []
+        totals = {}
+        for result in results:
+            check = result.get("check") or {}
+            metrics = result.get("metrics") or {}
+            column, check_type = str(check.get("column") or ""), str(check.get("type") or "")
+            passed = 1 if result.get("outcome") == CHECK_OUTCOME_PASS else 0
+            rows, failed = int(metrics.get("rows") or 0), int(metrics.get("failed") or 0)
+            points.append((recorded_at, dataset, column, check_type, job_id, passed, rows, failed))
+            for key in ((column, check_type), ("", check_type), ("", "")):
+                total = totals.setdefault(key, [0, 0, 0, 0])
+                total[0] += 1
+                total[1] += passed
+                total[2] += rows
+                total[3] += failed
+        rollups = [
+            (granularity, dataset, column, check_type, recorded_at - recorded_at % seconds, 1, *total, recorded_at)
+            for granularity, seconds in self.BUCKET_SECONDS.items()
+            for (column, check_type), total in totals.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT INTO quality_points VALUES (?, ?, ?, ?, ?, ?, ?, ?)", points)
+                self._conn.executemany(
+                    "INSERT INTO quality_rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (granularity, dataset, column_name, check_type, bucket) DO UPDATE SET "
+                    "jobs = jobs + excluded.jobs, checks = checks + excluded.checks, passed = passed + excluded.passed, "
+                    "rows = rows + excluded.rows, failed = failed + excluded.failed, "
+                    "last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at)",
+                    rollups,
+                )
+                self._conn.execute(
+                    "INSERT INTO quality_datasets VALUES (?, ?, ?, 1) ON CONFLICT (dataset) DO UPDATE SET "
+                    "jobs = jobs + 1, last_job_id = CASE WHEN excluded.last_recorded_at >= last_recorded_at "
+                    "THEN excluded.last_job_id ELSE last_job_id END, "
+                    "last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at)",
+                    (dataset, recorded_at, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if time.time() - self._last_pruned > 3_600:
+                self._prune_locked()
+
+    def _prune_locked(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM quality_points WHERE recorded_at < ?", (now - self.raw_retention_days * 86_400,))
+        self._conn.execute(
+            "DELETE FROM quality_rollups WHERE granularity = 'hour' AND bucket < ?", (now - self.hourly_retention_days * 86_400,)
+        )
+        self._last_pruned = now
+
+    def series(self, dataset, granularity="day", start=None, end=None, column="", check_type=""):
+        """Return the buckets of one series in [start, end], oldest first.
+
+        Args:
+            dataset (str): The dataset name.
+            granularity (str): "hour" or "day".
+            start (float, optional): Earliest bucket start.
+            end (float, optional): Latest bucket start.
+            column (str): A column, or "" for the whole dataset.
+            check_type (str): A check type, or "" for every check type.
+
+        Returns:
+            list: Dictionaries with `bucket`, `jobs`, `checks`, `passed`, `rows`, `failed` and `lastRecordedAt`.
+        """
+        if granularity not in self.BUCKET_SECONDS:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bucket, jobs, checks, passed, rows, failed, last_recorded_at FROM quality_rollups "
+                "WHERE granularity = ? AND dataset = ? AND column_name = ? AND check_type = ? AND bucket BETWEEN ? AND ? "
+                "ORDER BY bucket",
+                (granularity, dataset, column, check_type, start if start is not None else 0, end if end is not None else float("inf")),
+            ).fetchall()
+        keys = ("bucket", "jobs", "checks", "passed", "rows", "failed", "lastRecordedAt")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def latest_by_check_type(self, dataset, granularity="day", buckets=2):
+        """Return the dataset's per-check-type sums for its `buckets` most recent buckets.
+
+        Returns:
+            list: One {check type: {`checks`, `passed`, `rows`, `failed`}} dictionary per bucket, newest first;
+                the "" key holds the totals over every check type.
+        """
+        with self._lock:
+            recent = [row[0] for row in self._conn.execute(
+                "SELECT bucket FROM quality_rollups WHERE granularity = ? AND dataset = ? AND column_name = '' "
+                "AND check_type = '' ORDER BY bucket DESC LIMIT ?",
+                (granularity, dataset, buckets),
+            )]
+            rows = self._conn.execute(
+                f"SELECT bucket, check_type, checks, passed, rows, failed FROM quality_rollups "
+                f"WHERE granularity = ? AND dataset = ? AND column_name = '' AND bucket IN ({','.join('?' * len(recent))})",
+                (granularity, dataset, *recent),
+            ).fetchall() if recent else []
+        by_bucket = {bucket: {} for bucket in recent}
+        for bucket, check_type, checks, passed, total_rows, failed in rows:
+            by_bucket[bucket][check_type] = {"checks": checks, "passed": passed, "rows": total_rows, "failed": failed}
+        return [by_bucket[bucket] for bucket in recent]
+
+    def freshness(self, dataset):
+        """Return (last report timestamp, last job ID, report count) of a dataset, or None if it has no reports."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT last_recorded_at, last_job_id, jobs FROM quality_datasets WHERE dataset = ?", (dataset,)
+            ).fetchone()
+
+def _get_quality_metrics_store():
+    """Initialize and return the quality metrics store, or None when QUALITY_METRICS_DB_PATH is empty."""
+    global _quality_metrics_store
+    if _quality_metrics_store is None and QUALITY_METRICS_DB_PATH:
+        with _quality_metrics_store_lock:
+            if _quality_metrics_store is None:
+                os.makedirs(os.path.dirname(QUALITY_METRICS_DB_PATH) or ".", exist_ok=True)
+                _quality_metrics_store = QualityMetricsStore(
+                    QUALITY_METRICS_DB_PATH,
+                    raw_retention_days=QUALITY_METRICS_RAW_RETENTION_DAYS,
+                    hourly_retention_days=QUALITY_METRICS_HOURLY_RETENTION_DAYS,
+                )
+    return _quality_metrics_store
+
+def _record_quality_metrics(job_id, dataset, recorded_at, quality_results):
+    """Append a report's per-check statistics to the quality metrics store; failures are logged, not raised."""
+    try:
+        store = _get_quality_metrics_store()
+        if store is not None:
+            store.record(job_id, dataset, recorded_at, quality_results.get("results", []))
+    except Exception as e:
+        logger.error(f"Error recording quality metrics for {job_id}: {e}")
+
+# --- Pub/Sub Publishing ---
+def _get_topic_path(topic_name):
+    """Return the cached fully qualified path of a topic in PROJECT_ID."""
+    topic_path = _topic_paths.get(topic_name)
+    if topic_path is None:
+        if not PROJECT_ID:
+            raise ValueError("PROJECT_ID environment variable is not set")
+        topic_path = _topic_paths[topic_name] = _get_publisher_client().topic_path(PROJECT_ID, topic_name)
+    return topic_path
+
+def _publish_message_async(topic_name, data, on_failure=None):
+    """Queue a message on the batching publisher without waiting for the server ack.
+
+    Retries with backoff happen inside the client. The ack is collected by a callback that
+    records metrics and, if every retry failed, calls `on_failure(error)`.
+
+    Args:
+        topic_name (str): The name of the Pub/Sub topic.
+        data (dict): The data to publish as a JSON string.
+        on_failure (callable, optional): Called with the exception if the message could not be published.
+
+    Returns:
+        google.cloud.pubsub_v1.publisher.futures.Future: Resolves with the message ID.
+    """
+    with _span("pubsub.publish", topic=topic_name, job_id=data.get("job_id")):
+        future = _get_publisher_client().publish(_get_topic_path(topic_name), json.dumps(data).encode("utf-8"))
+    started = time.perf_counter()
+
+    def collect_ack(done):
+        _observe("qualis_pubsub_ack_seconds", time.perf_counter() - started, topic=topic_name)
+        error = done.exception()
+        if error is None:
+            _increment("qualis_pubsub_messages_total", topic=topic_name, outcome="published")
+            logger.info(f"Published to {topic_name}: {done.result()}")
+            return
+        _increment("qualis_pubsub_messages_total", topic=topic_name, outcome="failed")
+        logger.error(f"Error publishing to {topic_name}: {error}")
+        if on_failure is not None:
+            on_failure(error)
+
+    future.add_done_callback(collect_ack)
+    return future
+
+def _publish_messages(topic_name, messages, on_failure=None):
+    """Fan a batch of messages out to a topic, e.g. one per column shard of a job.
+
+    Messages are batched by the client and sent concurrently; the call only blocks when
+    PUBSUB_MAX_IN_FLIGHT_MESSAGES or PUBSUB_MAX_IN_FLIGHT_BYTES are outstanding.
+
+    Args:
+        topic_name (str): The name of the Pub/Sub topic.
+        messages (list): The message dictionaries.
+        on_failure (callable, optional): Called with `(message, error)` for each message that could not be published.
+
+    Returns:
+        list: One publish future per message.
+    """
+    return [
+        _publish_message_async(
+            topic_name, message,
+            on_failure=(lambda error, message=message: on_failure(message, error)) if on_failure else None,
+        )
+        for message in messages
+    ]
+
+def _publish_message(topic_name, data):
+    """Publish a message to a Pub/Sub topic and wait for the server ack.
+
+    Args:
+        topic_name (str): The name of the Pub/Sub topic.
+        data (dict): The data to publish as a JSON string.
+
+    Returns:
+        str: The message ID.
+    """
+    return _publish_message_async(topic_name, data).result(timeout=PUBSUB_PUBLISH_TIMEOUT_SECONDS)
+
+# --- Pipeline Stages ---
+def _analyze_dataset(gcs_uri, job_id, dataset=None):
+    """Profile a dataset and generate its data quality check definitions.
+
+    Args:
+        gcs_uri (str | list): The GCS URI of the dataset (e.g., gs://bucket/file.csv), or the URIs of
+            a batch's files, which are profiled together as one dataset.
+        job_id (str): The unique identifier of the job.
+        dataset (str, optional): The name the schema is registered under. Defaults to the job's `dataset`
+            option, then to the file's dataset prefix.
+
+    Returns:
+        dict: The check definitions, as `{"checks": [...]}`.
+    """
+    data_refs = [gcs_uri] if isinstance(gcs_uri, str) else gcs_uri
+    label = gcs_uri if isinstance(gcs_uri, str) else f"{len(data_refs)} files under {_batch_prefix(data_refs[0])}"
+    logger.info(f"Analyzing dataset at {label} (Job ID: {job_id})")
+    try:
+        for data_ref in data_refs:
+            if not data_ref.startswith("gs://"):
+                raise ValueError(f"Invalid GCS URI: {data_ref}")
+
+        # Unchanged content is served from the cache without downloading the file
+        fingerprint = _dataset_fingerprint(gcs_uri)
+        cached = _get_analysis_cache().get(fingerprint) if fingerprint else None
+        schema_registry = schema_drift = None
+        if cached:
+            logger.info(f"Analysis cache hit for {label} (Job ID: {job_id})")
+            profile, check_definitions = cached["profile"], cached["check_definitions"]
+        elif SCHEMA_REGISTRY_URI:
+            # A known schema reuses its registered checks; drift only re-profiles the changed columns
+            dataset = dataset or (_current_job.get() or {}).get("dataset")
+            profile, check_definitions, schema_registry, schema_drift = _analyze_with_schema_registry(gcs_uri, job_id, dataset)
+            if fingerprint:
+                if schema_registry == "new":
+                    profile["content_fingerprint"] = fingerprint  # Lets the check plan trust its statistics
+                _get_analysis_cache().put(fingerprint, {"profile": profile, "check_definitions": check_definitions})
+        else:
+            # Stream the file through the profiler instead of downloading it whole
+            with _span("dataset.profile", job_id=job_id, data_ref=label):
+                profile = _profile_dataset(gcs_uri)
+            check_definitions = _build_check_definitions(profile)
+            if fingerprint:
+                profile["content_fingerprint"] = fingerprint
+                _get_analysis_cache().put(fingerprint, {"profile": profile, "check_definitions": check_definitions})
+    except Exception as e:
+        logger.error(f"Failed to analyze dataset {label} for job {job_id}: {e}")
+        _update_job_status(job_id, "DATASET_ANALYSIS_FAILED", {"error": str(e)})
+        raise
+
+    schema_fingerprint = _schema_fingerprint({column: column_profile.get("dtype") for column, column_profile in profile["columns"].items()})
+    job = _current_job.get()
+    if job is not None:
+        job["schema_fingerprint"] = schema_fingerprint
+        job["profile"] = profile
+
+    # Update job status with analysis results
+    _update_job_status(job_id, "DATASET_ANALYZED", {
+        "check_definitions": check_definitions,
+        "profile": profile,
+        "schema_fingerprint": schema_fingerprint,
+        "analysis_cache": "hit" if cached else "miss",
+        "schema_registry": schema_registry,
+        "schema_drift": schema_drift,
+    })
+    return check_definitions
+
+def _run_quality_checks_stage(data_ref, job_id, check_definitions):
+    """Run the quality checks in-process, or hand them to the quality checker agent in pubsub mode.
+
+    Args:
+        data_ref (str): Reference to the dataset.
+        job_id (str): The unique identifier of the job.
+        check_definitions (str | dict | list): The checks to run.
+
+    Returns:
+        dict: The quality results, or None if the remote checker did not report back in time.
+    """
+    if not isinstance(check_definitions, str):
+        check_definitions = json.dumps(check_definitions)
+    json.loads(check_definitions)  # Ensure it's valid JSON
+
+    if QUALITY_CHECK_MODE == "local":
+        _update_job_status(job_id, "QUALITY_CHECK_RUNNING", {"data_ref": data_ref, "check_definitions": check_definitions})
+        job = _current_job.get() or {}
+        incremental = job.get("incremental", INCREMENTAL_CHECKS)
+        run_checks = _run_incremental_quality_checks if incremental else _run_quality_checks_for_ref
+        try:
+            with _span("checks.run", job_id=job_id, data_ref=data_ref, incremental=bool(incremental)):
+                quality_results = run_checks(data_ref, check_definitions, job_id=job_id, profile=job.get("profile"))
+        except Exception as e:
+            _update_job_status(job_id, "QUALITY_CHECKS_FAILED", {"error": str(e)})
+            raise
+        _update_job_status(job_id, "QUALITY_CHECKS_COMPLETED", {"data_ref": data_ref, "quality_results": quality_results})
+        logger.info(f"Quality checks completed in-process for {job_id}.")
+        return quality_results
+
+    # Large check sets fan out as one message per column shard; each shard is tracked as its own job
+    shards = [check_definitions]
+    if QUALITY_CHECK_SHARD_COLUMNS > 0:
+        shards = [json.dumps({"checks": checks}) for checks in _shard_checks_by_column(
+            _parse_check_definitions(check_definitions), QUALITY_CHECK_SHARD_COLUMNS)] or shards
+    shard_job_ids = [job_id] if len(shards) == 1 else [f"{job_id}.shard-{index}" for index in range(len(shards))]
+
+    _start_job_status_listener()
+    messages = []
+    for shard_job_id, shard_definitions in zip(shard_job_ids, shards):
+        # Record the request before publishing so a fast completion cannot be overwritten by it
+        _update_job_status(shard_job_id, "QUALITY_CHECK_REQUESTED", {"data_ref": data_ref, "check_definitions": shard_definitions})
+        messages.append({
+            "job_id": shard_job_id,
+            "data_ref": data_ref,
+            "check_definitions": shard_definitions,
+            "next_step": "process_quality_results"
+        })
+    if len(shards) > 1:
+        _update_job_status(job_id, "QUALITY_CHECK_REQUESTED", {"data_ref": data_ref, "shard_job_ids": shard_job_ids})
+    # A message that exhausts its retries fails its shard, which wakes the wait below
+    _publish_messages(QUALITY_CHECKER_TOPIC, messages, on_failure=lambda message, error: _update_job_status(
+        message["job_id"], "QUALITY_CHECK_REQUEST_FAILED", {"error": f"Publish failed: {error}"}))
+
+    deadline = time.monotonic() + JOB_WAIT_TIMEOUT_SECONDS
+    reports = []
+    for shard_job_id in shard_job_ids:
+        status = _wait_for_job_status(shard_job_id, {"QUALITY_CHECKS_COMPLETED"}, timeout=max(0.0, deadline - time.monotonic()))
+        if status is None:
+            return None
+        if status.get("status") != "QUALITY_CHECKS_COMPLETED":
+            raise RuntimeError(f"Quality checks failed: {status.get('error', status.get('status'))}")
+        quality_results = status.get("quality_results")
+        if not quality_results:
+            logger.warning(f"QUALITY_CHECKS_COMPLETED but no results for {shard_job_id}")
+            raise RuntimeError("Quality checks completed but results missing.")
+        reports.append(quality_results)
+    logger.info(f"Quality checks for {job_id} completed successfully.")
+    if len(reports) == 1:
+        return reports[0]
+    return _merge_quality_reports(reports, job_id=job_id, data_ref=data_ref)
+
+def _run_reporting_stage(job_id, quality_results):
+    """Request reporting for the quality results and upload the report once it completes.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        quality_results (dict): The quality check results.
+
+    Returns:
+        str: The report URL, or None if the reporting agent did not report back in time.
+    """
+    message_data = {
+        "job_id": job_id,
+        "quality_results": quality_results,
+        "next_step": "job_complete"
+    }
+    _start_job_status_listener()
+    _update_job_status(job_id, "REPORTING_REQUESTED")
+    _publish_message_async(REPORTING_TOPIC, message_data, on_failure=lambda error: _update_job_status(
+        job_id, "REPORTING_REQUEST_FAILED", {"error": f"Publish failed: {error}"}))
+
+    status = _wait_for_job_status(job_id, {"REPORTING_COMPLETED"})
+    if status is None:
+        return None
+    if status.get("status") != "REPORTING_COMPLETED":
+        raise RuntimeError(f"Reporting failed: {status.get('error', status.get('status'))}")
+    logger.info(f"Uploading quality results to bucket")
+    report_uri = _upload_quality_report(job_id, quality_results)
+    logger.info(f"Reporting for {job_id} completed successfully.")
+    return status.get("report_url") or report_uri
+
+# --- Direct Pipeline ---
+class PipelineStageError(RuntimeError):
+    """Raised when a direct pipeline stage fails and the LLM fallback is disabled."""
+
+    def __init__(self, stage, reason):
+        super().__init__(f"Stage '{stage}' failed: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+# The file_landing pipeline as a fixed DAG in dependency order: (stage name, runner, context key it produces).
+# Each runner reads what earlier stages produced from the context; a None output means the stage did not complete.
+DIRECT_PIPELINE_STAGES = [
+    ("analyze_dataset",
+     lambda ctx: _analyze_dataset(ctx["gcs_uri"], ctx["job_id"]),
+     "check_definitions"),
+    ("trigger_quality_checker",
+     lambda ctx: _run_quality_checks_stage(ctx["gcs_uri"], ctx["job_id"], ctx["check_definitions"]),
+     "quality_results"),
+    ("trigger_reporting_agent",
+     lambda ctx: _run_reporting_stage(ctx["job_id"], ctx["quality_results"]),
+     "report_url"),
+]
+
+def _run_direct_pipeline(job_id, gcs_uri):
+    """Run the file_landing pipeline without the ReAct loop.
+
+    The LLM agent is only invoked when a stage raises or does not complete, and only if
+    DIRECT_PIPELINE_LLM_FALLBACK is enabled.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        gcs_uri (str): The GCS URI of the landed file.
+
+    Returns:
+        dict: The pipeline outcome, including per-stage durations.
+    """
+    context = {"job_id": job_id, "gcs_uri": gcs_uri}
+    stage_seconds = {}
+    for stage, run, output_key in DIRECT_PIPELINE_STAGES:
+        started = time.perf_counter()
+        try:
+            with _span(f"stage.{stage}", job_id=job_id):
+                output = run(context)
+        except Exception as e:
+            logger.error(f"Direct pipeline stage {stage} failed for job {job_id}: {e}")
+            return _fall_back_to_agent(job_id, gcs_uri, stage, str(e))
+        stage_seconds[stage] = round(time.perf_counter() - started, 3)
+        if output is None:
+            return _fall_back_to_agent(job_id, gcs_uri, stage, "the stage did not complete in time")
+        context[output_key] = output
+
+    return {
+        "mode": "direct",
+        "summary": context["quality_results"].get("summary"),
+        "report_url": context["report_url"],
+        "stage_seconds": stage_seconds,
+    }
+
+def _fall_back_to_agent(job_id, gcs_uri, stage, reason):
+    """Hand a direct pipeline run that hit an exception or ambiguous result to the LLM agent."""
+    if not DIRECT_PIPELINE_LLM_FALLBACK:
+        raise PipelineStageError(stage, reason)
+
+    logger.warning(f"Falling back to the LangChain Agent for job {job_id} after stage {stage}: {reason}")
+    goal = (
+        f"The automated pipeline for the file {gcs_uri} for job {job_id} stopped at step '{stage}': {reason}. "
+        f"Ensure data quality for the file and report any issues."
+    )
+    with _span("agent.invoke", job_id=job_id, failed_stage=stage):
+        result = _get_agent_executor().invoke({"input": goal})
+    return {"mode": "agent_fallback", "failed_stage": stage, "reason": reason, "agent_output": result}
+
+# --- Agent Prompt Budget and LLM Cache ---
+# Stands in for the full quality results in the agent's prompt; trigger_reporting_agent resolves it.
+QUALITY_RESULTS_REF = "@quality_results"
+# Stand-ins for the running job's values in cached prompts and responses.
+LLM_CACHE_PLACEHOLDERS = (("gcs_uri", "<<gcs_uri>>"), ("job_id", "<<job_id>>"))
+# Shorter values (e.g. job ID "1") could also stand for something else in a prompt, so they are left in place
+LLM_CACHE_MIN_PLACEHOLDER_CHARS = 6
+
+def _estimate_tokens(text):
+    """Estimate the token count of `text` at about 4 characters per token."""
+    return (len(text) + 3) // 4
+
+def _truncate_to_tokens(text, max_tokens):
+    """Cut `text` to about `max_tokens` tokens, noting how much was left out."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} characters omitted]"
+
+def _format_agent_scratchpad(intermediate_steps):
+    """Render the ReAct scratchpad like LangChain's format_log_to_str, within the prompt budget.
+
+    Observations are cut to AGENT_OBSERVATION_MAX_TOKENS. If the steps still exceed
+    AGENT_SCRATCHPAD_MAX_TOKENS, the most recent steps that fit are kept and the older ones are
+    collapsed into one line naming the tools they called, so prompts stop growing on long jobs.
+    """
+    steps = [
+        f"{action.log}\nObservation: {_truncate_to_tokens(str(observation), AGENT_OBSERVATION_MAX_TOKENS)}\nThought: "
+        for action, observation in intermediate_steps
+    ]
+    budget = AGENT_SCRATCHPAD_MAX_TOKENS
+    kept = 0
+    for step in reversed(steps):
+        budget -= _estimate_tokens(step)
+        if kept and budget < 0:
+            break
+        kept += 1
+    dropped = intermediate_steps[:len(steps) - kept]
+    summary = ""
+    if dropped:
+        tools = ", ".join(dict.fromkeys(action.tool for action, _ in dropped))
+        summary = f"({_pluralize(len(dropped), 'earlier step')} omitted; tools already called: {tools}.)\n"
+    return summary + "".join(steps[len(steps) - kept:])
+
+def _get_llm_response_cache():
+    """Initialize and return the LLM response cache."""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        _llm_response_cache = AnalysisCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_URI, LLM_CACHE_MAX_BYTES)
+    return _llm_response_cache
+
+def _replace_job_values(text, job, restore=False):
+    """Swap the job's ID and dataset URI for placeholders in `text`, or back again with `restore`.
+
+    Only whole occurrences are swapped: a value inside a longer identifier, number or path is
+    left alone. Values shorter than LLM_CACHE_MIN_PLACEHOLDER_CHARS are never swapped, so such
+    jobs get their own cache keys.
+    """
+    for key, placeholder in LLM_CACHE_PLACEHOLDERS:
+        value = job.get(key)
+        if not value or len(value) < LLM_CACHE_MIN_PLACEHOLDER_CHARS:
+            continue
+        if restore:
+            text = text.replace(placeholder, value)
+        else:
+            text = re.sub(rf"(?<![\w./-]){re.escape(value)}(?![\w/-]|\.\w)", lambda _: placeholder, text)
+    return text
+
+def _fail_tool_call(message):
+    """Mark the running job's trajectory as failed, so its LLM responses are not cached, and return `message` for the agent."""
+    job = _current_job.get()
+    if job is not None:
+        job["tool_failed"] = True
+    return message
+
+def _cached_llm(llm, stop):
+    """Wrap a chat model for the agent, serving repeated prompts from the LLM response cache.
+
+    The key covers the model, the stop sequences, the job's schema fingerprint (once the dataset
+    has been analyzed) and the prompt with whitespace collapsed and the job's ID and dataset URI
+    replaced by placeholders. Jobs over datasets with the same schema and outcomes therefore
+    replay the same trajectory without calling the LLM. Misses are held on the job and only
+    cached by `_commit_llm_responses` once it succeeds without a failed tool call, so a failed
+    trajectory is never replayed.
+
+    Args:
+        llm: A LangChain chat model, e.g. a fake chat model in tests.
+        stop (list): Stop sequences passed to the model.
+
+    Returns:
+        Runnable: Maps a prompt value to an AIMessage.
+    """
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    model = getattr(llm, "model", None) or type(llm).__name__
+
+    def invoke(prompt_value, config=None):
+        job = _current_job.get() or {}
+        prompt = " ".join(_replace_job_values(prompt_value.to_string(), job).split())
+        key = hashlib.sha256(json.dumps([model, stop, job.get("schema_fingerprint"), prompt]).encode("utf-8")).hexdigest()
+        cache = _get_llm_response_cache() if LLM_CACHE_ENABLED else None
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None:
+            _increment("qualis_llm_cache_total", outcome="hit")
+            return AIMessage(content=_replace_job_values(entry["text"], job, restore=True))
+        _increment("qualis_llm_cache_total", outcome="miss")
+        message = llm.invoke(prompt_value, config=config, stop=stop)
+        if cache is not None and job and isinstance(message.content, str):
+            job.setdefault("llm_responses", []).append((key, {"text": _replace_job_values(message.content, job)}))
+        return message
+
+    return RunnableLambda(invoke, name="CachedLLM")
+
+def _commit_llm_responses():
+    """Cache the LLM responses of the running job, once it has succeeded; skipped if any tool call failed."""
+    job = _current_job.get() or {}
+    responses = job.pop("llm_responses", [])
+    if job.get("tool_failed"):
+        logger.info(f"Not caching {len(responses)} LLM responses of job {job.get('job_id')}: a tool call failed")
+        return
+    for key, entry in responses:
+        _get_llm_response_cache().put(key, entry)
+
+def _summarize_check_definitions(check_definitions, gcs_uri):
+    """Describe generated checks for the agent without putting the definitions JSON in its prompt."""
+    checks = _parse_check_definitions(check_definitions)
+    columns = list(dict.fromkeys(str(check.get("column")) for check in checks))
+    return (
+        f"Generated {_pluralize(len(checks), 'data quality check')} for columns: {', '.join(columns)}. "
+        f"The check definitions are stored for this job; run trigger_quality_checker with data_ref {gcs_uri}."
+    )
+
+def _summarize_quality_results(quality_results):
+    """Describe quality results for the agent; the full results stay on the job under QUALITY_RESULTS_REF."""
+    summary = quality_results.get("summary") or {}
+    failed = [
+        f"{result['check'].get('type')}({result['check'].get('column')})"
+        for result in quality_results.get("results", []) if result.get("outcome") == CHECK_OUTCOME_FAIL
+    ]
+    text = f"Quality checks completed: {summary.get('passedChecks', 0)} of {summary.get('totalChecks', 0)} passed."
+    if failed:
+        text += f" Failed: {', '.join(failed[:10])}{' and more' if len(failed) > 10 else ''}."
+    return text + f' The full results are stored for this job; pass quality_results "{QUALITY_RESULTS_REF}" to trigger_reporting_agent.'
+
+# Define the Agent and Tools
+def _get_agent_executor():
+    """Initialize and return the LangChain AgentExecutor."""
+    if _agent_executor_instance is None:
+        with _agent_executor_lock:
+            _build_agent_executor()
+    return _agent_executor_instance
+
+def _build_agent_executor():
+    """Build the tools, prompt and ReAct agent on first use; see `_get_agent_executor`."""
+    global _agent_executor_instance
+    if _agent_executor_instance is None:
+        from langchain.agents import AgentExecutor
+        from langchain.agents.output_parsers import ReActSingleInputOutputParser
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.runnables import RunnablePassthrough
+        from langchain_core.tools import render_text_description, tool
+
+        # # Define tools with docstrings
+        # @tool
+        # def trigger_data_ingestion(gcs_uri: str) -> str:
+        #     """Trigger data ingestion for a CSV file in Google Cloud Storage.
+
+        #     Args:
+        #         gcs_uri (str): The GCS URI of the CSV file to ingest.
+                
+
+        #     Returns:
+        #         str: A message indicating whether ingestion completed or is awaiting completion.
+        #     """
+        #     job_id = "test-job-123"
+        #     logger.info(f"LangChain Tool: Triggering Data Ingestion for {gcs_uri} (Job ID: {job_id})")
+        #     message_data = {
+        #         "job_id": job_id,
+        #         "gcs_uri": gcs_uri,
+        #         "next_step": "run_quality_checks"
+        #     }
+        #     _publish_message(DATA_INGESTION_TOPIC, message_data)
+        #     _update_job_status(job_id, "INGESTION_REQUESTED", {"gcs_uri": gcs_uri})
+
+        #     max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
+        #     sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
+        #     for attempt in range(max_attempts):
+        #         status = _get_job_status(job_id)
+        #         if status and status.get("status") == "INGESTION_COMPLETED":
+        #             logger.info(f"Ingestion for {job_id} completed successfully.")
+        #             return f"Data ingestion for {gcs_uri} successfully initiated and completed. Data reference: {status.get('data_ref')}."
+        #         time.sleep(sleep_interval)
+        #     return f"Data ingestion for {gcs_uri} initiated, awaiting completion (Job ID: {job_id})."
+
+        @tool
+        def analyze_dataset(gcs_uri: str) -> str:
+            """
+            Analyzes a dataset in GCS and generates applicable data quality checks.
+
+            Args:
+                gcs_uri (str): The GCS URI of the dataset (e.g., gs://bucket/file.csv).
+                
+
+            Returns:
+                str: A summary of the selected data quality checks, which are stored for the job.
+            """
+
+            job_id = _current_job_id()
+            gcs_uri = (_current_job.get() or {}).get("gcs_uri", gcs_uri)
+            logger.info(f"LangChain Tool: Analyzing dataset at {gcs_uri} (Job ID: {job_id})")
+
+            try:
+                with _span("tool.analyze_dataset", job_id=job_id):
+                    return _summarize_check_definitions(_analyze_dataset(gcs_uri, job_id), gcs_uri)
+            except Exception as e:
+                return _fail_tool_call(f"Failed to analyze dataset: {str(e)}")
+
+        
+        
+        @tool
+        def trigger_quality_checker(data_ref: str) -> str:
+            """
+            Triggers quality checks for a dataset using dynamically generated check definitions.
+
+            Args:
+                data_ref (str): Reference to the processed dataset.
+
+            Returns:
+                str: Status message indicating whether quality checks were initiated or completed.
+            """
+            job_id = _current_job_id()
+
+            status = _get_job_status(job_id) or {}
+            check_definitions = status.get("check_definitions") or DEFAULT_CHECK_DEFINITIONS
+            logger.info(f"LangChain Tool: Triggering Quality Checker for {data_ref} (Job ID: {job_id})")
+            logger.debug(f"Received check_definitions: {check_definitions}")
+            try:
+                with _span("tool.trigger_quality_checker", job_id=job_id):
+                    quality_results = _run_quality_checks_stage(data_ref, job_id, check_definitions)
+                if quality_results is None:
+                    return _fail_tool_call(f"Quality checks for {data_ref} initiated, awaiting completion (Job ID: {job_id}).")
+                logger.info(f"Quality checks completed for {job_id}. Returning results.")
+                job = _current_job.get()
+                if job is None:
+                    return json.dumps(quality_results)
+                job["quality_results"] = quality_results
+                return _summarize_quality_results(quality_results)
+
+            except json.JSONDecodeError as e:
+                logger.error(f"Invalid check_definitions JSON for job {job_id}: {e}")
+                return _fail_tool_call(f"Failed to parse check_definitions for job {job_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error triggering quality checker for job {job_id}: {e}")
+                return _fail_tool_call(f"Error triggering quality checks for {data_ref}: {str(e)}")
+        @tool
+        def trigger_reporting_agent(job_id: str, quality_results: str = QUALITY_RESULTS_REF) -> str:
+            """Trigger reporting based on quality check results.
+
+            Args:
+                job_id (str): The unique identifier for the job.
+                quality_results (str, optional): The quality_results reference returned by
+                    trigger_quality_checker (the default), or a JSON string containing quality check results.
+
+            Returns:
+                str: A message indicating whether reporting completed or is awaiting completion.
+            """
+            job_id = _current_job_id(job_id)
+            logger.info(f"LangChain Tool: Triggering Reporting Agent for Job ID: {job_id}")
+            
+            stored_results = (_current_job.get() or {}).get("quality_results")
+            if stored_results is not None and quality_results.strip().strip("'\"") == QUALITY_RESULTS_REF:
+                quality_results = stored_results
+            else:
+                try:
+                    quality_results = json.loads(quality_results)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Invalid quality_results JSON for job {job_id}: {e}")
+                    return _fail_tool_call(f"Failed to parse quality_results for job {job_id}: {str(e)}")
+
+            try:
+                with _span("tool.trigger_reporting_agent", job_id=job_id):
+                    report_url = _run_reporting_stage(job_id, quality_results)
+            except Exception as e:
+                logger.error(f"Error triggering reporting for job {job_id}: {e}")
+                return _fail_tool_call(f"Reporting for job {job_id} failed: {str(e)}")
+            if report_url:
+                return f"Reporting for job {job_id} completed. Report URL: {report_url}."
+            return _fail_tool_call(f"Reporting for job {job_id} initiated, awaiting completion.")
+
+        # @tool
+        # def trigger_alerting_agent(job_id: str, alert_type: str, details: str, target_users: list) -> str:
+        #     """Trigger an alert based on job status or quality results.
+
+        #     Args:
+        #         job_id (str): The unique identifier for the job.
+        #         alert_type (str): Type of alert (e.g., 'critical_data_quality_failure', 'data_quality_summary').
+        #         details (str): JSON string containing alert details.
+        #         target_users (list): List of user emails to receive the alert.
+
+        #     Returns:
+        #         str: A message indicating whether alerting completed or is awaiting completion.
+        #     """
+        #     logger.info(f"LangChain Tool: Triggering Alerting Agent for Job ID: {job_id}, Type: {alert_type}")
+        #     try:
+        #         message_data = {
+        #             "job_id": job_id,
+        #             "alert_type": alert_type,
+        #             "details": json.loads(details),
+        #             "target_users": target_users
+        #         }
+        #     except json.JSONDecodeError as e:
+        #         logger.error(f"Invalid details JSON for job {job_id}: {e}")
+        #         return f"Failed to parse details for job {job_id} ({alert_type}): {str(e)}"
+        #     _publish_message(ALERTING_TOPIC, message_data)
+        #     _update_job_status(job_id, f"ALERTING_REQUESTED_{alert_type}")
+
+        #     max_attempts = int(os.environ.get("POLLING_MAX_ATTEMPTS", 30))
+        #     sleep_interval = float(os.environ.get("POLLING_INTERVAL_SECONDS", 2))
+        #     for attempt in range(max_attempts):
+        #         status = _get_job_status(job_id)
+        #         if status and status.get("status") == "ALERTING_COMPLETED" and status.get('details', {}).get('alert_type') == alert_type:
+        #             logger.info(f"Alerting for {job_id} ({alert_type}) completed successfully.")
+        #             return f"Alerting for job {job_id} ({alert_type}) completed."
+        #         time.sleep(sleep_interval)
+        #     return f"Alerting for job {job_id} ({alert_type}) initiated, awaiting completion."
+
+        tools = [
+            analyze_dataset,
+            trigger_quality_checker,
+            trigger_reporting_agent
+        ]
+
+        # Updated prompt template with {tool_names} and standard ReAct format
+        agent_prompt_template = """
+You are a highly intelligent Data Quality Manager AI Agent. Your goal is to ensure the highest data quality
+for incoming datasets and notify stakeholders appropriately.
+
+You have access to the following tools:
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+To achieve your goal, follow these steps:
+1. **Analyze Dataset**: Use `analyze_dataset` to inspect the dataset and generate data quality check definitions. You must wait for the analysis to complete; the `check_definitions` are stored for the job.
+2. **Perform Quality Checks**: Use `trigger_quality_checker` with the `data_ref` from step 1. You must wait for its completion and obtain the summary of the quality results and the 'quality_results' reference.
+3. **Report Results**: Use 'trigger_reporting_agent' to upload the results received from step 2 to Google Cloud Storage. Pass the job ID and the 'quality_results' reference from step 2 to the reporting function.
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}
+"""
+
+        agent_prompt = PromptTemplate.from_template(agent_prompt_template)
+        logger.info("Agent prompt template formatted successfully.")
+
+        LLM = _get_llm_client()
+        # create_react_agent, with the scratchpad kept within the prompt budget and LLM calls served from the response cache
+        agent = (
+            RunnablePassthrough.assign(agent_scratchpad=lambda x: _format_agent_scratchpad(x["intermediate_steps"]))
+            | agent_prompt.partial(tools=render_text_description(tools), tool_names=", ".join(t.name for t in tools))
+            | _cached_llm(LLM, stop=["\nObservation"])
+            | ReActSingleInputOutputParser()
+        )
+        _agent_executor_instance = AgentExecutor(
+            agent=agent, tools=tools, verbose=True,
+            handle_parsing_errors=lambda error: _fail_tool_call("Invalid or incomplete response"),
+        )
+    return _agent_executor_instance
+
+# --- Job Orchestration ---
+# Message fields passed through to the stages as per-request options.
+JOB_OPTION_KEYS = ("incremental", "dataset")
+
+# Final manager statuses; a job in any other state is still queued or running.
+TERMINAL_JOB_STATUSES = {"MANAGER_AGENT_COMPLETED", "MANAGER_AGENT_FAILED"}
+
+class JobQueueFullError(RuntimeError):
+    """Raised when every worker is busy and the job queue is full."""
+
+class JobAlreadyRunningError(RuntimeError):
+    """Raised when a job ID is already queued or running, e.g. on a Pub/Sub redelivery."""
+
+def _new_job_id():
+    """Generate a unique job ID for events that arrive without one."""
+    return f"job-{uuid.uuid4().hex[:12]}"
+
+def _current_job_id(default=None):
+    """Return the ID of the job running on this thread, falling back to `default`.
+
+    Tools use this instead of trusting the job ID echoed back by the LLM.
+    """
+    job = _current_job.get()
+    if job:
+        return job["job_id"]
+    return default or DEFAULT_JOB_ID
+
+def _get_job_executor():
+    """Initialize and return the bounded worker pool that runs manager jobs."""
+    global _job_executor, _job_slots
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=MANAGER_MAX_CONCURRENT_JOBS, thread_name_prefix="manager-job")
+            _job_slots = threading.BoundedSemaphore(MANAGER_MAX_CONCURRENT_JOBS + MANAGER_MAX_QUEUED_JOBS)
+    return _job_executor
+
+def _claim_job(job_id, gcs_uri, details=None):
+    """Mark a job as queued, atomically, so concurrent deliveries of the same job ID start it only once.
+
+    Raises:
+        JobAlreadyRunningError: If the job ID is already queued or running.
+    """
+    current_status = (_get_job_status(job_id) or {}).get("status")
+    if current_status is not None and current_status not in TERMINAL_JOB_STATUSES:
+        raise JobAlreadyRunningError(f"Job {job_id} is already in progress ({current_status})")
+    if not _transition_job_status(job_id, current_status, "MANAGER_AGENT_QUEUED", {"gcs_uri": gcs_uri, **(details or {})}):
+        raise JobAlreadyRunningError(f"Job {job_id} was claimed by another request")
+
+def _submit_job(job_id, gcs_uri, mode, options=None, wait_for_slot=False):
+    """Queue a file_landing job on the worker pool.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        gcs_uri (str): The GCS URI of the landed file, or the dataset prefix of a batch.
+        mode (str): "direct", "agent" or "batch".
+        options (dict, optional): Per-request options exposed to the stages, e.g. {"incremental": True}.
+        wait_for_slot (bool): Block until the queue has room instead of raising JobQueueFullError.
+
+    Returns:
+        concurrent.futures.Future: Resolves with the job result.
+
+    Raises:
+        JobQueueFullError: If MANAGER_MAX_CONCURRENT_JOBS jobs are running and MANAGER_MAX_QUEUED_JOBS are waiting.
+        JobAlreadyRunningError: If the job ID is already queued or running.
+    """
+    executor = _get_job_executor()
+    if not _job_slots.acquire(blocking=wait_for_slot):
+        raise JobQueueFullError(f"Job queue is full ({MANAGER_MAX_CONCURRENT_JOBS} running, {MANAGER_MAX_QUEUED_JOBS} queued)")
+    try:
+        _claim_job(job_id, gcs_uri)
+        # Run in a copy of the request context so the job span is parented to the request's trace
+        future = executor.submit(contextvars.copy_context().run, _process_file_landing, job_id, gcs_uri, mode, options)
+    except Exception:
+        _job_slots.release()
+        raise
+    future.add_done_callback(lambda _: _job_slots.release())
+    return future
+
+def _process_file_landing(job_id, gcs_uri, mode, options=None):
+    """Run one file_landing job on a worker thread and record its final status.
+
+    Args:
+        job_id (str): The unique identifier of the job.
+        gcs_uri (str): The GCS URI of the landed file, or the dataset prefix of a batch.
+        mode (str): "direct", "agent" or "batch".
+        options (dict, optional): Per-request options exposed to the stages; a batch's `files`.
+
+    Returns:
+        dict: The pipeline or agent result.
+    """
+    token = _current_job.set({**(options or {}), "job_id": job_id, "gcs_uri": gcs_uri})
+    started_at = time.time()
+    try:
+        with _span("job", job_id=job_id, mode=mode, data_ref=gcs_uri):
+            _update_job_status(job_id, "MANAGER_AGENT_STARTED", {"gcs_uri": gcs_uri})
+            if mode == "direct":
+                result = _run_direct_pipeline(job_id, gcs_uri)
+            elif mode == "batch":
+                result = _run_batch_pipeline(job_id, gcs_uri, options["files"])
+            else:
+                goal = f"Ensure data quality for the file {gcs_uri} for job {job_id} and report any issues."
+                with _span("agent.invoke", job_id=job_id):
+                    result = _get_agent_executor().invoke({"input": goal})
+        logger.info(f"Manager Agent finished job {job_id} in {mode} mode. Final result: {result}")
+        _commit_llm_responses()
+        _update_job_status(job_id, "MANAGER_AGENT_COMPLETED", {"gcs_uri": gcs_uri, "started_at": started_at, "final_agent_output": result})
+        _increment("qualis_jobs_total", mode=mode, outcome="completed")
+        return result
+    except Exception as e:
+        logger.error(f"Error running Manager Agent for job {job_id} in {mode} mode: {e}")
+        _update_job_status(job_id, "MANAGER_AGENT_FAILED", {"gcs_uri": gcs_uri, "started_at": started_at, "error": str(e)})
+        _increment("qualis_jobs_total", mode=mode, outcome="failed")
+        raise
+    finally:
+        _current_job.reset(token)
+
+# --- Landing Batches ---
+def _batch_prefix(gcs_uri):
+    """Return the dataset prefix of a landed file: its directory, without trailing key=value partition directories."""
+    parts = gcs_uri.split("/")[:-1]
+    while len(parts) > 3 and "=" in parts[-1]:
+        parts.pop()
+    return "/".join(parts) + "/"
+
+def _get_download_executor():
+    """Initialize and return the thread pool shared by batch and report manifest downloads."""
+    global _download_executor
+    with _job_executor_lock:
+        if _download_executor is None:
+            _download_executor = ThreadPoolExecutor(max_workers=MANAGER_BATCH_DOWNLOAD_WORKERS, thread_name_prefix="batch-download")
+    return _download_executor
+
+def _run_quality_checks_for_batch(data_refs, check_definitions, job_id=None, data_ref=None):
+    """Check many small files as one dataset, downloading them concurrently on the shared pool.
+
+    Up to twice MANAGER_BATCH_DOWNLOAD_WORKERS files are downloaded ahead of the one being
+    checked. Each file is folded into its own state for the per-file breakdown, then merged into
+    the batch state, so row numbers (e.g. of failure samples) count across the batch in file
+    order. Approximate unique checks fold straight into the batch state, since Bloom filters
+    only count duplicates as values are added; their per-file outcome comes from the counts the
+    file added. A file that cannot be read is reported in the breakdown instead of failing the
+    batch, and leaves the batch state as it was before the file.
+
+    Args:
+        data_refs (list): The files, in the order their rows are numbered.
+        check_definitions (str | dict | list): The checks to run.
+        job_id (str, optional): The batch job ID.
+        data_ref (str, optional): The batch's dataset prefix, recorded as the report's `dataRef`.
+
+    Returns:
+        dict: The report, with a `files` breakdown of each file's `rowOffset`, `rows`, `passedChecks`
+            and `failedChecks` (indexes into `results`), or its `error`.
+    """
+    from collections import deque
+    from itertools import islice
+
+    plan = _get_check_plan(check_definitions)
+    checks = plan["checks"]
+    run_state = _new_check_run(checks, plan)
+    executor = _get_download_executor()
+    pending = iter(data_refs)
+    downloads = deque(
+        (ref, executor.submit(_read_uri_bytes, ref)) for ref in islice(pending, MANAGER_BATCH_DOWNLOAD_WORKERS * 2)
+    )
+    files = []
+    while downloads:
+        ref, download = downloads.popleft()
+        for next_ref in islice(pending, 1):
+            downloads.append((next_ref, executor.submit(_read_uri_bytes, next_ref)))
+        file_state = {
+            "rows": run_state["rows"],
+            "plan": plan,
+            "checks": [state if "bloom" in state else _new_check_state(check) for check, state in zip(checks, run_state["checks"])],
+        }
+        # Snapshots of the shared states, Bloom bits included, to roll back a file that fails partway
+        shared = {
+            index: {key: value.copy() if hasattr(value, "copy") else value for key, value in state.items()}
+            for index, state in enumerate(run_state["checks"]) if "bloom" in state
+        }
+        try:
+            data = download.result()
+            if data is None:
+                raise FileNotFoundError(f"{ref} does not exist")
+            _fold_dataset(ref, checks, file_state, data=data)
+        except Exception as e:
+            logger.error(f"Error checking {ref} in batch {job_id}: {e}")
+            files.append({"dataRef": ref, "error": str(e)})
+            for index, before in shared.items():
+                run_state["checks"][index].clear()
+                run_state["checks"][index].update(before)
+            continue
+        for index, before in shared.items():
+            state = run_state["checks"][index]
+            file_state["checks"][index] = _check_state_delta(state, before)
+            state["missing"] = before["missing"] or state["missing"]
+        results = _check_run_results(checks, file_state)
+        failed = [index for index, result in enumerate(results) if result["outcome"] != CHECK_OUTCOME_PASS]
+        files.append({
+            "dataRef": ref,
+            "rowOffset": run_state["rows"],
+            "rows": file_state["rows"] - run_state["rows"],
+            "passedChecks": len(results) - len(failed),
+            "failedChecks": failed,
+        })
+        for index, (state, partial) in enumerate(zip(run_state["checks"], file_state["checks"])):
+            if index not in shared:
+                _merge_check_state(state, partial)
+        run_state["rows"] = file_state["rows"]
+        _report_check_progress(checks, run_state)
+
+    _increment("qualis_rows_processed_total", run_state["rows"], stage="check")
+    logger.info(f"Ran {len(checks)} quality checks over {run_state['rows']} rows of {len(data_refs)} files under {data_ref} (Job ID: {job_id})")
+    report = _build_quality_report(checks, run_state, job_id=job_id, data_ref=data_ref)
+    report["files"] = files
+    return report
+
+def _run_batch_pipeline(job_id, prefix, files):
+    """Run the direct pipeline once over a batch of files landed under the same dataset prefix.
+
+    The checks are generated from a profile of all the files together, so one small file's
+    value ranges do not fail the others, through the analysis cache and the schema registry
+    entry of the prefix (or of the landings' `dataset`). Every file is then checked in-process in one pass
+    and a single report with per-file breakdowns goes through the reporting stage.
+
+    Args:
+        job_id (str): The batch job ID.
+        prefix (str): The dataset prefix shared by the files.
+        files (list): `{"job_id", "gcs_uri"}` of each landed file.
+
+    Returns:
+        dict: The pipeline outcome, including per-stage durations and the per-file breakdowns with their `jobId`.
+    """
+    data_refs = [file["gcs_uri"] for file in files]
+    stage_seconds = {}
+
+    started = time.perf_counter()
+    with _span("stage.analyze_dataset", job_id=job_id):
+        check_definitions = _analyze_dataset(data_refs, job_id)
+    stage_seconds["analyze_dataset"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    _update_job_status(job_id, "QUALITY_CHECK_RUNNING", {"data_ref": prefix, "files": len(data_refs)})
+    try:
+        with _span("stage.trigger_quality_checker", job_id=job_id, files=len(data_refs)):
+            quality_results = _run_quality_checks_for_batch(data_refs, check_definitions, job_id=job_id, data_ref=prefix)
+    except Exception as e:
+        _update_job_status(job_id, "QUALITY_CHECKS_FAILED", {"error": str(e)})
+        raise
+    quality_results["files"] = [{"jobId": file["job_id"], **breakdown} for file, breakdown in zip(files, quality_results["files"])]
+    _update_job_status(job_id, "QUALITY_CHECKS_COMPLETED", {"data_ref": prefix, "quality_results": quality_results})
+    stage_seconds["trigger_quality_checker"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    with _span("stage.trigger_reporting_agent", job_id=job_id):
+        report_url = _run_reporting_stage(job_id, quality_results)
+    if report_url is None:
+        raise PipelineStageError("trigger_reporting_agent", "the stage did not complete in time")
+    stage_seconds["trigger_reporting_agent"] = round(time.perf_counter() - started, 3)
+
+    return {
+        "mode": "batch",
+        "summary": quality_results.get("summary"),
+        "report_url": report_url,
+        "stage_seconds": stage_seconds,
+        "files": quality_results["files"],
+    }
+
+class LandingBatcher:
+    """Collects file_landing events into per-prefix micro-batches that each run as one job.
+
+    A batch opens with the first file under a prefix and is submitted `window_seconds` later,
+    or as soon as it holds `max_files` files or `max_bytes` bytes. The files' own job IDs are
+    marked as queued (and later completed or failed) with the batch job ID, so redeliveries are
+    still detected and each file's outcome can be looked up.
+    """
+
+    def __init__(self, window_seconds, max_files=1_000, max_bytes=256 * 1024 * 1024):
+        self.window_seconds = window_seconds
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def add(self, job_id, gcs_uri, size=0, dataset=None):
+        """Add a landed file to the open batch of its prefix and, if given, its registry `dataset`.
+
+        Returns:
+            tuple: (batch job ID, Future resolving with the batch result).
+
+        Raises:
+            JobAlreadyRunningError: If the file's job ID is already queued or running.
+        """
+        key = (_batch_prefix(gcs_uri), dataset)
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = {
+                    "job_id": f"batch-{uuid.uuid4().hex[:12]}", "files": [], "bytes": 0, "future": Future(),
+                    "claiming": 0, "submitted": False,
+                }
+                batch["timer"] = threading.Timer(self.window_seconds, self._flush, (key, batch))
+                batch["timer"].daemon = True
+                batch["timer"].start()
+            batch["claiming"] += 1
+
+        # Claiming does store I/O, so it runs outside the lock; a batch closed meanwhile is
+        # submitted by the last of its files to finish claiming.
+        claimed = False
+        try:
+            _claim_job(job_id, gcs_uri, {"batch_job_id": batch["job_id"]})
+            claimed = True
+        finally:
+            with self._lock:
+                batch["claiming"] -= 1
+                if claimed:
+                    batch["files"].append({"job_id": job_id, "gcs_uri": gcs_uri, "landed_at": time.time()})
+                    batch["bytes"] += size
+                full = len(batch["files"]) >= self.max_files or batch["bytes"] >= self.max_bytes
+                closed = self._batches.get(key) is not batch and not batch["claiming"]
+            if full or closed:
+                self._flush(key, batch)
+        return batch["job_id"], batch["future"]
+
+    def _flush(self, key, batch):
+        prefix, dataset = key
+        with self._lock:
+            if self._batches.get(key) is batch:
+                del self._batches[key]  # Later landings open a new batch
+            if batch["claiming"] or batch["submitted"]:
+                return  # Left to the last file being claimed, or already submitted
+            batch["submitted"] = True
+        batch["timer"].cancel()
+        if not batch["files"]:
+            return  # Its only file was a duplicate delivery
+        logger.info(f"Submitting batch {batch['job_id']} of {len(batch['files'])} files under {prefix}")
+        try:
+            options = {"files": batch["files"], **({"dataset": dataset} if dataset else {})}
+            future = _submit_job(batch["job_id"], prefix, "batch", options, wait_for_slot=True)
+        except Exception as e:
+            _finish_batch_files(batch["job_id"], batch["files"], None, e)
+            batch["future"].set_exception(e)
+            return
+
+        def finish(done):
+            error = done.exception()
+            _finish_batch_files(batch["job_id"], batch["files"], None if error else done.result(), error)
+            if error:
+                batch["future"].set_exception(error)
+            else:
+                batch["future"].set_result(done.result())
+
+        future.add_done_callback(finish)
+
+def _finish_batch_files(batch_job_id, files, result, error):
+    """Record the final status of each file of a batch, with its breakdown from the batch result."""
+    breakdowns = result["files"] if result else [None] * len(files)
+    for file, breakdown in zip(files, breakdowns):
+        details = {"gcs_uri": file["gcs_uri"], "batch_job_id": batch_job_id, "started_at": file["landed_at"]}
+        if error is None:
+            _update_job_status(file["job_id"], "MANAGER_AGENT_COMPLETED", {**details, "final_agent_output": breakdown})
+        else:
+            _update_job_status(file["job_id"], "MANAGER_AGENT_FAILED", {**details, "error": str(error)})
+
+def _get_landing_batcher():
+    """Initialize and return the landing batcher."""
+    global _landing_batcher
+    with _job_executor_lock:
+        if _landing_batcher is None:
+            _landing_batcher = LandingBatcher(MANAGER_BATCH_WINDOW_SECONDS, MANAGER_BATCH_MAX_FILES, MANAGER_BATCH_MAX_BYTES)
+    return _landing_batcher
+
+# --- Cloud Function Entry Point ---
+def manager_agent_langchain(request):
+    """
+    Cloud Function for the LangChain-powered Manager Agent.
+    Triggered by HTTP or Pub/Sub (via push subscription). GET /metrics serves the counters
+    and histograms in the Prometheus text format.
+    """
+    if request.method == 'GET' and request.path.rstrip('/').endswith('/metrics'):
+        return _render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+    if request.method == 'POST':
+        try:
+            request_json = request.get_json(silent=True)
+            if not request_json:
+                envelope = json.loads(request.data.decode('utf-8'))
+                message_data = base64.b64decode(envelope['message']['data']).decode('utf-8')
+                message = json.loads(message_data)
+            else:
+                message = request_json
+
+            event_type = message.get("event_type")
+            gcs_uri = message.get("gcs_uri")
+            job_id = message.get("job_id") or _new_job_id()
+
+            if not event_type or not gcs_uri:
+                raise ValueError("Missing required fields: event_type and gcs_uri")
+            if not gcs_uri.startswith("gs://"):
+                raise ValueError("Invalid GCS URI format")
+
+            if event_type == "file_landing":
+                logger.info(f"Manager Agent (LangChain) received file_landing event for Job ID: {job_id}, GCS URI: {gcs_uri}")
+                mode = message.get("mode") or MANAGER_AGENT_MODE
+
+                try:
+                    if MANAGER_BATCH_WINDOW_SECONDS > 0:
+                        batch_job_id, future = _get_landing_batcher().add(
+                            job_id, gcs_uri, int(message.get("size") or 0), message.get("dataset"))
+                    else:
+                        options = {key: message[key] for key in JOB_OPTION_KEYS if key in message}
+                        future = _submit_job(job_id, gcs_uri, mode, options)
+                except JobQueueFullError as e:
+                    # 429 makes Pub/Sub push subscriptions back off and redeliver later
+                    logger.warning(f"Rejecting job {job_id}: {e}")
+                    return json.dumps({"status": "busy", "job_id": job_id, "message": str(e)}), 429
+                except JobAlreadyRunningError as e:
+                    # Acknowledge duplicates so they are not redelivered
+                    logger.warning(f"Ignoring duplicate delivery: {e}")
+                    return json.dumps({"status": "duplicate", "job_id": job_id, "message": str(e)}), 200
+
+                if MANAGER_BATCH_WINDOW_SECONDS > 0:
+                    # Every file of a batch shares its result; each request answers with its own file's breakdown
+                    if message.get("wait", True) is False:
+                        return json.dumps({"status": "accepted", "job_id": job_id, "batch_job_id": batch_job_id}), 202
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        return json.dumps({"status": "error", "job_id": job_id, "batch_job_id": batch_job_id, "message": str(e)}), 500
+                    breakdown = next((file for file in result["files"] if file["jobId"] == job_id), None)
+                    return json.dumps({
+                        "status": "success",
+                        "job_id": job_id,
+                        "batch_job_id": batch_job_id,
+                        "agent_output": {key: value for key, value in result.items() if key != "files"},
+                        "file": breakdown,
+                    }), 200
+
+                if message.get("wait", True) is False:
+                    return json.dumps({"status": "accepted", "job_id": job_id}), 202
+
+                try:
+                    result = future.result()
+                    return json.dumps({"status": "success", "job_id": job_id, "agent_output": result}), 200
+                except Exception as e:
+                    return json.dumps({"status": "error", "job_id": job_id, "message": str(e)}), 500
+
+            else:
+                logger.warning(f"Manager Agent received unhandled event type: {event_type} for job {job_id}")
+                return json.dumps({"status": "ignored", "message": f"Unhandled event type: {event_type}"}), 200
+
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Invalid request format: {e}")
+            return json.dumps({"status": "error", "message": f"Invalid request format: {str(e)}"}), 400
+        except Exception as e:
+            logger.error(f"Error in manager_agent_langchain function: {e}", exc_info=True)
+            return json.dumps({"status": "error", "message": str(e)}), 500
+    else:
+        return 'Only POST requests are accepted', 405
+# --- Instance Warm-up ---
+def _warm_up():
+    """Import the heavy dependencies and build the clients and agent before the first request arrives.
+
+    Steps that cannot complete here (e.g. GOOGLE_API_KEY is not set) are logged and left to
+    happen lazily on first use.
+    """
+    started = time.perf_counter()
+    steps = [
+        ("pandas", lambda: importlib.import_module("pandas")),
+        ("pyarrow", lambda: importlib.import_module("pyarrow.parquet")),
+        ("storage_client", _get_storage_client),
+        ("publisher_client", _get_publisher_client),
+        ("job_status_store", _get_job_status_store),
+        ("status_listener", _start_job_status_listener),
+    ]
+    if CHECK_WORKERS > 1:
+        steps.append(("check_workers", lambda: list(_get_check_process_pool().map(int, range(CHECK_WORKERS)))))
+    if MANAGER_AGENT_MODE == "agent" or DIRECT_PIPELINE_LLM_FALLBACK:
+        steps.append(("agent", _get_agent_executor))
+    for name, step in steps:
+        try:
+            with _span(f"warmup.{name}"):
+                step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} skipped: {e}")
+    logger.info(f"Instance warm-up finished in {time.perf_counter() - started:.2f}s")
+
+if MANAGER_WARMUP != "off":
+    import multiprocessing
+
+    # Check worker processes re-import this module and must not warm up themselves
+    if multiprocessing.parent_process() is None:
+        if MANAGER_WARMUP == "blocking":
+            _warm_up()
+        else:
+            threading.Thread(target=_warm_up, name="manager-warmup", daemon=True).start()
@@ -0,0 +1,474 @@
+"""Benchmark harness for the analyze -> check -> report pipeline in AgentQualis.py.
+
+Generates a synthetic dataset, runs each stage against local stand-ins for Cloud Storage and
+Pub/Sub, and prints throughput, per-stage peak memory and latency percentiles as JSON. The cold
+import of AgentQualis is timed in fresh interpreters and checked against an import-time budget.
+
+Examples:
+    python benchmark_pipeline.py --rows 1000000 --columns 20 --format parquet --output bench.json
+    python benchmark_pipeline.py --rows 1000000 --baseline bench.json --tolerance 0.15
+    python benchmark_pipeline.py --startup-only --import-budget-ms 300
+    python benchmark_pipeline.py --rows 1000000 --check-workers 1,2,4
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+import AgentQualis
+
+STAGES = ("analyze", "analyze_cached", "analyze_registered", "check", "check_pruned", "report")
+
+# Dependencies that must stay out of the module import so cold starts stay fast.
+HEAVY_MODULES = ("langchain", "langchain_google_genai", "google.cloud.pubsub_v1", "pandas", "pyarrow")
+IMPORT_BUDGET_MS = 500
+
+# Real GCS serves object hashes from metadata, so the stand-in hashes each file version once
+_md5_hashes = {}
+
+
+# --- Local stand-ins for Cloud Storage and Pub/Sub ---
+class LocalBlob:
+    """Cloud Storage blob stand-in backed by a file under the local root."""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.path, name)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def md5_hash(self):
+        stat = os.stat(self.path)
+        key = (self.path, stat.st_mtime_ns, stat.st_size)
+        if key not in _md5_hashes:
+            digest = hashlib.md5()
+            with open(self.path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            _md5_hashes[key] = base64.b64encode(digest.digest()).decode("ascii")
+        return _md5_hashes[key]
+
+    crc32c = None
+
+    @property
+    def generation(self):
+        return os.stat(self.path).st_mtime_ns
+
+    def open(self, mode="rb", chunk_size=None, **kwargs):
+        if "w" in mode:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return open(self.path, mode)
+
+    def download_as_bytes(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+
+class LocalBucket:
+    """Cloud Storage bucket stand-in mapped to a local directory."""
+
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name):
+        blob = LocalBlob(self, name)
+        return blob if os.path.exists(blob.path) else None
+
+
+class LocalStorageClient:
+    """storage.Client stand-in: gs://bucket/path resolves to <root>/bucket/path."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def bucket(self, name):
+        return LocalBucket(self.root, name)
+
+
+class LocalPublisherClient:
+    """PublisherClient stand-in that records messages and resolves publishes immediately.
+
+    `responders` maps a topic name to a callable that receives each decoded message, standing
+    in for the remote agent subscribed to that topic.
+    """
+
+    def __init__(self, responders=None):
+        self.messages = []
+        self.responders = responders or {}
+
+    def topic_path(self, project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic_path, data, **attributes):
+        self.messages.append((topic_path, data))
+        responder = self.responders.get(topic_path.rsplit("/", 1)[-1])
+        if responder is not None:
+            responder(json.loads(data))
+        future = Future()
+        future.set_result(str(len(self.messages)))
+        return future
+
+
+# --- Synthetic data ---
+def generate_dataset(path, rows, columns, fmt, null_rate, outlier_rate, seed):
+    """Write a synthetic dataset with a mix of id, integer, float and string columns.
+
+    Args:
+        path (str): Where to write the dataset.
+        rows (int): Number of rows.
+        columns (int): Number of columns besides `id`.
+        fmt (str): "csv" or "parquet".
+        null_rate (float): Fraction of nulls injected into every non-id column.
+        outlier_rate (float): Fraction of numeric values multiplied far outside their normal range.
+        seed (int): Random seed, so runs are reproducible.
+    """
+    rng = np.random.default_rng(seed)
+    data = {"id": np.arange(rows)}
+    words = np.array(["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"])
+    for index in range(columns):
+        kind = ("int", "float", "str")[index % 3]
+        if kind == "int":
+            values = rng.integers(18, 90, rows).astype("float64")
+        elif kind == "float":
+            values = rng.normal(100.0, 15.0, rows)
+        else:
+            values = rng.choice(words, rows).astype(object)
+        if kind != "str" and outlier_rate:
+            outliers = rng.random(rows) < outlier_rate
+            values[outliers] = values[outliers] * 1000
+        if null_rate:
+            values[rng.random(rows) < null_rate] = None if kind == "str" else np.nan
+        data[f"{kind}_{index}"] = values
+
+    df = pd.DataFrame(data)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+# --- Measurement ---
+def _peak_rss_mb():
+    """Peak resident set size of this process over its whole lifetime, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(samples):
+    values = np.asarray(samples, dtype="float64")
+    return {
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def measure_startup(repeat):
+    """Time `import AgentQualis` in `repeat` fresh interpreters with warm-up disabled.
+
+    Returns:
+        dict: Import latency percentiles and the heavy modules the import pulled in.
+    """
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import AgentQualis\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = {**os.environ, "MANAGER_WARMUP": "off"}
+    cwd = os.path.dirname(os.path.abspath(AgentQualis.__file__))
+    samples, loaded = [], set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=cwd, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        measurement = json.loads(output.strip().splitlines()[-1])
+        samples.append(measurement["seconds"])
+        loaded.update(measurement["loaded"])
+    return {"latency_seconds": _percentiles(samples), "heavy_modules_loaded": sorted(loaded)}
+
+
+def check_import_budget(startup, budget_ms):
+    """List import-time budget violations: a slow p50 or heavy modules loaded at import."""
+    regressions = []
+    p50_ms = startup["latency_seconds"]["p50"] * 1000
+    if p50_ms > budget_ms:
+        regressions.append({"stage": "import", "budget_ms": budget_ms, "current_p50_ms": p50_ms})
+    if startup["heavy_modules_loaded"]:
+        regressions.append({"stage": "import", "heavy_modules_loaded": startup["heavy_modules_loaded"]})
+    return regressions
+
+
+def run_stages(workdir, gcs_uri, job_id, measure):
+    """Run every stage once, in order.
+
+    Args:
+        workdir (str): The benchmark's scratch directory.
+        gcs_uri (str): The dataset to run the stages on.
+        job_id (str): The job ID to run them under.
+        measure (callable): Called as `measure(stage, run)`; runs `run()` and returns its result.
+
+    Returns:
+        dict: The quality results of the "check" stage.
+    """
+    AgentQualis._analysis_cache = AgentQualis.AnalysisCache(max_entries=16)
+    AgentQualis.SCHEMA_REGISTRY_URI = os.path.join(workdir, f"schema-registry-{job_id}")
+    check_definitions = measure("analyze", lambda: AgentQualis._analyze_dataset(gcs_uri, job_id))
+    profile = AgentQualis._get_job_status(job_id)["profile"]
+    measure("analyze_cached", lambda: AgentQualis._analyze_dataset(gcs_uri, job_id))
+
+    AgentQualis._analysis_cache = AgentQualis.AnalysisCache(max_entries=16)
+    measure("analyze_registered", lambda: AgentQualis._analyze_dataset(gcs_uri, job_id))
+
+    quality_results = measure(
+        "check", lambda: AgentQualis._run_quality_checks_for_ref(gcs_uri, check_definitions, job_id=job_id))
+    # Same checks with the analysis profile, so checks it shows cannot fail are skipped
+    measure("check_pruned", lambda: AgentQualis._run_quality_checks_for_ref(
+        gcs_uri, check_definitions, job_id=job_id, profile=profile))
+
+    # Through the publishing path; the stand-in reporting agent completes the job as soon as it is asked
+    measure("report", lambda: AgentQualis._run_reporting_stage(job_id, quality_results))
+    return quality_results
+
+
+def _reset_check_pool(workers):
+    """Shut down the check process pool so the next parallel fold starts one with `workers` processes."""
+    if AgentQualis._check_process_pool is not None:
+        AgentQualis._check_process_pool.shutdown()
+        AgentQualis._check_process_pool = None
+    AgentQualis.CHECK_WORKERS = workers
+
+
+def measure_check_scaling(gcs_uri, rows, check_definitions, worker_counts, repeat):
+    """Time the check stage with each number of worker processes, against the cost of sharing chunks with them.
+
+    Every parallel chunk is serialized to Arrow IPC for the workers, so the pool only pays off
+    when the per-chunk check work saved outweighs that serialization.
+
+    Returns:
+        dict: `arrow_ipc_seconds_per_chunk`, `chunks` and, per worker count, the check latency
+            percentiles, the speedup over one worker and whether the report matched the one-worker report.
+    """
+    import pyarrow as pa
+
+    chunks = AgentQualis._iter_dataset_chunks(gcs_uri, chunk_rows=AgentQualis.PROFILE_CHUNK_ROWS)
+    try:
+        chunk = next(chunks)
+    finally:
+        chunks.close()
+    serialize_seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        sink.getvalue()
+        serialize_seconds.append(time.perf_counter() - started)
+
+    def comparable(report):
+        return [(result["check"], result["outcome"], result.get("metrics")) for result in report["results"]]
+
+    configured_workers = AgentQualis.CHECK_WORKERS
+    workers = {}
+    reference = baseline_p50 = None
+    try:
+        for count in sorted({1, *worker_counts}):
+            _reset_check_pool(count)
+            job_id = f"bench-workers-{count}"
+            report = AgentQualis._run_quality_checks_for_ref(gcs_uri, check_definitions, job_id=job_id)  # Warm-up; starts the workers
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                AgentQualis._run_quality_checks_for_ref(gcs_uri, check_definitions, job_id=job_id)
+                samples.append(time.perf_counter() - started)
+            p50 = float(np.percentile(samples, 50))
+            if reference is None:
+                reference, baseline_p50 = comparable(report), p50
+            workers[str(count)] = {
+                "latency_seconds": _percentiles(samples),
+                "speedup": baseline_p50 / p50 if p50 else None,
+                "matches_one_worker": comparable(report) == reference,
+            }
+    finally:
+        _reset_check_pool(configured_workers)
+    return {
+        "arrow_ipc_seconds_per_chunk": _percentiles(serialize_seconds),
+        "chunks": math.ceil(rows / AgentQualis.PROFILE_CHUNK_ROWS),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+    }
+
+
+def run_benchmark(args):
+    """Run every stage `args.repeat` times and return the results document."""
+    workdir = tempfile.mkdtemp(prefix="qualis-bench-")
+    try:
+        extension = "parquet" if args.format == "parquet" else "csv"
+        data_path = os.path.join(workdir, "landing", f"bench.{extension}")
+        os.makedirs(os.path.dirname(data_path))
+        generate_dataset(data_path, args.rows, args.columns, args.format, args.null_rate, args.outlier_rate, args.seed)
+        dataset_bytes = os.path.getsize(data_path)
+        gcs_uri = f"gs://landing/bench.{extension}"
+
+        AgentQualis._storage_client = LocalStorageClient(workdir)
+        AgentQualis._publisher_client = LocalPublisherClient(responders={
+            AgentQualis.REPORTING_TOPIC: lambda message: AgentQualis._update_job_status(message["job_id"], "REPORTING_COMPLETED"),
+        })
+        AgentQualis.INCREMENTAL_STATE_URI = os.path.join(workdir, "incremental")
+        AgentQualis.QUALITY_METRICS_DB_PATH = os.path.join(workdir, "quality_metrics.db")
+
+        latencies = {stage: [] for stage in STAGES}
+
+        def timed(stage, run):
+            started = time.perf_counter()
+            result = run()
+            latencies[stage].append(time.perf_counter() - started)
+            return result
+
+        quality_results = None
+        for attempt in range(args.repeat):
+            quality_results = run_stages(workdir, gcs_uri, f"bench-{attempt}", timed)
+
+        # Peak memory comes from one more, traced, pass so tracing overhead stays out of the latencies.
+        # The peak is reset before every stage and measured above what earlier stages retained.
+        peak_memory = {}
+
+        def traced(stage, run):
+            tracemalloc.reset_peak()
+            retained = tracemalloc.get_traced_memory()[0]
+            result = run()
+            peak_memory[stage] = (tracemalloc.get_traced_memory()[1] - retained) / 1024 / 1024
+            return result
+
+        tracemalloc.start()
+        try:
+            run_stages(workdir, gcs_uri, "bench-traced", traced)
+        finally:
+            tracemalloc.stop()
+
+        check_scaling = None
+        if args.check_workers:
+            check_definitions = AgentQualis._analyze_dataset(gcs_uri, "bench-0")
+            check_scaling = measure_check_scaling(gcs_uri, args.rows, check_definitions, args.check_workers, args.repeat)
+
+        stages = {}
+        for stage in STAGES:
+            p50 = float(np.percentile(latencies[stage], 50))
+            stages[stage] = {
+                "latency_seconds": _percentiles(latencies[stage]),
+                "rows_per_second": args.rows / p50 if p50 else None,
+                "mb_per_second": dataset_bytes / 1024 / 1024 / p50 if p50 else None,
+                "peak_memory_mb": peak_memory[stage],
+            }
+        return {
+            "config": {
+                "rows": args.rows,
+                "columns": args.columns,
+                "format": args.format,
+                "null_rate": args.null_rate,
+                "outlier_rate": args.outlier_rate,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "check_workers": AgentQualis.CHECK_WORKERS,
+            },
+            "dataset_bytes": dataset_bytes,
+            "checks": quality_results["summary"]["totalChecks"] if quality_results else 0,
+            "stages": stages,
+            **({"check_scaling": check_scaling} if check_scaling else {}),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """List the stages whose p50 latency grew by more than `tolerance` relative to the baseline.
+
+    Returns:
+        list: One dictionary per regression.
+    """
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        before = previous["latency_seconds"]["p50"]
+        after = current["latency_seconds"]["p50"]
+        if before and after > before * (1 + tolerance):
+            regressions.append({
+                "stage": stage,
+                "baseline_p50": before,
+                "current_p50": after,
+                "change": after / before - 1,
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--null-rate", type=float, default=0.01)
+    parser.add_argument("--outlier-rate", type=float, default=0.001)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the results JSON to this file.")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p50 latency increase (0.10 = 10%%).")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS, help="Allowed p50 cold import time.")
+    parser.add_argument("--startup-only", action="store_true", help="Only measure the cold import.")
+    parser.add_argument(
+        "--check-workers", type=lambda value: [int(count) for count in value.split(",")],
+        help="Comma-separated CHECK_WORKERS counts to time the check stage with, e.g. 1,2,4.",
+    )
+    args = parser.parse_args(argv)
+
+    results = {"stages": {}} if args.startup_only else run_benchmark(args)
+    startup = measure_startup(args.repeat)
+    results["stages"]["import"] = startup
+    results["regressions"] = check_import_budget(startup, args.import_budget_ms)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            results["regressions"] += compare_to_baseline(results, json.load(f), args.tolerance)
+
+    document = json.dumps(results, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document)
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
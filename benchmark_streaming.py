@@ -0,0 +1,173 @@
+"""Load test for the dashboard's live job event stream (GET /api/v1/events in frontend/backend/api.py).
+
+Starts the API on a local threaded server in a separate process, connects many concurrent SSE
+clients, then drives job status transitions and check progress events through AgentQualis at a
+fixed rate. Prints delivery latency percentiles, events lost per client and delivered throughput
+as JSON, and exits non-zero if a client missed events or p99 latency exceeds the budget.
+
+Examples:
+    python benchmark_streaming.py --clients 500 --events 200 --rate 50
+    python benchmark_streaming.py --clients 1000 --events 100 --max-p99-ms 500 --output stream.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+from benchmark_pipeline import _percentiles
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "backend")
+MAX_P99_MS = 1000
+
+
+def _serve(port, clients, events, rate, jobs, ready):
+    """Server process: run the API and, once every client is subscribed, emit `events` events at `rate` per second."""
+    os.environ.setdefault("JOB_STATUS_BACKEND", "memory")
+    os.environ["API_EVENT_MAX_SUBSCRIBERS"] = str(clients + 10)
+    sys.path.insert(0, API_DIR)
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import AgentQualis
+    import api
+
+    logging.getLogger("AgentQualis").setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", port, api.app, threaded=True)
+    ready.set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 120
+    while api._events.subscribers < clients and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    results = [{"check": {"type": "not_null", "column": f"col_{i}"}, "outcome": "PASSED", "details": None} for i in range(20)]
+    started = time.perf_counter()
+    for i in range(events):
+        job_id = f"bench-job-{i % jobs}"
+        if i % 2:
+            AgentQualis._notify_status_observers(job_id, AgentQualis._build_status_data(
+                "QUALITY_CHECK_PROGRESS", {"data_ref": "gs://bench/orders.csv", "rows": i * 10_000, "results": results},
+            ))
+        else:
+            AgentQualis._update_job_status(job_id, "QUALITY_CHECK_RUNNING", {"data_ref": "gs://bench/orders.csv"})
+        time.sleep(max(0.0, started + (i + 1) / rate - time.perf_counter()))
+    time.sleep(3600)
+
+
+async def _client(port, events, timeout, latencies):
+    """One SSE subscriber: read events until `events` arrived or `timeout` expired.
+
+    Returns:
+        tuple: (events received, seconds to connect).
+    """
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /api/v1/events HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAccept: text/event-stream\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    connect_seconds = time.perf_counter() - started
+
+    received = 0
+    deadline = time.monotonic() + timeout
+    try:
+        while received < events:
+            line = await asyncio.wait_for(reader.readline(), max(0.01, deadline - time.monotonic()))
+            if not line:
+                break
+            if line.startswith(b"data: "):
+                received_at = time.time()
+                event = json.loads(line[6:])
+                latencies.append(received_at - datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00")).timestamp())
+                received += 1
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+    return received, connect_seconds
+
+
+async def _run_clients(port, clients, events, timeout):
+    latencies = []
+    outcomes = await asyncio.gather(*(_client(port, events, timeout, latencies) for _ in range(clients)))
+    return outcomes, latencies
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_load_test(args):
+    port = _free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(
+        target=_serve, args=(port, args.clients, args.events, args.rate, args.jobs, ready), daemon=True,
+    )
+    server.start()
+    try:
+        ready.wait(60)
+        timeout = 30 + args.events / args.rate
+        started = time.perf_counter()
+        outcomes, latencies = asyncio.run(_run_clients(port, args.clients, args.events, timeout))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.join()
+
+    received = [count for count, _ in outcomes]
+    return {
+        "clients": args.clients,
+        "events": args.events,
+        "rate": args.rate,
+        "connect_seconds": _percentiles([seconds for _, seconds in outcomes]),
+        "latency_seconds": _percentiles(latencies) if latencies else None,
+        "events_received_min": min(received),
+        "clients_with_lost_events": sum(1 for count in received if count < args.events),
+        "delivered_events_per_second": round(sum(received) / elapsed, 1),
+    }
+
+
+def check_results(results, max_p99_ms):
+    regressions = []
+    if results["clients_with_lost_events"]:
+        regressions.append(f"{results['clients_with_lost_events']} of {results['clients']} clients missed events "
+                           f"(fewest received: {results['events_received_min']} of {results['events']})")
+    latency = results["latency_seconds"]
+    if latency and latency["p99"] * 1000 > max_p99_ms:
+        regressions.append(f"p99 delivery latency {latency['p99'] * 1000:.0f}ms exceeds {max_p99_ms:.0f}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=20, help="Events emitted per second.")
+    parser.add_argument("--jobs", type=int, default=10, help="Distinct job IDs the events are spread over.")
+    parser.add_argument("--max-p99-ms", type=float, default=MAX_P99_MS, help="Allowed p99 delivery latency.")
+    parser.add_argument("--output", help="Also write the results JSON to this file.")
+    args = parser.parse_args(argv)
+
+    results = run_load_test(args)
+    results["regressions"] = check_results(results, args.max_p99_ms)
+
+    document = json.dumps(results, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document)
+    return 1 if results["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
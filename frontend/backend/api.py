@@ -1,115 +1,738 @@
-from flask import Flask, jsonify
-from datetime import datetime, timedelta
-import random
+from flask import Flask, Response, abort, g, request
+from datetime import datetime, timedelta, timezone
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from functools import wraps
+from itertools import islice
+import base64
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+
+# The dashboard reads jobs and reports through AgentQualis, which lives at the repository root.
+sys.path.insert(0, os.environ.get('QUALIS_MODULE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')))
+import AgentQualis as qualis
+
+# Configuration
+# Cached responses are dropped when a job completes that they can include. Without JOB_STATUS_SUBSCRIPTION this process only sees its
+# own transitions, so cached responses also expire after API_CACHE_TTL_SECONDS.
+API_CACHE_MAX_ENTRIES = int(os.environ.get('API_CACHE_MAX_ENTRIES', 1024))
+API_CACHE_TTL_SECONDS = float(os.environ.get('API_CACHE_TTL_SECONDS', 15))
+# Listing endpoints cover the last API_DEFAULT_RANGE_DAYS days unless from/to are given.
+API_DEFAULT_RANGE_DAYS = int(os.environ.get('API_DEFAULT_RANGE_DAYS', 7))
+API_MAX_RANGE_DAYS = int(os.environ.get('API_MAX_RANGE_DAYS', 366))
+API_DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+API_GZIP_MIN_BYTES = int(os.environ.get('API_GZIP_MIN_BYTES', 1024))
+# Parsed per-day report manifests kept in memory; closed days never change, so they are only evicted by LRU.
+API_MANIFEST_CACHE_DAYS = int(os.environ.get('API_MANIFEST_CACHE_DAYS', 400))
+# /api/v1/events: events kept for clients resuming with Last-Event-ID, idle keep-alive interval and a cap on open
+# streams. Each open stream holds a server thread (or greenlet under a gevent worker).
+API_EVENT_HISTORY = int(os.environ.get('API_EVENT_HISTORY', 1000))
+API_EVENT_HEARTBEAT_SECONDS = float(os.environ.get('API_EVENT_HEARTBEAT_SECONDS', 15))
+API_EVENT_MAX_SUBSCRIBERS = int(os.environ.get('API_EVENT_MAX_SUBSCRIBERS', 1000))
 
 app = Flask(__name__)
 
 # Enums
-class AgentStatus:
-    Active = "Active"
-    Inactive = "Inactive"
-
 class RunStatus:
     Success = "Success"
     Failed = "Failed"
     Running = "Running"
 
-class CheckStatus:
-    Passed = "Passed"
-    Failed = "Failed"
-    Warning = "Warning"
-
-class DataLayer:
-    Raw = "Raw"
-    Defined = "Defined"
-    Derived = "Derived"
-
 class Trend:
     Up = "up"
     Down = "down"
     Stable = "stable"
 
-# Static Data
-AGENTS = [
-    { 'id': 'agent-1', 'name': 'Data Quality Agent', 'status': AgentStatus.Active, 'lastRun': (datetime.now() - timedelta(minutes=15)).isoformat() + 'Z' },
-    { 'id': 'agent-2', 'name': 'Data Transfer Agent', 'status': AgentStatus.Active, 'lastRun': (datetime.now() - timedelta(minutes=5)).isoformat() + 'Z' },
-]
-
-HISTORY_RUNS = [
-    { 'id': 'run-1', 'agentName': 'Data Quality Agent', 'timestamp': (datetime.now() - timedelta(minutes=15)).isoformat() + 'Z', 'status': RunStatus.Success, 'duration': '2m 15s', 'dataObjectId': 'do-1', 'dataObjectVersion': 'v1.2.3' },
-    { 'id': 'run-2', 'agentName': 'Data Transfer Agent', 'timestamp': (datetime.now() - timedelta(minutes=5)).isoformat() + 'Z', 'status': RunStatus.Success, 'duration': '45s', 'dataObjectId': 'do-2', 'dataObjectVersion': 'v2.0.1' },
-    { 'id': 'run-3', 'agentName': 'Data Quality Agent', 'timestamp': (datetime.now() - timedelta(hours=1)).isoformat() + 'Z', 'status': RunStatus.Success, 'duration': '2m 10s', 'dataObjectId': 'do-1', 'dataObjectVersion': 'v1.2.2' },
-    { 'id': 'run-4', 'agentName': 'Data Transfer Agent', 'timestamp': (datetime.now() - timedelta(hours=2)).isoformat() + 'Z', 'status': RunStatus.Failed, 'duration': '1m 5s', 'dataObjectId': 'do-2', 'dataObjectVersion': 'v2.0.0' },
-    { 'id': 'run-5', 'agentName': 'Data Quality Agent', 'timestamp': (datetime.now() - timedelta(hours=4)).isoformat() + 'Z', 'status': RunStatus.Success, 'duration': '2m 30s', 'dataObjectId': 'do-3', 'dataObjectVersion': 'v1.5.0' },
-]
-
-def generate_checks(count: int):
-    checks = []
-    check_names = ['Null Check', 'Uniqueness', 'Format Validation', 'Range Check', 'Referential Integrity']
-    for i in range(count):
-        status = random.choices([CheckStatus.Failed, CheckStatus.Warning, CheckStatus.Passed], weights=[0.1, 0.1, 0.8])[0]
-        checks.append({
-            'id': f'check-{i}',
-            'name': check_names[i % len(check_names)],
-            'status': status,
-            'timestamp': (datetime.now() - timedelta(days=random.random())).isoformat() + 'Z'
-        })
-    return checks
-
-DATA_OBJECTS = [
-    {
-        'id': 'do-1',
-        'name': 'customers',
-        'version': '1.2.3',
-        'layer': DataLayer.Raw,
-        'description': 'Raw customer data ingested from CRM system.',
-        'checks': generate_checks(5),
-        'qualityMetrics': [
-            { 'name': 'Freshness', 'value': '15m ago', 'trend': Trend.Stable },
-            { 'name': 'Completeness', 'value': '98.5%', 'trend': Trend.Up },
-            { 'name': 'Accuracy', 'value': '92.1%', 'trend': Trend.Down },
-            { 'name': 'Validity', 'value': '99.7%', 'trend': Trend.Stable },
-        ],
-    },
-    {
-        'id': 'do-2',
-        'name': 'orders',
-        'version': '2.0.1',
-        'layer': DataLayer.Defined,
-        'description': 'Cleaned and structured customer order information.',
-        'checks': generate_checks(8),
-        'qualityMetrics': [
-            { 'name': 'Freshness', 'value': '30m ago', 'trend': Trend.Stable },
-            { 'name': 'Completeness', 'value': '99.8%', 'trend': Trend.Up },
-            { 'name': 'Accuracy', 'value': '99.5%', 'trend': Trend.Up },
-            { 'name': 'Validity', 'value': '100%', 'trend': Trend.Stable },
-        ],
-    },
-    {
-        'id': 'do-3',
-        'name': 'monthly_revenue',
-        'version': '1.5.0',
-        'layer': DataLayer.Derived,
-        'description': 'Aggregated monthly revenue report for analytics.',
-        'checks': generate_checks(4),
-        'qualityMetrics': [
-            { 'name': 'Freshness', 'value': '1h ago', 'trend': Trend.Stable },
-            { 'name': 'Completeness', 'value': '100%', 'trend': Trend.Stable },
-            { 'name': 'Accuracy', 'value': '100%', 'trend': Trend.Stable },
-            { 'name': 'Validity', 'value': '100%', 'trend': Trend.Stable },
-        ],
-    },
-]
-
-@app.route('/api/v1/dashboard-data', methods=['GET'])
-def get_dashboard_data():
-    return jsonify({
-        "data": {
-            "agents": AGENTS,
-            "historyRuns": HISTORY_RUNS,
-            "dataObjects": DATA_OBJECTS
+# Quality metrics
+# Check types behind each dashboard metric; a metric is 1 - violating values / rows examined by those checks.
+QUALITY_METRIC_CHECK_TYPES = {
+    'Completeness': ('not_null',),
+    'Validity': ('range', 'length'),
+    'Uniqueness': ('unique',),
+}
+# Changes smaller than this (0.1 percentage points) between the last two buckets are reported as stable.
+TREND_THRESHOLD = 0.001
+
+def _format_age(seconds: float) -> str:
+    if seconds < 3_600:
+        return f'{max(0, int(seconds // 60))}m ago'
+    if seconds < 86_400:
+        return f'{int(seconds // 3_600)}h ago'
+    return f'{int(seconds // 86_400)}d ago'
+
+def _format_percent(rate: float) -> str:
+    return f'{rate * 100:.1f}'.rstrip('0').rstrip('.') + '%'
+
+def _violation_rate(sums: dict, check_types):
+    rows = sum(sums[check_type]['rows'] for check_type in check_types if check_type in sums)
+    failed = sum(sums[check_type]['failed'] for check_type in check_types if check_type in sums)
+    return 1 - failed / rows if rows else None
+
+def _pass_rate(sums: dict):
+    total = sums.get('')
+    return total['passed'] / total['checks'] if total and total['checks'] else None
+
+def _trend(current, previous) -> str:
+    if current is None or previous is None or abs(current - previous) < TREND_THRESHOLD:
+        return Trend.Stable
+    return Trend.Up if current > previous else Trend.Down
+
+def _quality_metrics(dataset: str, granularity: str = 'day') -> list:
+    """Freshness plus Completeness, Validity, Uniqueness and Checks Passed over the latest bucket, trended against the one before."""
+    store = qualis._get_quality_metrics_store()
+    freshness = store.freshness(dataset) if store is not None else None
+    if freshness is None:
+        return []
+    buckets = store.latest_by_check_type(dataset, granularity)
+    current, previous = buckets[0], buckets[1] if len(buckets) > 1 else {}
+    metrics = [{'name': 'Freshness', 'value': _format_age(time.time() - freshness[0]), 'trend': Trend.Stable}]
+    for name, check_types in QUALITY_METRIC_CHECK_TYPES.items():
+        rate = _violation_rate(current, check_types)
+        if rate is not None:
+            metrics.append({'name': name, 'value': _format_percent(rate), 'trend': _trend(rate, _violation_rate(previous, check_types))})
+    rate = _pass_rate(current)
+    if rate is not None:
+        metrics.append({'name': 'Checks Passed', 'value': _format_percent(rate), 'trend': _trend(rate, _pass_rate(previous))})
+    return metrics
+
+# Response cache
+# Bumped whenever a job reaches a terminal status; the latest changes are kept so a response built while a job
+# completed is not cached if the job can change it.
+_data_version = 0
+_recent_changes = deque(maxlen=256)  # (version, (job_id, dataset, first, last)) of the latest terminal transitions
+
+class CachedResponse:
+    def __init__(self, payload: dict, last_modified, scope):
+        self.body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, mtime=0) if len(self.body) >= API_GZIP_MIN_BYTES else None
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.last_modified = datetime.fromtimestamp(last_modified or time.time(), timezone.utc)
+        self.scope = scope
+        self.created = time.monotonic()
+
+    def is_fresh(self) -> bool:
+        return _listening() or time.monotonic() - self.created < API_CACHE_TTL_SECONDS
+
+    def to_response(self) -> Response:
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        if self.gzipped is not None and 'gzip' in request.accept_encodings:
+            response.set_data(self.gzipped)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(f'{self.etag}-gzip')
+        response.vary.add('Accept-Encoding')
+        response.last_modified = self.last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def _cache_scope(start: float = None, end: float = None, dataset: str = None, job_id: str = None):
+    """Declare which completed jobs can change the response being built.
+
+    Either the one job `job_id`, or jobs active in [start, end] (of `dataset`, if given). Responses
+    that declare nothing are dropped whenever any job completes.
+    """
+    g.cache_scope = (start, end, dataset, job_id)
+
+def _changes_response(change: tuple, scope) -> bool:
+    if scope is None:
+        return True
+    job_id, dataset, first, last = change
+    start, end, scope_dataset, scope_job_id = scope
+    if scope_job_id is not None:
+        return scope_job_id == job_id
+    return (scope_dataset is None or scope_dataset == dataset) and start <= last and first <= end
+
+def cached_response(view):
+    """Serve a view's (payload, last_modified) from the response cache with ETag, Last-Modified and gzip."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        with _response_cache_lock:
+            entry = _response_cache.get(key)
+            if entry is not None and entry.is_fresh():
+                _response_cache.move_to_end(key)
+            else:
+                entry = None
+        if entry is None:
+            version = _data_version
+            g.cache_scope = None
+            payload, last_modified = view(*args, **kwargs)
+            entry = CachedResponse(payload, last_modified, g.cache_scope)
+            with _response_cache_lock:
+                # Jobs that completed while the view ran may be missing from it
+                missed = [change for changed, change in _recent_changes if changed > version]
+                complete = not _recent_changes or _recent_changes[0][0] <= version + 1
+                if complete and not any(_changes_response(change, entry.scope) for change in missed):
+                    _response_cache[key] = entry
+                    while len(_response_cache) > API_CACHE_MAX_ENTRIES:
+                        _response_cache.popitem(last=False)
+        return entry.to_response()
+    return wrapper
+
+def _listening() -> bool:
+    # Transitions made on other instances only reach this process through a subscription
+    return qualis._status_listener_future is not None or qualis._event_listener_future is not None
+
+def _utc_day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()
+
+def _on_job_status(job_id: str, status_data: dict):
+    global _data_version
+    _events.publish(job_id, status_data)
+    if status_data.get('status') not in qualis.TERMINAL_JOB_STATUSES:
+        return
+    # The job was listed at its start, at each transition and at its report, all within [first, last]
+    data_ref = status_data.get('gcs_uri') or status_data.get('data_ref')
+    last = status_data.get('timestamp') or time.time()
+    first = min(status_data.get('started_at') or last, last)
+    change = (job_id, qualis._report_dataset_name(data_ref) if data_ref else None, first, last)
+    with _response_cache_lock:
+        _data_version += 1
+        _recent_changes.append((_data_version, change))
+        for key in [key for key, entry in _response_cache.items() if _changes_response(change, entry.scope)]:
+            del _response_cache[key]
+    _live_runs_cache.clear()
+    # The completed job's report was just indexed in a manifest that may already be cached; the next
+    # read lists the day again but only downloads the new entries
+    with _manifest_cache_lock:
+        for day in {_utc_day(first), _utc_day(last)}:
+            if day in _manifest_cache:
+                _manifest_cache[day] = (_manifest_cache[day][0], None)
+
+# Report manifests
+class RunIndex:
+    """Runs sorted newest first by (-timestamp, job_id), overall and per dataset, for bisecting by time range and cursor."""
+
+    def __init__(self, items: list):
+        items.sort(key=lambda item: item[0])  # (sort key, dataset, run)
+        self.entries = [run for _, _, run in items]
+        self.keys = [key for key, _, _ in items]
+        self.by_dataset = {}
+        self.dataset_keys = {}
+        for key, dataset, run in items:
+            self.by_dataset.setdefault(dataset, []).append(run)
+            self.dataset_keys.setdefault(dataset, []).append(key)
+
+    def slice(self, dataset, start: float, end: float, newest_key=None):
+        """Return (entries, keys, first, stop) bounding the entries created in [start, end] after `newest_key`."""
+        entries = self.entries if dataset is None else self.by_dataset.get(dataset, [])
+        keys = self.keys if dataset is None else self.dataset_keys.get(dataset, [])
+        first = bisect_left(keys, (-end, ''))
+        if newest_key is not None:
+            first = max(first, bisect_right(keys, newest_key))
+        stop = bisect_right(keys, (-start, '\U0010ffff'))
+        return entries, keys, first, stop
+
+class ManifestDay(RunIndex):
+    """One day's report manifest, sorted newest first and indexed by job and dataset."""
+
+    def __init__(self, sources: dict):
+        self.sources = sources  # manifest entry URI -> entry, so a reload only downloads new entries
+        entries = [
+            entry for entry in sources.values()
+            if isinstance(entry, dict) and entry.get('jobId') and entry.get('createdAt') is not None
+        ]
+        super().__init__([(_manifest_sort_key(entry), entry.get('dataset'), entry) for entry in entries])
+        self.by_job = {entry['jobId']: entry for entry in entries}
+
+def _manifest_sort_key(entry: dict):
+    # Ascending order of (-createdAt, jobId) is newest first with a stable tie-break for cursors
+    return (-float(entry['createdAt']), entry['jobId'])
+
+_manifest_cache = OrderedDict()  # 'YYYY-MM-DD' -> ManifestDay
+_manifest_cache_lock = threading.Lock()
+
+def _open_days() -> set:
+    # Reports are filed under their UTC creation day, so only today's (and, around midnight, yesterday's) manifest still grows
+    today = datetime.now(timezone.utc).date()
+    return {today.isoformat(), (today - timedelta(days=1)).isoformat()}
+
+def _load_manifest_day(day: str) -> ManifestDay:
+    with _manifest_cache_lock:
+        cached = _manifest_cache.get(day)
+        if cached is not None:
+            manifest, loaded = cached
+            if loaded is not None and (day not in _open_days() or time.monotonic() - loaded < API_CACHE_TTL_SECONDS or _listening()):
+                _manifest_cache.move_to_end(day)
+                return manifest
+    manifest = ManifestDay(qualis._read_report_manifest(day, known=cached[0].sources if cached else None))
+    with _manifest_cache_lock:
+        _manifest_cache[day] = (manifest, time.monotonic())
+        _manifest_cache.move_to_end(day)
+        while len(_manifest_cache) > API_MANIFEST_CACHE_DAYS:
+            _manifest_cache.popitem(last=False)
+    return manifest
+
+def _read_report_results(report_uri: str) -> list:
+    data = qualis._read_uri_bytes(report_uri)
+    if data is None:
+        return []
+    if report_uri.endswith('.parquet'):
+        import io
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(data))
+        results = []
+        for row in table.to_pylist():
+            result = {'check': json.loads(row['check']), 'outcome': row['outcome'], 'details': row['details']}
+            # Reports written before per-check metrics have no metrics column
+            if row.get('metrics'):
+                result['metrics'] = json.loads(row['metrics'])
+            results.append(result)
+        return results
+    # GCS may already have undone the gzip Content-Encoding on download
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    results = []
+    for line in data.splitlines():
+        record = json.loads(line)
+        if record.pop('record', None) == 'result':
+            results.append(record)
+    return results
+
+# Runs
+def _iso(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+def _format_duration(seconds) -> str:
+    if seconds is None:
+        return None
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f'{minutes}m {seconds}s' if minutes else f'{seconds}s'
+
+def _run_status(status: str) -> str:
+    if status == 'MANAGER_AGENT_COMPLETED':
+        return RunStatus.Success
+    if qualis._is_failed_status(status):
+        return RunStatus.Failed
+    return RunStatus.Running
+
+def _run_from_manifest(entry: dict, live: dict = None) -> dict:
+    run = {
+        'id': entry['jobId'],
+        'agentName': 'Data Quality Agent',
+        'timestamp': _iso(entry['createdAt']),
+        'status': RunStatus.Success,
+        'duration': None,
+        'dataObjectId': entry.get('dataset'),
+        'dataObjectVersion': None,
+        'dataRef': entry.get('dataRef'),
+        'summary': entry.get('summary'),
+        'reportUri': entry.get('reportUri'),
+        'jobStatus': None,
+    }
+    if live is not None:
+        run['status'] = live['status']
+        run['duration'] = live['duration']
+        run['jobStatus'] = live['jobStatus']
+    return run
+
+def _run_from_status(job_id: str, status_data: dict) -> dict:
+    data_ref = status_data.get('gcs_uri') or status_data.get('data_ref')
+    started_at = status_data.get('started_at')
+    return {
+        'id': job_id,
+        'agentName': 'Data Quality Agent',
+        'timestamp': _iso(status_data['timestamp']),
+        'status': _run_status(status_data.get('status')),
+        'duration': _format_duration(status_data['timestamp'] - started_at) if started_at else None,
+        'dataObjectId': qualis._report_dataset_name(data_ref) if data_ref else None,
+        'dataObjectVersion': None,
+        'dataRef': data_ref,
+        'summary': None,
+        'reportUri': None,
+        'jobStatus': status_data.get('status'),
+        'updatedAt': status_data['timestamp'],
+    }
+
+class LiveRuns(RunIndex):
+    """Every job in the status store by ID, with the ones that have no report yet indexed by last update."""
+
+    def __init__(self, runs: dict):
+        self.runs = runs
+        super().__init__([
+            ((-run['updatedAt'], job_id), run['dataObjectId'], run) for job_id, run in runs.items()
+            if _reported_entry(job_id, run['updatedAt']) is None
+        ])
+
+# version -> (LiveRuns, monotonic time built); rebuilt once per data version
+_live_runs_cache = {}
+
+def _live_runs() -> LiveRuns:
+    version = _data_version
+    cached = _live_runs_cache.get(version)
+    if cached is not None and (_listening() or time.monotonic() - cached[1] < API_CACHE_TTL_SECONDS):
+        return cached[0]
+    runs = {}
+    store = qualis._get_job_status_store()
+    before = None
+    while True:
+        page = store.list_jobs(before=before, limit=1000)
+        for job_id, status_data in page:
+            # Column shards of a pubsub-mode job and files of a landing batch are reported as part of that job
+            if '.shard-' not in job_id and not status_data.get('batch_job_id'):
+                runs[job_id] = _run_from_status(job_id, status_data)
+        if len(page) < 1000:
+            break
+        before = (page[-1][1]['timestamp'], page[-1][0])
+    live = LiveRuns(runs)
+    _live_runs_cache.clear()
+    _live_runs_cache[version] = (live, time.monotonic())
+    return live
+
+def _reported_entry(job_id: str, timestamp: float):
+    # A job's report is filed on the day it was written, at or shortly before its final status
+    day = datetime.fromtimestamp(timestamp, timezone.utc).date()
+    for offset in range(2):
+        entry = _load_manifest_day((day - timedelta(days=offset)).isoformat()).by_job.get(job_id)
+        if entry is not None:
+            return entry
+    return None
+
+def _parse_time(value: str, default: float) -> float:
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        abort(400, description=f'Invalid timestamp: {value}')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _time_range():
+    now = time.time()
+    end = _parse_time(request.args.get('to'), now)
+    start = _parse_time(request.args.get('from'), end - API_DEFAULT_RANGE_DAYS * 86_400)
+    if start > end:
+        abort(400, description='from must not be after to')
+    if end - start > API_MAX_RANGE_DAYS * 86_400:
+        abort(400, description=f'Time range is limited to {API_MAX_RANGE_DAYS} days')
+    return start, end
+
+def _open_end(end: float) -> float:
+    # Without ?to= a cached response stands for "up to now", so jobs completing later also change it
+    return end if request.args.get('to') else float('inf')
+
+def _page_size() -> int:
+    try:
+        limit = int(request.args.get('limit', API_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400, description='limit must be an integer')
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+def _encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str):
+    try:
+        sort_value, job_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (float(sort_value), str(job_id))
+    except (ValueError, TypeError):
+        abort(400, description='Invalid cursor')
+
+def _days_between(start: float, end: float) -> list:
+    first = datetime.fromtimestamp(start, timezone.utc).date()
+    day = datetime.fromtimestamp(end, timezone.utc).date()
+    days = []
+    while day >= first:
+        days.append(day.isoformat())
+        day -= timedelta(days=1)
+    return days
+
+def _list_runs(start: float, end: float, dataset=None, status=None, cursor=None, limit=API_DEFAULT_PAGE_SIZE):
+    """Return one page of runs in [start, end], newest first, and the cursor of the next page.
+
+    Reported runs come from the per-day manifests and running or failed jobs without a report
+    from the status store's index, which is built once per data version. Both are read with a
+    bisect, so a page costs O(days + limit) however many runs the range holds. Reported runs
+    are overlaid with the live status and duration of their job.
+    """
+    newest_key = cursor or (-end, '')
+    live = _live_runs()
+
+    def unreported():
+        entries, keys, first, stop = live.slice(dataset, start, end, newest_key)
+        for index in range(first, stop):
+            yield keys[index], entries[index]
+
+    def reported():
+        for day in _days_between(start, end):
+            entries, keys, first, stop = _load_manifest_day(day).slice(dataset, start, end, newest_key)
+            for index in range(first, stop):
+                yield keys[index], _run_from_manifest(entries[index], live.runs.get(entries[index]['jobId']))
+
+    runs = []
+    last_key = None
+    for key, run in heapq.merge(reported(), unreported(), key=lambda item: item[0]):
+        if status and run['status'] != status:
+            continue
+        if len(runs) == limit:
+            return runs, _encode_cursor(last_key)
+        run = {name: value for name, value in run.items() if name != 'updatedAt'}
+        runs.append(run)
+        last_key = key
+    return runs, None
+
+def _cache_runs_page(start: float, end: float, dataset, cursor, next_cursor):
+    # A page only holds runs between its cursor and the cursor of the next page
+    newest = -cursor[0] if cursor else _open_end(end)
+    oldest = -_decode_cursor(next_cursor)[0] if next_cursor else start
+    _cache_scope(oldest, newest, dataset)
+
+def _last_modified(runs: list):
+    return max((datetime.fromisoformat(run['timestamp'].replace('Z', '+00:00')).timestamp() for run in runs), default=None)
+
+@app.route('/api/v1/runs', methods=['GET'])
+@cached_response
+def list_runs():
+    start, end = _time_range()
+    cursor = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    runs, next_cursor = _list_runs(
+        start, end,
+        dataset=request.args.get('dataObject'),
+        status=request.args.get('status'),
+        cursor=cursor,
+        limit=_page_size(),
+    )
+    _cache_runs_page(start, end, request.args.get('dataObject'), cursor, next_cursor)
+    return {'data': runs, 'nextCursor': next_cursor}, _last_modified(runs)
+
+@app.route('/api/v1/data-objects/<dataset>/runs', methods=['GET'])
+@cached_response
+def list_data_object_runs(dataset):
+    start, end = _time_range()
+    cursor = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    runs, next_cursor = _list_runs(start, end, dataset=dataset, status=request.args.get('status'), cursor=cursor, limit=_page_size())
+    _cache_runs_page(start, end, dataset, cursor, next_cursor)
+    return {'data': runs, 'nextCursor': next_cursor}, _last_modified(runs)
+
+@app.route('/api/v1/runs/<job_id>', methods=['GET'])
+@cached_response
+def get_run(job_id):
+    _cache_scope(job_id=job_id)
+    status_data = qualis._get_job_status(job_id)
+    entry = None
+    if status_data is not None:
+        entry = _reported_entry(job_id, status_data['timestamp'])
+    if entry is None:
+        start, end = _time_range()
+        for day in _days_between(start, end):
+            entry = _load_manifest_day(day).by_job.get(job_id)
+            if entry is not None:
+                break
+    if entry is None and status_data is None:
+        abort(404, description=f'Unknown run: {job_id}')
+    live = _run_from_status(job_id, status_data) if status_data is not None else None
+    if entry is not None:
+        run = _run_from_manifest(entry, live)
+        run['failureSamplesUri'] = entry.get('failureSamplesUri')
+        run['checks'] = _read_report_results(entry['reportUri'])
+        last_modified = max(entry['createdAt'], status_data['timestamp'] if status_data else 0)
+    else:
+        run = {name: value for name, value in live.items() if name != 'updatedAt'}
+        run['checks'] = []
+        last_modified = status_data['timestamp']
+    if status_data is not None:
+        run['jobStatus'] = status_data.get('status')
+        run['error'] = status_data.get('error')
+    return {'data': run}, last_modified
+
+@app.route('/api/v1/data-objects', methods=['GET'])
+@cached_response
+def list_data_objects():
+    """Datasets with reports in the time range, with their run count and latest summary, paged by name."""
+    start, end = _time_range()
+    # Quality metrics cover the latest buckets, so reports after the range change them too
+    _cache_scope(start, float('inf'))
+    latest = {}
+    counts = {}
+    for day in _days_between(start, end):
+        manifest = _load_manifest_day(day)
+        for name in manifest.by_dataset:
+            entries, _, first, stop = manifest.slice(name, start, end)
+            if first >= stop:
+                continue
+            counts[name] = counts.get(name, 0) + stop - first
+            if name not in latest or entries[first]['createdAt'] > latest[name]['createdAt']:
+                latest[name] = entries[first]
+    names = sorted(latest)
+    after = request.args.get('cursor')
+    if after:
+        names = names[bisect_right(names, after):]
+    limit = _page_size()
+    page = names[:limit]
+    data_objects = [
+        {
+            'id': name,
+            'name': name,
+            'runCount': counts[name],
+            'lastRun': _iso(latest[name]['createdAt']),
+            'lastRunId': latest[name]['jobId'],
+            'dataRef': latest[name].get('dataRef'),
+            'summary': latest[name].get('summary'),
+            'qualityMetrics': _quality_metrics(name),
         }
+        for name in page
+    ]
+    next_cursor = page[-1] if len(names) > limit else None
+    return {'data': data_objects, 'nextCursor': next_cursor}, max((latest[name]['createdAt'] for name in page), default=None)
+
+@app.route('/api/v1/data-objects/<dataset>/metrics', methods=['GET'])
+@cached_response
+def get_data_object_metrics(dataset):
+    """Hourly or daily rollups of a dataset, or of one column and/or check type with ?column= and ?checkType=."""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in qualis.QualityMetricsStore.BUCKET_SECONDS:
+        abort(400, description='granularity must be hour or day')
+    store = qualis._get_quality_metrics_store()
+    if store is None:
+        abort(404, description='Quality metrics are not recorded (QUALITY_METRICS_DB_PATH is empty)')
+    start, end = _time_range()
+    _cache_scope(start, float('inf'), dataset)
+    series = store.series(
+        dataset, granularity, start - start % qualis.QualityMetricsStore.BUCKET_SECONDS[granularity], end,
+        column=request.args.get('column', ''), check_type=request.args.get('checkType', ''),
+    )
+    for point in series:
+        point['bucket'] = _iso(point['bucket'])
+        point['lastRecordedAt'] = _iso(point['lastRecordedAt'])
+    return {'data': {'qualityMetrics': _quality_metrics(dataset, granularity), 'series': series}}, None
+
+# Live events
+# SSE event names of the job events that are not status transitions
+EVENT_KINDS = {'QUALITY_CHECK_PROGRESS': 'progress', 'SCHEMA_DRIFT_DETECTED': 'drift'}
+
+class EventBroadcaster:
+    """Fans job events out to every open event stream.
+
+    Each event is serialized once into a bounded history. Subscribers only remember the id of
+    the last event they sent and wait on one shared condition, so publishing costs the same
+    however many clients are connected.
+    """
+
+    def __init__(self, history: int):
+        self._events = deque(maxlen=history)  # (event id, job id, dataset, encoded frame)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self.subscribers = 0
+
+    def publish(self, job_id: str, status_data: dict):
+        payload = _event_payload(job_id, status_data)
+        kind = EVENT_KINDS.get(status_data.get('status'), 'status')
+        data = json.dumps(payload, separators=(',', ':'))
+        with self._condition:
+            self._last_id += 1
+            frame = f'id: {self._last_id}\nevent: {kind}\ndata: {data}\n\n'.encode('utf-8')
+            self._events.append((self._last_id, job_id, payload['dataObjectId'], frame))
+            self._condition.notify_all()
+
+    def _events_after(self, last_id: int) -> list:
+        if not self._events or self._last_id <= last_id:
+            return []
+        return list(islice(self._events, max(0, last_id + 1 - self._events[0][0]), None))
+
+    def stream(self, last_id=None, job_id=None, dataset=None):
+        """Yield SSE frames for events after `last_id` (or from now) that match the filters, until the client goes away."""
+        with self._condition:
+            self.subscribers += 1
+            # Ids restart with the process, so a client resuming from a later id starts from now
+            last_id = self._last_id if last_id is None or last_id > self._last_id else last_id
+        try:
+            yield b'retry: 3000\n\n'
+            last_write = time.monotonic()
+            while True:
+                with self._condition:
+                    if self._last_id <= last_id:
+                        self._condition.wait(API_EVENT_HEARTBEAT_SECONDS)
+                    events = self._events_after(last_id)
+                if events:
+                    last_id = events[-1][0]
+                    frames = b''.join(
+                        frame for _, event_job, event_dataset, frame in events
+                        if (job_id is None or event_job == job_id or event_job.startswith(f'{job_id}.shard-'))
+                        and (dataset is None or event_dataset == dataset)
+                    )
+                    if frames:
+                        yield frames
+                        last_write = time.monotonic()
+                        continue
+                if time.monotonic() - last_write >= API_EVENT_HEARTBEAT_SECONDS:
+                    yield b': keep-alive\n\n'
+                    last_write = time.monotonic()
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+def _event_payload(job_id: str, status_data: dict) -> dict:
+    # Status details can hold whole reports and check definitions; streams only carry what the dashboard shows
+    data_ref = status_data.get('gcs_uri') or status_data.get('data_ref')
+    quality_results = status_data.get('quality_results') or {}
+    payload = {
+        'jobId': job_id,
+        'status': status_data.get('status'),
+        'runStatus': _run_status(status_data.get('status')),
+        'timestamp': _iso(status_data.get('timestamp') or time.time()),
+        'dataObjectId': qualis._report_dataset_name(data_ref) if data_ref else None,
+        'dataRef': data_ref,
+    }
+    if 'rows' in status_data:
+        payload['rows'] = status_data['rows']
+    if quality_results.get('summary'):
+        payload['summary'] = quality_results['summary']
+    results = status_data.get('results', quality_results.get('results'))
+    if results is not None:
+        payload['results'] = results
+    # SCHEMA_DRIFT_DETECTED events carry the drift themselves, DATASET_ANALYZED under schema_drift
+    drift = status_data if 'retyped' in status_data else status_data.get('schema_drift')
+    if drift:
+        payload['schemaDrift'] = {key: drift[key] for key in ('added', 'removed', 'retyped')}
+    if status_data.get('error'):
+        payload['error'] = status_data['error']
+    return payload
+
+_events = EventBroadcaster(API_EVENT_HISTORY)
+
+@app.route('/api/v1/events', methods=['GET'])
+def stream_events():
+    """Server-sent events for job status transitions ('status'), partial check results ('progress') and schema drift ('drift').
+
+    Filter with ?jobId= (a job and its column shards) or ?dataObject=. Reconnecting EventSource
+    clients resume after their Last-Event-ID while it is still in the history.
+    """
+    if _events.subscribers >= API_EVENT_MAX_SUBSCRIBERS:
+        abort(503, description='Too many open event streams')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        abort(400, description='Invalid Last-Event-ID')
+    stream = _events.stream(last_id, job_id=request.args.get('jobId'), dataset=request.args.get('dataObject'))
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Keep reverse proxies from buffering the stream
     })
 
+qualis._add_status_observer(_on_job_status)
+for start_listener in (qualis._start_job_status_listener, qualis._start_job_event_listener):
+    try:
+        start_listener()
+    except Exception as e:
+        app.logger.warning(f'Job subscription unavailable, cached responses expire after {API_CACHE_TTL_SECONDS}s: {e}')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -14,6 +14,10 @@ const formatCheck = (check: CheckDefinition): string => {
             return `Range (${check.min} - ${check.max})`;
         case 'length':
             return `Max Length (${check.max_length})`;
+        case 'unique':
+            return check.mode === 'approximate' ? 'Unique (approximate)' : 'Unique';
+        case 'cardinality':
+            return `Distinct Values (${check.min ?? 0} - ${check.max ?? '∞'})${check.mode === 'approximate' ? ' (approximate)' : ''}`;
         default:
             return check.type.replace(/_/g, ' ');
     }
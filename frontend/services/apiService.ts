@@ -1,7 +1,8 @@
 
-import type { DQReport } from '../types';
+import type { DQReport, JobEvent } from '../types';
 
 const API_URL = './output.json';
+const EVENTS_URL = '/api/v1/events';
 
 /**
  * API SERVICE
@@ -29,4 +30,29 @@ export const fetchDashboardData = async (): Promise<DQReport> => {
     // Re-throw the error so it can be caught by the calling component
     throw error;
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Subscribes to live job status transitions and partial check results pushed by the backend.
+ * The browser reconnects on its own and resumes after the last event it received.
+ *
+ * @returns A function that closes the stream.
+ */
+export const subscribeToJobEvents = (
+  onEvent: (event: JobEvent) => void,
+  filters: { jobId?: string; dataObject?: string } = {},
+): (() => void) => {
+  const params = new URLSearchParams();
+  if (filters.jobId) params.set('jobId', filters.jobId);
+  if (filters.dataObject) params.set('dataObject', filters.dataObject);
+  const query = params.toString();
+  const source = new EventSource(query ? `${EVENTS_URL}?${query}` : EVENTS_URL);
+
+  const handle = (message: MessageEvent) => onEvent(JSON.parse(message.data) as JobEvent);
+  source.addEventListener('status', handle);
+  source.addEventListener('progress', handle);
+  source.addEventListener('drift', handle);
+  source.onerror = () => console.warn('Job event stream interrupted, reconnecting...');
+
+  return () => source.close();
+};
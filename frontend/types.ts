@@ -11,12 +11,22 @@ export type CheckDefinition = {
   min?: number;
   max?: number;
   max_length?: number;
+  mode?: 'exact' | 'approximate';
+  error_rate?: number;
+  capacity?: number;
+};
+
+export type CheckMetrics = {
+  rows: number;
+  failed: number;
+  distinct?: number;
 };
 
 export type CheckResult = {
   check: CheckDefinition;
   outcome: CheckOutcome;
   details?: string;
+  metrics?: CheckMetrics;
 };
 
 export type ReportSummary = {
@@ -32,6 +42,29 @@ export type DQReport = {
   results: CheckResult[];
 };
 
+// Pushed by GET /api/v1/events: 'status' for job status transitions, 'progress' for partial check results,
+// 'drift' when a landing's schema drifted from its dataset's registered schema.
+export type JobEvent = {
+  jobId: string;
+  status: string;
+  runStatus: RunStatus;
+  timestamp: string;
+  dataObjectId: string | null;
+  dataRef: string | null;
+  rows?: number;
+  summary?: ReportSummary;
+  results?: CheckResult[];
+  schemaDrift?: SchemaDrift;
+  error?: string;
+};
+
+// Columns that changed against a dataset's registered schema; retyped maps a column to [old kind, new kind].
+export type SchemaDrift = {
+  added: string[];
+  removed: string[];
+  retyped: Record<string, [string, string]>;
+};
+
 // Fix: Add missing type definitions that were causing import errors.
 export enum AgentStatus {
   Active = 'Active',
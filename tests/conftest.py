@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AgentQualis  # noqa: E402
+
+
+@pytest.fixture
+def job_store(monkeypatch):
+    """A fresh in-memory job status store installed as the process-wide store."""
+    store = AgentQualis.InMemoryJobStatusStore()
+    monkeypatch.setattr(AgentQualis, "_job_status_store", store)
+    return store
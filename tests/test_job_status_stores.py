@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+import AgentQualis as q
+
+
+def _status(status, timestamp=None, **details):
+    status_data = q._build_status_data(status, details)
+    if timestamp is not None:
+        status_data["timestamp"] = timestamp
+    return status_data
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    """Build a store of each backend, with any constructor options the test needs."""
+    def make(**options):
+        if request.param == "memory":
+            return q.InMemoryJobStatusStore(**options)
+        if request.param == "sqlite":
+            # Writes stay buffered unless a test flushes them, so reads and CAS go through the buffer
+            return q.SQLiteJobStatusStore(str(tmp_path / "jobs.db"), flush_interval=60, **options)
+        fakeredis = pytest.importorskip("fakeredis")
+        return q.RedisJobStatusStore(client=fakeredis.FakeRedis(), **options)
+
+    return make
+
+
+def test_set_and_get(make_store):
+    store = make_store()
+    assert store.get("job-1") is None
+    store.set("job-1", _status("QUEUED", gcs_uri="gs://b/f.csv"))
+    store.set("job-1", _status("RUNNING"))
+    assert store.get("job-1")["status"] == "RUNNING"
+
+
+def test_compare_and_set_claims_once(make_store):
+    store = make_store()
+    assert store.compare_and_set("job-1", None, _status("QUEUED"))
+    assert not store.compare_and_set("job-1", None, _status("QUEUED"))
+    assert not store.compare_and_set("job-1", "RUNNING", _status("COMPLETED"))
+    assert store.compare_and_set("job-1", "QUEUED", _status("RUNNING"))
+    assert store.get("job-1")["status"] == "RUNNING"
+
+
+def test_compare_and_set_sees_buffered_writes(make_store):
+    store = make_store()
+    store.set("job-1", _status("QUEUED"))
+    assert not store.compare_and_set("job-1", None, _status("QUEUED"))
+    assert store.compare_and_set("job-1", "QUEUED", _status("RUNNING"))
+    store.set("job-1", _status("COMPLETED"))
+    store.flush()
+    assert store.get("job-1")["status"] == "COMPLETED"
+
+
+def test_expired_job_can_be_claimed_again(make_store):
+    store = make_store(ttl_seconds=1)
+    assert store.compare_and_set("job-1", None, _status("QUEUED"))
+    time.sleep(1.2)
+    assert store.get("job-1") is None
+    assert store.compare_and_set("job-1", None, _status("QUEUED"))
+    assert store.get("job-1")["status"] == "QUEUED"
+
+
+def test_expired_jobs_are_not_listed(make_store):
+    store = make_store(ttl_seconds=1)
+    store.set("old", _status("COMPLETED"))
+    time.sleep(1.2)
+    store.set("new", _status("COMPLETED"))
+    assert [job_id for job_id, _ in store.list_jobs()] == ["new"]
+
+
+def test_list_jobs_pages_through_timestamp_ties(make_store):
+    store = make_store()
+    now = time.time()
+    expected = []
+    for group in range(5):
+        for member in range(5):
+            job_id = f"job-{group}-{member}"
+            store.set(job_id, _status("COMPLETED", timestamp=now - group))
+            expected.append((now - group, job_id))
+    expected.sort(reverse=True)
+
+    listed, before = [], None
+    while True:
+        page = store.list_jobs(before=before, limit=7)
+        if not page:
+            break
+        listed.extend((status_data["timestamp"], job_id) for job_id, status_data in page)
+        before = listed[-1]
+    assert listed == expected
+
+
+def test_sqlite_flushes_full_batches(tmp_path):
+    store = q.SQLiteJobStatusStore(str(tmp_path / "jobs.db"), batch_size=3, flush_interval=60)
+    for index in range(2):
+        store.set(f"job-{index}", _status("QUEUED"))
+    assert len(store._pending) == 2
+    assert store.get("job-0")["status"] == "QUEUED"  # Reads see buffered writes
+    store.set("job-2", _status("QUEUED"))
+    assert not store._pending
+    reopened = q.SQLiteJobStatusStore(str(tmp_path / "jobs.db"))
+    assert reopened.get("job-2")["status"] == "QUEUED"
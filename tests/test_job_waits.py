@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+import time
+
+import AgentQualis as q
+
+
+class FakeMessage:
+    """Stand-in for a Pub/Sub message delivered on JOB_STATUS_SUBSCRIPTION."""
+
+    def __init__(self, payload):
+        self.data = json.dumps(payload).encode("utf-8")
+        self.acked = False
+
+    def ack(self):
+        self.acked = True
+
+
+def _later(seconds, fn, *args):
+    timer = threading.Timer(seconds, fn, args)
+    timer.start()
+    return timer
+
+
+def test_waiter_resolves_from_status_update(job_store):
+    _later(0.1, q._update_job_status, "job-1", "REPORTING_COMPLETED", {"report_url": "gs://r"})
+    started = time.monotonic()
+    status = q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10)
+    assert status["status"] == "REPORTING_COMPLETED"
+    assert status["report_url"] == "gs://r"
+    assert time.monotonic() - started < 1
+    assert "job-1" not in q._job_waiters
+
+
+def test_waiter_resolves_on_failed_status(job_store):
+    _later(0.1, q._update_job_status, "job-1", "QUALITY_CHECKS_FAILED", {"error": "boom"})
+    status = q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10)
+    assert status["status"] == "QUALITY_CHECKS_FAILED"
+
+
+def test_waiter_ignores_other_statuses(job_store):
+    _later(0.05, q._update_job_status, "job-1", "QUALITY_CHECK_RUNNING")
+    _later(0.2, q._update_job_status, "job-1", "REPORTING_COMPLETED")
+    status = q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10)
+    assert status["status"] == "REPORTING_COMPLETED"
+
+
+def test_wait_times_out_and_unregisters(job_store):
+    started = time.monotonic()
+    assert q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=0.3) is None
+    assert 0.3 <= time.monotonic() - started < 2
+    assert "job-1" not in q._job_waiters
+
+
+def test_status_reached_before_registering_resolves_immediately(job_store):
+    job_store.set("job-1", q._build_status_data("REPORTING_COMPLETED"))
+    future = q._register_job_waiter("job-1", {"REPORTING_COMPLETED"})
+    assert future.done()
+    assert future.result()["status"] == "REPORTING_COMPLETED"
+    assert "job-1" not in q._job_waiters
+
+
+def test_wait_wakes_on_store_reread(job_store, monkeypatch):
+    # Another instance writes the store directly, so no local notification reaches the waiter
+    monkeypatch.setattr(q, "JOB_WAIT_RECHECK_SECONDS", 0.2)
+    _later(0.3, job_store.set, "job-1", q._build_status_data("REPORTING_COMPLETED"))
+    started = time.monotonic()
+    status = q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10)
+    assert status["status"] == "REPORTING_COMPLETED"
+    assert time.monotonic() - started < 2
+
+
+def test_status_subscription_message_wakes_waiter(job_store):
+    message = FakeMessage({"job_id": "job-1", "status": "REPORTING_COMPLETED", "report_url": "gs://r"})
+    _later(0.1, q._handle_job_status_message, message)
+    status = q._wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10)
+    assert status["report_url"] == "gs://r"
+    assert message.acked
+    assert job_store.get("job-1")["status"] == "REPORTING_COMPLETED"
+
+
+def test_malformed_status_message_is_acked_and_dropped(job_store):
+    message = FakeMessage({"status": "REPORTING_COMPLETED"})
+    q._handle_job_status_message(message)
+    assert message.acked
+
+
+def test_async_waits_resolve_concurrently(job_store):
+    async def wait_all():
+        return await asyncio.gather(*(
+            q._async_wait_for_job_status(f"job-{index}", {"REPORTING_COMPLETED"}, timeout=10) for index in range(3)
+        ))
+
+    for index in range(3):
+        _later(0.1, q._update_job_status, f"job-{index}", "REPORTING_COMPLETED")
+    statuses = asyncio.run(wait_all())
+    assert [status["status"] for status in statuses] == ["REPORTING_COMPLETED"] * 3
+
+
+def test_async_wait_times_out(job_store):
+    assert asyncio.run(q._async_wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=0.3)) is None
+    assert "job-1" not in q._job_waiters
+
+
+def test_async_wait_wakes_on_store_reread(job_store, monkeypatch):
+    monkeypatch.setattr(q, "JOB_WAIT_RECHECK_SECONDS", 0.2)
+    _later(0.3, job_store.set, "job-1", q._build_status_data("REPORTING_COMPLETED"))
+    status = asyncio.run(q._async_wait_for_job_status("job-1", {"REPORTING_COMPLETED"}, timeout=10))
+    assert status["status"] == "REPORTING_COMPLETED"
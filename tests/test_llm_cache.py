@@ -0,0 +1,58 @@
+import pytest
+
+import AgentQualis as q
+
+pytest.importorskip("langchain_core")
+from langchain_core.language_models import FakeListChatModel  # noqa: E402
+from langchain_core.prompt_values import StringPromptValue  # noqa: E402
+
+PROMPT = "Check the file {gcs_uri} for job {job_id}. It has 1234567 rows and a score of 0.25."
+
+
+@pytest.fixture(autouse=True)
+def llm_cache(monkeypatch):
+    cache = q.AnalysisCache(16, None, 1024 * 1024)
+    monkeypatch.setattr(q, "_llm_response_cache", cache)
+    monkeypatch.setattr(q, "LLM_CACHE_ENABLED", True)
+    return cache
+
+
+def _run_job(llm, job_id, gcs_uri, fail_tool=False):
+    """Send one prompt through the cached LLM as a job would, then commit its responses."""
+    job = {"job_id": job_id, "gcs_uri": gcs_uri, "schema_fingerprint": "schema-a"}
+    token = q._current_job.set(job)
+    try:
+        message = q._cached_llm(llm, ["\nObservation"]).invoke(StringPromptValue(text=PROMPT.format(job_id=job_id, gcs_uri=gcs_uri)))
+        if fail_tool:
+            q._fail_tool_call("Error: the tool failed")
+        q._commit_llm_responses()
+    finally:
+        q._current_job.reset(token)
+    return message.content
+
+
+def test_short_job_id_is_not_replaced():
+    job = {"job_id": "123", "gcs_uri": "gs://bucket/orders.csv"}
+    text = "Job 123 has 1234567 rows in gs://bucket/orders.csv."
+    assert q._replace_job_values(text, job) == "Job 123 has 1234567 rows in <<gcs_uri>>."
+
+
+def test_job_id_is_not_replaced_inside_numbers_or_paths():
+    job = {"job_id": "123456", "gcs_uri": "gs://bucket/orders.csv"}
+    text = "Job 123456. Rows: 91234567, 123456.5, gs://bucket/orders.csv.bak, gs://bucket/123456/x.csv"
+    replaced = q._replace_job_values(text, job)
+    assert replaced == "Job <<job_id>>. Rows: 91234567, 123456.5, gs://bucket/orders.csv.bak, gs://bucket/123456/x.csv"
+    assert q._replace_job_values(replaced, job, restore=True) == text
+
+
+def test_same_schema_replays_response_for_another_job():
+    llm = FakeListChatModel(responses=["Action: run checks for job job-aaaa01", "second call"])
+    assert _run_job(llm, "job-aaaa01", "gs://landing/a.csv") == "Action: run checks for job job-aaaa01"
+    # A hit restores the second job's own ID; a miss would return the model's next response
+    assert _run_job(llm, "job-bbbb02", "gs://landing/b.csv") == "Action: run checks for job job-bbbb02"
+
+
+def test_failed_tool_call_is_not_cached():
+    llm = FakeListChatModel(responses=["first call", "second call"])
+    assert _run_job(llm, "job-aaaa01", "gs://landing/a.csv", fail_tool=True) == "first call"
+    assert _run_job(llm, "job-bbbb02", "gs://landing/b.csv") == "second call"
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import AgentQualis as q
+
+CHECKS = [
+    {"type": "not_null", "column": "id", "threshold": 0.0},
+    {"type": "unique", "column": "id"},
+    {"type": "unique", "column": "id", "mode": "approximate"},
+    {"type": "range", "column": "amount", "min": 0, "max": 100},
+    {"type": "not_null", "column": "amount", "threshold": 0.0},
+    {"type": "length", "column": "name", "max_length": 5},
+    {"type": "cardinality", "column": "name", "min": 1, "max": 5},
+    {"type": "cardinality", "column": "code", "min": 1, "max": 1_000, "mode": "approximate"},
+    {"type": "unique", "column": "code", "mode": "approximate"},
+]
+
+
+@pytest.fixture(scope="module")
+def datasets(tmp_path_factory):
+    rng = np.random.default_rng(7)
+    rows = 20_000
+    ids = np.arange(rows).astype("float64")
+    ids[rng.choice(rows, 40, replace=False)] = np.nan
+    ids[rng.choice(rows, 25, replace=False)] = 17  # Duplicates spread across chunks
+    amount = rng.random(rows) * 100
+    amount[rng.choice(rows, 60, replace=False)] *= 10
+    amount[rng.choice(rows, 50, replace=False)] = np.nan
+    df = pd.DataFrame({
+        "id": ids,
+        "amount": amount,
+        "name": rng.choice(["ann", "bob", "caroline", "dan", "eve", "frederick"], rows, p=[0.3, 0.3, 0.005, 0.2, 0.19, 0.005]),
+        "code": rng.integers(0, 5_000, rows).astype(str),
+    })
+    directory = tmp_path_factory.mktemp("parallel")
+    df.to_csv(directory / "data.csv", index=False)
+    df.to_parquet(directory / "data.parquet", row_group_size=4_000)
+    return {fmt: str(directory / f"data.{fmt}") for fmt in ("csv", "parquet")}
+
+
+@pytest.fixture
+def check_workers(monkeypatch):
+    """Run checks with the given number of worker processes on small chunks."""
+    monkeypatch.setattr(q, "PROFILE_CHUNK_ROWS", 3_000)
+    monkeypatch.setattr(q, "CHECK_PARALLEL_MIN_ROWS", 1_000)
+    # Large enough to hold every violation, since smaller samples are drawn at random; spawned
+    # workers read it from the environment
+    monkeypatch.setattr(q, "FAILURE_SAMPLE_ROWS", 1_000)
+    monkeypatch.setenv("FAILURE_SAMPLE_ROWS", "1000")
+
+    def use(workers):
+        monkeypatch.setattr(q, "CHECK_WORKERS", workers)
+        monkeypatch.setattr(q, "_check_process_pool", None)
+
+    yield use
+    if q._check_process_pool is not None:
+        q._check_process_pool.shutdown()
+
+
+def _comparable(report):
+    return {
+        "summary": report["summary"],
+        "results": [(result["check"], result["outcome"], result.get("details"), result.get("metrics")) for result in report["results"]],
+    }
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_parallel_checks_match_sequential(datasets, check_workers, monkeypatch, fmt):
+    check_workers(1)
+    sequential = q._run_quality_checks_for_ref(datasets[fmt], {"checks": CHECKS})
+
+    parallel_chunks = []
+    fold_chunk_parallel = q._fold_chunk_parallel
+
+    def counting(df, checks, run_state, indexes):
+        folded = fold_chunk_parallel(df, checks, run_state, indexes)
+        parallel_chunks.append(folded)
+        return folded
+
+    monkeypatch.setattr(q, "_fold_chunk_parallel", counting)
+    check_workers(2)
+    parallel = q._run_quality_checks_for_ref(datasets[fmt], {"checks": CHECKS})
+
+    assert parallel_chunks and all(parallel_chunks)
+    assert _comparable(parallel) == _comparable(sequential)
+    assert sequential["summary"]["failedChecks"] >= 5
+    assert parallel["failureSamples"] == sequential["failureSamples"]
@@ -0,0 +1,114 @@
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+import pytest
+
+import AgentQualis as q
+from benchmark_pipeline import LocalPublisherClient
+
+CHECKS = [
+    {"type": "not_null", "column": "id", "threshold": 0.0},
+    {"type": "unique", "column": "id"},
+    {"type": "range", "column": "amount", "min": 0, "max": 100},
+    {"type": "not_null", "column": "amount", "threshold": 0.0},
+    {"type": "length", "column": "name", "max_length": 5},
+]
+
+
+class FailingPublisherClient(LocalPublisherClient):
+    """Publisher stand-in whose publishes to `failing_topics` exhaust their retries."""
+
+    def __init__(self, failing_topics, responders=None):
+        super().__init__(responders)
+        self.failing_topics = set(failing_topics)
+
+    def publish(self, topic_path, data, **attributes):
+        if topic_path.rsplit("/", 1)[-1] not in self.failing_topics:
+            return super().publish(topic_path, data, **attributes)
+        self.messages.append((topic_path, data))
+        future = Future()
+        future.set_exception(RuntimeError("deadline exceeded"))
+        return future
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "orders.csv"
+    pd.DataFrame({
+        "id": [1, 2, 2, 4, 5],
+        "amount": [10.0, 250.0, 30.0, None, 50.0],
+        "name": ["ann", "bob", "caroline", "dan", "eve"],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def remote_checks(monkeypatch, job_store):
+    monkeypatch.setattr(q, "QUALITY_CHECK_MODE", "remote")
+    monkeypatch.setattr(q, "JOB_STATUS_SUBSCRIPTION", None)
+    monkeypatch.setattr(q, "JOB_WAIT_TIMEOUT_SECONDS", 30)
+    monkeypatch.setattr(q, "_topic_paths", {})
+
+    def use(publisher):
+        monkeypatch.setattr(q, "_publisher_client", publisher)
+        return publisher
+
+    return use
+
+
+def _quality_checker(message):
+    """Stand-in for the remote quality checker: runs the requested checks and reports back."""
+    quality_results = q._run_quality_checks_for_ref(message["data_ref"], message["check_definitions"], job_id=message["job_id"])
+    q._update_job_status(message["job_id"], "QUALITY_CHECKS_COMPLETED", {"quality_results": quality_results})
+
+
+def test_publish_messages_reports_each_failed_message(remote_checks):
+    publisher = remote_checks(FailingPublisherClient({"bad-topic"}))
+    failures = []
+    futures = q._publish_messages(
+        "bad-topic", [{"job_id": "a"}, {"job_id": "b"}],
+        on_failure=lambda message, error: failures.append((message["job_id"], str(error))),
+    )
+    assert [future.exception() is not None for future in futures] == [True, True]
+    assert failures == [("a", "deadline exceeded"), ("b", "deadline exceeded")]
+    assert len(publisher.messages) == 2
+
+    futures = q._publish_messages("good-topic", [{"job_id": "c"}], on_failure=lambda message, error: failures.append(message))
+    assert futures[0].result() == "3"
+    assert len(failures) == 2
+
+
+def test_sharded_reports_merge_like_a_single_run(remote_checks, monkeypatch, dataset):
+    monkeypatch.setattr(q, "QUALITY_CHECK_SHARD_COLUMNS", 1)
+    publisher = remote_checks(LocalPublisherClient({q.QUALITY_CHECKER_TOPIC: _quality_checker}))
+    merged = q._run_quality_checks_stage(dataset, "job-1", {"checks": CHECKS})
+    assert len(publisher.messages) == 3
+    assert q._get_job_status("job-1")["shard_job_ids"] == ["job-1.shard-0", "job-1.shard-1", "job-1.shard-2"]
+
+    single = q._run_quality_checks_for_ref(dataset, {"checks": CHECKS}, job_id="job-1")
+    assert merged["jobId"] == "job-1" and merged["dataRef"] == dataset
+    assert merged["summary"] == single["summary"] == {"totalChecks": 5, "passedChecks": 1, "failedChecks": 4}
+    assert [(result["check"], result["outcome"], result.get("details")) for result in merged["results"]] == [
+        (result["check"], result["outcome"], result.get("details")) for result in single["results"]
+    ]
+    assert merged["failureSamples"] == single["failureSamples"]
+
+
+def test_failed_shard_publish_fails_the_stage_without_waiting(remote_checks, monkeypatch, dataset):
+    monkeypatch.setattr(q, "QUALITY_CHECK_SHARD_COLUMNS", 1)
+    remote_checks(FailingPublisherClient({q.QUALITY_CHECKER_TOPIC}))
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="Publish failed: deadline exceeded"):
+        q._run_quality_checks_stage(dataset, "job-1", {"checks": CHECKS})
+    assert time.monotonic() - started < 5
+    assert q._get_job_status("job-1.shard-0")["status"] == "QUALITY_CHECK_REQUEST_FAILED"
+
+
+def test_failed_reporting_publish_fails_the_stage_without_waiting(remote_checks):
+    remote_checks(FailingPublisherClient({q.REPORTING_TOPIC}))
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="Reporting failed: Publish failed"):
+        q._run_reporting_stage("job-1", {"summary": {}, "results": []})
+    assert time.monotonic() - started < 5
+    assert q._get_job_status("job-1")["status"] == "REPORTING_REQUEST_FAILED"